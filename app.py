@@ -1,12 +1,14 @@
+import os
 import streamlit as st
-import torch
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
 from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
 
+from preprocessing import clean_text_light
+from inference import SentimentPredictor, PredictionCache, PREDICTION_CACHE
+
 # ==============================
 # CONFIGURATION DE LA PAGE
 # ==============================
@@ -48,15 +50,17 @@ true_labels = test_df["label"].tolist()
 # ==============================
 # CHARGEMENT DU MODÈLE
 # ==============================
+# torch (float32), int8, onnx ou onnx-int8 : versions optimisées créées par python -m inference.export
+BACKEND = os.getenv("SENTIMENT_BACKEND", "torch")
+
+# Cache des prédictions (mémoire + data/cache/predictions.db), partagé avec python -m inference.predictor --cache
+# et invalidé automatiquement quand le modèle est réentraîné ou réexporté
 @st.cache_resource
-def load_model(model_path):
-    tokenizer = AutoTokenizer.from_pretrained(model_path)
-    model = AutoModelForSequenceClassification.from_pretrained(model_path)
-    model.eval()
-    return tokenizer, model
+def load_model(model_path, backend):
+    return SentimentPredictor.from_pretrained(model_path, backend=backend, cache=PredictionCache(PREDICTION_CACHE))
 
 model_path_3 = "C:\\Users\\MSI\\Desktop\\customer_review_analysis\\finetuning_models\\my_sentiment_model_data_augmentation"
-tokenizer3, model3 = load_model(model_path_3)
+predictor3 = load_model(model_path_3, BACKEND)
 
 # ==============================
 # SECTION TEST EN TEMPS RÉEL
@@ -73,15 +77,8 @@ user_text = st.text_area(
 if st.button(" Analyser le sentiment"):
     if user_text.strip() != "":
 
-        inputs3 = tokenizer3(
-            user_text,
-            return_tensors="pt",
-            truncation=True,
-            padding=True
-        )
-
-        outputs3 = model3(**inputs3)
-        probs3 = torch.softmax(outputs3.logits, dim=1)[0].detach().numpy()
+        # Même nettoyage que les données d'entraînement (comment_clean)
+        probs3 = predictor3.predict_proba([clean_text_light(user_text)])[0]
         pred3 = int(np.argmax(probs3))
 
         sentiment_pred = label_map[pred3]
@@ -126,6 +123,10 @@ if st.button(" Analyser le sentiment"):
             })
             st.dataframe(prob_df, use_container_width=True)
 
+        stats = predictor3.cache.stats()
+        st.caption(f"Cache des prédictions : {stats['hit_rate']:.0%} de succès "
+                   f"({stats['memory_hits'] + stats['disk_hits']} réponses en cache, {stats['misses']} calculées)")
+
     else:
         st.warning("⚠️ Veuillez entrer un commentaire avant de lancer l’analyse.")
 
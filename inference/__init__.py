@@ -0,0 +1,7 @@
+"""
+Sentiment inference shared by app.py, the evaluation notebooks and batch scoring
+"""
+from .predictor import SentimentPredictor, MODEL_DIR, MAX_LENGTH, LABELS
+from .backends import BACKENDS
+from .cascade import CascadePredictor
+from .prediction_cache import PredictionCache, PREDICTION_CACHE
@@ -0,0 +1,95 @@
+"""
+Model backends - full-precision PyTorch, INT8 dynamic quantization and ONNX Runtime
+
+    torch       the saved Hugging Face model, float32
+    int8        the same model with its Linear layers quantized to INT8 (torch dynamic quantization)
+    onnx        ONNX export run by ONNX Runtime
+    onnx-int8   ONNX export with INT8 weights (onnxruntime.quantization)
+
+Optimized artifacts are written next to the model by `python -m inference.export`,
+in <model>-<backend>/ with the config and the tokenizer, so every backend loads
+from a single directory.
+"""
+import os
+import json
+from types import SimpleNamespace
+
+import numpy as np
+
+
+BACKENDS = ['torch', 'int8', 'onnx', 'onnx-int8']
+QUANTIZED_WEIGHTS = "quantized_state_dict.pt"
+ONNX_MODEL = "model.onnx"
+EXPORT_INFO = "export.json"
+
+
+def artifact_dir(model_path, backend):
+    """Directory of a backend's artifact (the model itself for torch)"""
+    if backend == 'torch':
+        return model_path
+    return f"{os.path.normpath(model_path)}-{backend}"
+
+
+def quantize(model):
+    """INT8 dynamic quantization of the Linear layers (weights INT8, activations quantized on the fly)"""
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxClassifier:
+    def __init__(self, path, config, threads=None):
+        """ONNX Runtime session behind the interface SentimentPredictor uses (config, eval, __call__)"""
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.inputs = [node.name for node in self.session.get_inputs()]
+        self.config = config
+
+    def eval(self):
+        return self
+
+    def __call__(self, **features):
+        """Logits of a padded batch, as a torch tensor like the Hugging Face models"""
+        import torch
+
+        feed = {name: features[name].numpy().astype(np.int64) for name in self.inputs}
+        logits = self.session.run(['logits'], feed)[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+
+def load_model(model_path, backend='torch', threads=None):
+    """Sequence-classification model of a backend, loaded from model_path or its exported artifact"""
+    from transformers import AutoConfig, AutoModelForSequenceClassification
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    path = artifact_dir(model_path, backend)
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"{path} not found, run python -m inference.export --backend {backend}")
+
+    if backend == 'torch':
+        return AutoModelForSequenceClassification.from_pretrained(path)
+
+    config = AutoConfig.from_pretrained(path)
+    if backend == 'int8':
+        import torch
+
+        # same architecture, quantized, then the saved INT8 weights
+        model = quantize(AutoModelForSequenceClassification.from_config(config))
+        model.load_state_dict(torch.load(os.path.join(path, QUANTIZED_WEIGHTS), weights_only=False))
+        return model.eval()
+
+    return OnnxClassifier(os.path.join(path, ONNX_MODEL), config, threads=threads)
+
+
+def export_info(model_path, backend):
+    """What `inference.export` recorded about an artifact (source model, parity, latency), {} if nothing"""
+    path = os.path.join(artifact_dir(model_path, backend), EXPORT_INFO)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
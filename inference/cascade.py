@@ -0,0 +1,250 @@
+"""
+Cascade predictor - TF-IDF LogisticRegression first, the fine-tuned transformer only when it is unsure
+
+    python -m inference.cascade tune [--validation data/cleaned/finetuning-splits/test_set.csv] [--target-f1 0.60]
+    python -m inference.cascade score [--input data/raw/all_california_gym_reviews.csv --column comment --clean]
+                                      [--backend torch|int8|onnx|onnx-int8] [--output predictions.csv]
+
+Every review is scored by ML_models/ml_classic_models/logistic-regression-augmented-data.
+Reviews whose predict_proba margin (best class minus second best) is below the
+threshold are escalated to XLM-RoBERTa, whose probabilities replace the linear
+model's. `tune` scores a labelled split with both models once and keeps the
+smallest threshold (fewest escalations) whose cascade reaches the target macro-F1;
+by default the target is the transformer's own macro-F1 minus TOLERANCE. Both
+models were trained on finetuning-splits/train_set.csv, so the threshold is tuned
+on a hash fold of the test split and the report (linear / transformer / cascade,
+escalation rate) comes from the other fold, or from --evaluation if given. The
+threshold is saved in finetuning_models/cascade.json and used by `score`.
+"""
+import os
+import json
+import time
+import argparse
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from .backends import BACKENDS
+from .predictor import SentimentPredictor, REPO_ROOT, MODEL_DIR, TEST_CSV, score_csv
+
+
+LINEAR_MODEL = os.path.join(REPO_ROOT, "ML_models", "ml_classic_models", "logistic-regression-augmented-data")
+CASCADE_CONFIG = os.path.join(os.path.dirname(MODEL_DIR), "cascade.json")
+THRESHOLD = 0.5  # used until `tune` has saved one
+TOLERANCE = 0.01  # default target: transformer macro-F1 minus this
+HELD_OUT = 0.5  # share of the validation split kept out of the tuning, for the report
+SPLIT_SEED = 7  # salt of that split (preprocessing.pipeline.test_mask)
+
+
+def margins(probabilities):
+    """Best class probability minus the second best, per row"""
+    top = np.sort(probabilities, axis=1)
+    return top[:, -1] - top[:, -2]
+
+
+class CascadePredictor:
+    def __init__(self, linear, transformer, threshold=THRESHOLD):
+        """linear: scikit-learn pipeline on deep-cleaned text, transformer: SentimentPredictor on light-cleaned text"""
+        self.linear = linear
+        self.transformer = transformer
+        self.threshold = threshold
+        self.batch_size = transformer.batch_size
+        self.stats = {'texts': 0, 'escalated': 0, 'linear_seconds': 0.0, 'transformer_seconds': 0.0}
+
+    @classmethod
+    def load(cls, linear_path=LINEAR_MODEL, model_path=MODEL_DIR, backend='torch', threshold=None,
+             config_path=CASCADE_CONFIG, **options):
+        """Both models, with the tuned threshold of config_path unless threshold is given"""
+        import joblib
+
+        if threshold is None and os.path.exists(config_path):
+            with open(config_path, 'r', encoding='utf-8') as f:
+                threshold = json.load(f)['threshold']
+        transformer = SentimentPredictor.from_pretrained(model_path, backend=backend, **options)
+        return cls(joblib.load(linear_path), transformer, THRESHOLD if threshold is None else threshold)
+
+    def linear_proba(self, texts):
+        """Linear model probabilities, columns in label order"""
+        from preprocessing import preprocess_ml_deep_batch
+
+        cleaned = preprocess_ml_deep_batch(pd.Series(texts, dtype="string"))
+        probabilities = self.linear.predict_proba(cleaned.tolist())
+        return probabilities[:, np.argsort(self.linear.classes_)]
+
+    def predict_proba(self, texts, verbose=False):
+        """Cascade probabilities: the linear model's, or the transformer's for the escalated reviews"""
+        texts = ["" if pd.isna(text) else str(text) for text in texts]
+        start = time.perf_counter()
+        probabilities = self.linear_proba(texts)
+        linear_seconds = time.perf_counter() - start
+
+        escalate = np.flatnonzero(margins(probabilities) < self.threshold)
+        start = time.perf_counter()
+        if len(escalate):
+            probabilities[escalate] = self.transformer.predict_proba([texts[i] for i in escalate])
+        transformer_seconds = time.perf_counter() - start
+
+        self.stats['texts'] += len(texts)
+        self.stats['escalated'] += len(escalate)
+        self.stats['linear_seconds'] += linear_seconds
+        self.stats['transformer_seconds'] += transformer_seconds
+        if verbose:
+            print(f"{len(texts):,} texts: {len(escalate):,} escalated ({len(escalate) / max(len(texts), 1):.1%}), "
+                  f"linear {linear_seconds:.2f}s, transformer {transformer_seconds:.2f}s")
+        return probabilities
+
+    def predict(self, texts, verbose=False):
+        """Predicted class of every text"""
+        return self.predict_proba(texts, verbose=verbose).argmax(axis=1)
+
+    def escalation_rate(self):
+        """Share of the texts scored so far that went to the transformer"""
+        return self.stats['escalated'] / self.stats['texts'] if self.stats['texts'] else 0.0
+
+
+# ========== THRESHOLD ==========
+
+def threshold_curve(linear_probabilities, transformer_probabilities, labels):
+    """Macro-F1 and escalation rate of the cascade for every useful threshold"""
+    from sklearn.metrics import f1_score
+
+    margin = margins(linear_probabilities)
+    linear_predictions = linear_probabilities.argmax(axis=1)
+    transformer_predictions = transformer_probabilities.argmax(axis=1)
+    # escalating below each distinct margin, plus nothing (0) and everything (> 1)
+    candidates = np.unique(np.concatenate([[0.0], margin + 1e-9, [1.0 + 1e-9]]))
+    rows = []
+    for threshold in candidates:
+        escalate = margin < threshold
+        predictions = np.where(escalate, transformer_predictions, linear_predictions)
+        rows.append({'threshold': float(threshold), 'escalation_rate': float(escalate.mean()),
+                     'f1_macro': float(f1_score(labels, predictions, average='macro'))})
+    return pd.DataFrame(rows)
+
+
+def pick_threshold(curve, target_f1):
+    """Fewest escalations reaching target_f1, else the best macro-F1 (fewest escalations on ties)"""
+    reached = curve[curve['f1_macro'] >= target_f1 - 1e-12]
+    if len(reached):
+        return reached.sort_values(['escalation_rate', 'threshold']).iloc[0]
+    best = curve['f1_macro'].max()
+    return curve[curve['f1_macro'] == best].sort_values(['escalation_rate', 'threshold']).iloc[0]
+
+
+def read_split(path):
+    """texts and labels of a labelled CSV (text, label)"""
+    df = pd.read_csv(path, encoding='utf-8-sig').dropna(subset=['text'])
+    return df['text'].astype(str).tolist(), df['label'].to_numpy()
+
+
+def tune(cascade, validation_path=TEST_CSV, evaluation_path=None, target_f1=None, held_out=HELD_OUT,
+         config_path=CASCADE_CONFIG):
+    """Tune the cascade threshold on labelled data and report it on data the tuning never saw
+
+    With evaluation_path, the threshold is tuned on all of validation_path and
+    evaluated on evaluation_path. Without it, validation_path is split with the
+    salted text hash of preprocessing.pipeline: held_out of it is kept for the report.
+    """
+    from sklearn.metrics import f1_score
+    from preprocessing.pipeline import test_mask
+    from .export import evaluate_backend
+
+    texts, labels = read_split(validation_path)
+    if evaluation_path is None:
+        report_fold = test_mask(pd.Series(texts), test_size=held_out, seed=SPLIT_SEED).to_numpy()
+        evaluation_texts = [text for text, keep in zip(texts, report_fold) if keep]
+        evaluation_labels = labels[report_fold]
+        texts = [text for text, keep in zip(texts, report_fold) if not keep]
+        labels = labels[~report_fold]
+        evaluation = f"{os.path.relpath(validation_path, REPO_ROOT)} (hash fold not used for tuning)"
+    else:
+        evaluation_texts, evaluation_labels = read_split(evaluation_path)
+        evaluation = os.path.relpath(evaluation_path, REPO_ROOT)
+
+    linear_probabilities = cascade.linear_proba(texts)
+    transformer_probabilities = cascade.transformer.predict_proba(texts)
+    linear_f1 = f1_score(labels, linear_probabilities.argmax(axis=1), average='macro')
+    transformer_f1 = f1_score(labels, transformer_probabilities.argmax(axis=1), average='macro')
+    if target_f1 is None:
+        target_f1 = transformer_f1 - TOLERANCE
+
+    curve = threshold_curve(linear_probabilities, transformer_probabilities, labels)
+    chosen = pick_threshold(curve, target_f1)
+    cascade.threshold = float(chosen['threshold'])
+    if chosen['f1_macro'] < target_f1:
+        print(f"⚠️  target macro-F1 {target_f1:.4f} not reached, best is {chosen['f1_macro']:.4f}")
+
+    # the raw pipeline expects text_clean, so the linear model is timed with its cleaning
+    linear = SimpleNamespace(predict_proba=cascade.linear_proba, batch_size=cascade.batch_size)
+    results = {}
+    for name, predictor in [('linear', linear), ('transformer', cascade.transformer), ('cascade', cascade)]:
+        results[name], _ = evaluate_backend(predictor, evaluation_texts, evaluation_labels)
+    escalation_rate = float((margins(cascade.linear_proba(evaluation_texts)) < cascade.threshold).mean())
+    results['cascade']['escalation_rate'] = round(escalation_rate, 4)
+
+    print(f"\nThreshold {cascade.threshold:.4f}, tuned on {len(texts)} reviews: {chosen['escalation_rate']:.1%} "
+          f"escalated, macro-F1 {chosen['f1_macro']:.4f} (in-sample; target {target_f1:.4f}, "
+          f"linear {linear_f1:.4f}, transformer {transformer_f1:.4f})")
+    print(f"Held out, {len(evaluation_texts)} reviews of {evaluation}: {escalation_rate:.1%} escalated")
+    print(f"{'model':<12} {'accuracy':>8} {'F1-macro':>8} {'texts/s':>9} {'p50 ms':>7}")
+    for name, result in results.items():
+        print(f"{name:<12} {result['accuracy']:>8.4f} {result['f1_macro']:>8.4f} "
+              f"{result['throughput_per_s']:>9.1f} {result['latency_p50_ms']:>7.1f}")
+
+    config = {
+        'threshold': cascade.threshold,
+        'linear_model': os.path.basename(LINEAR_MODEL),
+        'transformer_model': os.path.basename(os.path.normpath(MODEL_DIR)),
+        # in-sample: the threshold was picked on these reviews, so their F1 meets the target by construction
+        'tuning': {
+            'data': os.path.relpath(validation_path, REPO_ROOT) + ("" if evaluation_path else " (hash fold)"),
+            'samples': len(texts), 'target_f1': round(float(target_f1), 4),
+            'in_sample_f1_macro': round(float(chosen['f1_macro']), 4),
+            'in_sample_escalation_rate': round(float(chosen['escalation_rate']), 4),
+            'curve': curve.round(4).to_dict(orient='records'),
+        },
+        # held out: none of these reviews was used to pick the threshold
+        'evaluation': {'data': evaluation, 'samples': len(evaluation_texts), 'results': results},
+    }
+    if config_path:
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, indent=4, ensure_ascii=False)
+        print(f"Saved the threshold to: {config_path}")
+    return config
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Linear model first, transformer for the uncertain reviews")
+    parser.add_argument("command", choices=['tune', 'score'])
+    parser.add_argument("--linear", default=LINEAR_MODEL, help="scikit-learn pipeline (joblib)")
+    parser.add_argument("--model", default=MODEL_DIR, help="fine-tuned transformer directory")
+    parser.add_argument("--backend", default='torch', choices=BACKENDS, help="transformer backend")
+    parser.add_argument("--validation", default=TEST_CSV, help="labelled split (text, label) used by tune")
+    parser.add_argument("--evaluation", default=None,
+                        help=f"labelled split of the report (default: {HELD_OUT:.0%} of --validation, held out)")
+    parser.add_argument("--target-f1", type=float, default=None,
+                        help=f"macro-F1 to reach (default: the transformer's minus {TOLERANCE})")
+    parser.add_argument("--threshold", type=float, default=None, help="margin threshold (default: the tuned one)")
+    parser.add_argument("--config", default=CASCADE_CONFIG, help="tuned threshold file")
+    parser.add_argument("--input", default=TEST_CSV, help="CSV to score")
+    parser.add_argument("--column", default="text", help="text column (comment for raw reviews, with --clean)")
+    parser.add_argument("--clean", action="store_true", help="apply clean_text_light first (raw comments)")
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads of the transformer")
+    parser.add_argument("--output", default=None, help="CSV with pred and confidence columns")
+    parser.add_argument("--cache", action="store_true", help="score: reuse and store the transformer's predictions")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    cascade = CascadePredictor.load(args.linear, args.model, backend=args.backend, threshold=args.threshold,
+                                    config_path=args.config, threads=args.threads,
+                                    cache=(args.cache and args.command == 'score') or None)
+    if args.command == 'tune':
+        tune(cascade, args.validation, args.evaluation, target_f1=args.target_f1, config_path=args.config)
+    else:
+        score_csv(cascade, args.input, column=args.column, clean=args.clean, output=args.output)
+        print(f"Escalated to the transformer: {cascade.stats['escalated']:,} of {cascade.stats['texts']:,} "
+              f"({cascade.escalation_rate():.1%})")
@@ -0,0 +1,289 @@
+"""
+Distillation - trains a small, fast student on the soft labels of the fine-tuned XLM-RoBERTa teacher
+
+    python -m inference.distill [--student transformer|tfidf]
+                                [--teacher finetuning_models/my_sentiment_model_data_augmentation]
+                                [--student-model microsoft/Multilingual-MiniLM-L12-H384]
+                                [--temperature 2.0] [--alpha 0.5] [--epochs 10] [--output DIR]
+
+The teacher scores the fine-tuning train split once. The student learns from a
+mix of the true labels and the teacher's probabilities softened by the
+temperature (alpha weighs the true labels), with the class weights of the
+fine-tuning notebooks so that Neutre keeps its importance:
+
+    transformer  a small multilingual transformer trained by DistillationTrainer, the
+                 WeightedTrainer of finetuning.ipynb plus a KL term on the soft labels
+    tfidf        TF-IDF + LogisticRegression fitted on the soft targets (each review is
+                 repeated once per class, weighted by its target probability)
+
+The transformer student keeps its best epoch (and stops early) on a hash fold
+of the train split, VALIDATION_SIZE of it, which it does not train on. Teacher
+and student are then compared on the test split (quality, agreement,
+latency, throughput, size) and the report is saved to
+finetuning_models/evaluation_distillation.json.
+"""
+import os
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from .export import evaluate_backend, directory_size_mb
+from .predictor import SentimentPredictor, MODEL_DIR, TEST_CSV, MAX_LENGTH, BATCH_SIZE
+
+
+FINETUNING_DIR = os.path.dirname(MODEL_DIR)
+TRAIN_CSV = os.path.join(os.path.dirname(TEST_CSV), "train_set.csv")
+REPORT_PATH = os.path.join(FINETUNING_DIR, "evaluation_distillation.json")
+OUTPUTS = {
+    'transformer': os.path.join(FINETUNING_DIR, "my_sentiment_model_distilled"),
+    'tfidf': os.path.join(FINETUNING_DIR, "tfidf-logistic-regression-distilled"),
+}
+
+STUDENT_MODEL = "microsoft/Multilingual-MiniLM-L12-H384"  # 12 layers x 384, shares the XLM-R tokenizer
+TEMPERATURE = 2.0
+ALPHA = 0.5  # weight of the true labels, 1 - ALPHA for the teacher
+VALIDATION_SIZE = 0.1  # share of the train split used for the transformer's model selection
+SPLIT_SEED = 7  # salt of that split (preprocessing.pipeline.test_mask)
+
+
+def soften(probabilities, temperature=TEMPERATURE):
+    """Teacher probabilities at a higher temperature: softmax(logits / T) computed from softmax(logits)"""
+    logits = np.log(np.clip(probabilities, 1e-12, 1.0)) / temperature
+    logits -= logits.max(axis=1, keepdims=True)
+    soft = np.exp(logits)
+    return soft / soft.sum(axis=1, keepdims=True)
+
+
+def class_weights(labels, num_labels):
+    """'balanced' weights, as compute_class_weight in the fine-tuning notebooks"""
+    counts = np.bincount(labels, minlength=num_labels).astype(float)
+    return len(labels) / (num_labels * np.maximum(counts, 1))
+
+
+# ========== TF-IDF STUDENT ==========
+
+def train_tfidf_student(texts, labels, soft, alpha=ALPHA, output=None):
+    """TF-IDF + LogisticRegression minimizing the cross-entropy with the mixed soft targets"""
+    import joblib
+    from sklearn.pipeline import Pipeline
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
+    n, num_labels = soft.shape
+    targets = (1 - alpha) * soft + alpha * np.eye(num_labels)[labels]
+    weights = targets * class_weights(labels, num_labels)[labels][:, None]
+
+    # same vectorizer as the ML notebooks, fitted once per review
+    vectorizer = TfidfVectorizer(min_df=2, max_df=0.95, ngram_range=(1, 2), sublinear_tf=True).fit(texts)
+    features = vectorizer.transform(texts)
+
+    # one row per (review, class) weighted by the target probability: the weighted log-loss
+    # of LogisticRegression is then the soft-target cross-entropy
+    rows = np.repeat(np.arange(n), num_labels)
+    classes = np.tile(np.arange(num_labels), n)
+    weights = weights.ravel()
+    keep = weights > 1e-6
+    classifier = LogisticRegression(max_iter=1000, C=4.0)
+    classifier.fit(features[rows[keep]], classes[keep], sample_weight=weights[keep])
+
+    student = Pipeline([('tfidf', vectorizer), ('clf', classifier)])
+    if output:
+        joblib.dump(student, output)
+    return student
+
+
+# ========== TRANSFORMER STUDENT ==========
+
+def distillation_trainer_class():
+    """DistillationTrainer, defined on first use so that importing this module does not need transformers"""
+    import torch
+    from transformers import Trainer
+
+    class DistillationTrainer(Trainer):
+        def __init__(self, *args, class_weights=None, temperature=TEMPERATURE, alpha=ALPHA, **kwargs):
+            """WeightedTrainer of finetuning.ipynb with a KL term towards the teacher's soft labels"""
+            super().__init__(*args, **kwargs)
+            self.class_weights = torch.tensor(class_weights, dtype=torch.float32)
+            self.temperature = temperature
+            self.alpha = alpha
+
+        def compute_loss(self, model, inputs, return_outputs=False, **kwargs):
+            labels = inputs.pop("labels")
+            teacher = inputs.pop("teacher_probs")
+            outputs = model(**inputs)
+            logits = outputs.logits
+
+            hard = torch.nn.functional.cross_entropy(logits, labels, weight=self.class_weights.to(logits.device))
+            soft = torch.nn.functional.kl_div(torch.log_softmax(logits / self.temperature, dim=-1), teacher,
+                                              reduction='batchmean') * self.temperature ** 2
+            loss = self.alpha * hard + (1 - self.alpha) * soft
+            return (loss, outputs) if return_outputs else loss
+
+    return DistillationTrainer
+
+
+def compute_metrics(eval_pred):
+    """Metrics of the fine-tuning notebooks used for model selection"""
+    from sklearn.metrics import accuracy_score, f1_score
+
+    logits, labels = eval_pred
+    predictions = np.argmax(logits, axis=1)
+    return {
+        "accuracy": accuracy_score(labels, predictions),
+        "f1_macro": f1_score(labels, predictions, average="macro"),
+        "f1_weighted": f1_score(labels, predictions, average="weighted"),
+    }
+
+
+def train_transformer_student(texts, labels, soft, eval_texts, eval_labels, eval_soft,
+                              student_model=STUDENT_MODEL, output=OUTPUTS['transformer'],
+                              temperature=TEMPERATURE, alpha=ALPHA, epochs=10, learning_rate=5e-5,
+                              batch_size=16):
+    """Fine-tune student_model with DistillationTrainer, keep the best epoch on f1_macro"""
+    from transformers import (AutoTokenizer, AutoModelForSequenceClassification, DataCollatorWithPadding,
+                              EarlyStoppingCallback, TrainingArguments)
+
+    tokenizer = AutoTokenizer.from_pretrained(student_model)
+    model = AutoModelForSequenceClassification.from_pretrained(student_model, num_labels=soft.shape[1])
+
+    def features(texts, labels, soft):
+        """Tokenized examples (padded per batch by the collator) with their label and soft label"""
+        encodings = tokenizer(list(texts), truncation=True, max_length=MAX_LENGTH)
+        return [{'input_ids': encodings['input_ids'][i], 'attention_mask': encodings['attention_mask'][i],
+                 'labels': int(labels[i]), 'teacher_probs': soft[i].tolist()} for i in range(len(labels))]
+
+    training_args = TrainingArguments(
+        output_dir=output + "-checkpoints",
+        eval_strategy="epoch",
+        save_strategy="epoch",
+        load_best_model_at_end=True,
+        metric_for_best_model="f1_macro",
+        num_train_epochs=epochs,
+        per_device_train_batch_size=batch_size,
+        per_device_eval_batch_size=BATCH_SIZE,
+        learning_rate=learning_rate,
+        weight_decay=0.01,
+        logging_steps=20,
+        save_total_limit=2,
+        remove_unused_columns=False,  # keeps teacher_probs
+        report_to="none",
+    )
+    trainer = distillation_trainer_class()(
+        model=model,
+        args=training_args,
+        train_dataset=features(texts, labels, soft),
+        eval_dataset=features(eval_texts, eval_labels, eval_soft),
+        data_collator=DataCollatorWithPadding(tokenizer),
+        compute_metrics=compute_metrics,
+        callbacks=[EarlyStoppingCallback(early_stopping_patience=3)],
+        class_weights=class_weights(labels, soft.shape[1]),
+        temperature=temperature,
+        alpha=alpha,
+    )
+    trainer.train()
+    trainer.save_model(output)
+    tokenizer.save_pretrained(output)
+    return SentimentPredictor(trainer.model, tokenizer)
+
+
+# ========== REPORT ==========
+
+def parameter_count(model):
+    """Trainable numbers of a transformer or of the TF-IDF pipeline's classifier"""
+    if hasattr(model, 'named_steps'):
+        return int(model.named_steps['clf'].coef_.size + model.named_steps['clf'].intercept_.size)
+    return int(sum(parameter.numel() for parameter in model.parameters()))
+
+
+def run_distillation(student='transformer', teacher_path=MODEL_DIR, student_model=STUDENT_MODEL,
+                     train_path=TRAIN_CSV, test_path=TEST_CSV, output=None, temperature=TEMPERATURE,
+                     alpha=ALPHA, epochs=10, threads=None, report_path=REPORT_PATH,
+                     validation_size=VALIDATION_SIZE):
+    """Distill the teacher into a student and report the speed / quality trade-off on the test split"""
+    from preprocessing.pipeline import test_mask
+
+    output = output or OUTPUTS[student]
+    train = pd.read_csv(train_path, encoding='utf-8-sig').dropna(subset=['text'])
+    test = pd.read_csv(test_path, encoding='utf-8-sig').dropna(subset=['text'])
+    train_texts, train_labels = train['text'].astype(str).tolist(), train['label'].to_numpy()
+    test_texts, test_labels = test['text'].astype(str).tolist(), test['label'].to_numpy()
+
+    teacher = SentimentPredictor.from_pretrained(teacher_path, threads=threads)
+    print(f"▶️  Teacher soft labels for {len(train_texts):,} train reviews")
+    train_soft = soften(teacher.predict_proba(train_texts), temperature)
+
+    print(f"▶️  Training the {student} student")
+    if student == 'tfidf':
+        model = train_tfidf_student(train_texts, train_labels, train_soft, alpha=alpha, output=output)
+        student_predictor = model
+    else:
+        # early stopping and best epoch on a fold of train: the test split is only for the report
+        validation = test_mask(train['text'].astype(str), test_size=validation_size, seed=SPLIT_SEED).to_numpy()
+        fit = ~validation
+        print(f"   {int(fit.sum()):,} training / {int(validation.sum()):,} validation reviews")
+        student_predictor = train_transformer_student(
+            [text for text, keep in zip(train_texts, fit) if keep], train_labels[fit], train_soft[fit],
+            [text for text, keep in zip(train_texts, validation) if keep], train_labels[validation],
+            train_soft[validation],
+            student_model=student_model, output=output, temperature=temperature, alpha=alpha, epochs=epochs)
+        student_predictor.model.eval()
+        model = student_predictor.model
+
+    teacher_result, reference = evaluate_backend(teacher, test_texts, test_labels)
+    student_result, _ = evaluate_backend(student_predictor, test_texts, test_labels, reference)
+    teacher_result.update(parameters=parameter_count(teacher.model), size_mb=directory_size_mb(teacher_path))
+    student_result.update(parameters=parameter_count(model),
+                          size_mb=directory_size_mb(output) if os.path.isdir(output)
+                          else round(os.path.getsize(output) / 1e6, 1))
+    student_result['speedup'] = round(student_result['throughput_per_s'] / teacher_result['throughput_per_s'], 2)
+
+    print(f"\n{'model':<9} {'accuracy':>8} {'F1-macro':>8} {'F1 Neutre':>9} {'agree':>6} {'p50 ms':>7} "
+          f"{'texts/s':>8} {'params':>12}")
+    for name, result in [('teacher', teacher_result), ('student', student_result)]:
+        print(f"{name:<9} {result['accuracy']:>8.4f} {result['f1_macro']:>8.4f} {result['f1_per_class'][1]:>9.4f} "
+              f"{result.get('agreement', 1.0):>6.1%} {result['latency_p50_ms']:>7.1f} "
+              f"{result['throughput_per_s']:>8.1f} {result['parameters']:>12,}")
+    print(f"Student: {student_result['speedup']}x the teacher's throughput, saved to {output}")
+
+    report = {
+        'teacher': os.path.basename(os.path.normpath(teacher_path)),
+        'student': student, 'student_model': student_model if student == 'transformer' else 'tfidf+logreg',
+        'output': os.path.basename(os.path.normpath(output)),
+        'temperature': temperature, 'alpha': alpha,
+        'train_samples': len(train_texts), 'test_samples': len(test_texts),
+        'validation_samples': int(validation.sum()) if student == 'transformer' else 0,
+        'results': {'teacher': teacher_result, 'student': student_result},
+    }
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+        print(f"Report saved to: {report_path}")
+    return report
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Distill the fine-tuned XLM-RoBERTa model into a small student")
+    parser.add_argument("--student", default='transformer', choices=sorted(OUTPUTS), help="kind of student")
+    parser.add_argument("--teacher", default=MODEL_DIR, help="fine-tuned teacher directory")
+    parser.add_argument("--student-model", default=STUDENT_MODEL, help="pretrained transformer student")
+    parser.add_argument("--train", default=TRAIN_CSV, help="train split (text, label)")
+    parser.add_argument("--test", default=TEST_CSV, help="test split (text, label)")
+    parser.add_argument("--output", default=None, help="where to save the student")
+    parser.add_argument("--temperature", type=float, default=TEMPERATURE, help="softmax temperature of the soft labels")
+    parser.add_argument("--alpha", type=float, default=ALPHA, help="weight of the true labels (0: teacher only)")
+    parser.add_argument("--epochs", type=int, default=10, help="transformer student epochs")
+    parser.add_argument("--validation-size", type=float, default=VALIDATION_SIZE,
+                        help="share of the train split used for the transformer's model selection")
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads")
+    parser.add_argument("--report", default=REPORT_PATH, help="JSON report")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run_distillation(args.student, args.teacher, args.student_model, args.train, args.test, args.output,
+                     temperature=args.temperature, alpha=args.alpha, epochs=args.epochs, threads=args.threads,
+                     report_path=args.report, validation_size=args.validation_size)
@@ -0,0 +1,200 @@
+"""
+Export - INT8 / ONNX Runtime versions of a fine-tuned classifier, with a parity and latency report
+
+    python -m inference.export [--model finetuning_models/my_sentiment_model_data_augmentation]
+                               [--backend int8 onnx onnx-int8] [--test data/cleaned/finetuning-splits/test_set.csv]
+                               [--threads 4] [--batch-size 32] [--report finetuning_models/evaluation_backends.json]
+
+Every backend writes <model>-<backend>/ (see inference.backends), then all
+backends, the float32 model included, score the test split: accuracy and
+macro-F1, agreement with the float32 predictions, single-review latency
+(p50 / p95) and batched throughput. The numbers are saved in the report and in
+each artifact's export.json.
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+
+import numpy as np
+import pandas as pd
+import torch
+
+from .backends import (BACKENDS, QUANTIZED_WEIGHTS, ONNX_MODEL, EXPORT_INFO,
+                       artifact_dir, quantize)
+from .predictor import SentimentPredictor, MODEL_DIR, TEST_CSV, BATCH_SIZE
+
+
+REPORT_PATH = os.path.join(os.path.dirname(MODEL_DIR), "evaluation_backends.json")
+LATENCY_SAMPLES = 50  # reviews scored one by one for the latency percentiles
+OPSET = 17
+
+
+# ========== EXPORT ==========
+
+def save_support_files(predictor, output_dir):
+    """Config and tokenizer next to the exported weights"""
+    os.makedirs(output_dir, exist_ok=True)
+    predictor.model.config.save_pretrained(output_dir)
+    predictor.tokenizer.save_pretrained(output_dir)
+
+
+def export_int8(predictor, output_dir):
+    """torch dynamic quantization: INT8 Linear weights saved as a state dict"""
+    save_support_files(predictor, output_dir)
+    model = quantize(predictor.model)
+    torch.save(model.state_dict(), os.path.join(output_dir, QUANTIZED_WEIGHTS))
+
+
+class LogitsOnly(torch.nn.Module):
+    def __init__(self, model):
+        """Forward returning the logits tensor only, the output the ONNX graph exposes"""
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+
+def export_onnx(predictor, output_dir, quantized=False):
+    """ONNX graph with dynamic batch and sequence axes, INT8 weights if quantized"""
+    save_support_files(predictor, output_dir)
+    path = os.path.join(output_dir, ONNX_MODEL)
+    sample = predictor.tokenizer(["Très bonne salle", "Le personnel est accueillant et les coachs sont top"],
+                                 padding=True, return_tensors='pt')
+    float_path = path + '.float' if quantized else path
+    torch.onnx.export(
+        LogitsOnly(predictor.model).eval(), (sample['input_ids'], sample['attention_mask']), float_path,
+        input_names=['input_ids', 'attention_mask'], output_names=['logits'],
+        dynamic_axes={'input_ids': {0: 'batch', 1: 'sequence'}, 'attention_mask': {0: 'batch', 1: 'sequence'},
+                      'logits': {0: 'batch'}},
+        opset_version=OPSET, external_data=False,
+    )
+    if quantized:
+        import onnx
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        # the quantizer re-infers shapes and rejects some of those recorded by the exporter
+        graph = onnx.load(float_path)
+        del graph.graph.value_info[:]
+        onnx.save(graph, float_path)
+        quantize_dynamic(float_path, path, weight_type=QuantType.QInt8)
+        os.remove(float_path)
+
+
+EXPORTERS = {
+    'int8': export_int8,
+    'onnx': export_onnx,
+    'onnx-int8': lambda predictor, output_dir: export_onnx(predictor, output_dir, quantized=True),
+}
+
+
+# ========== PARITY AND LATENCY ==========
+
+def directory_size_mb(path):
+    """Size of the weights in a model directory"""
+    total = sum(os.path.getsize(os.path.join(root, name))
+                for root, _, names in os.walk(path) for name in names)
+    return round(total / 1e6, 1)
+
+
+def evaluate_backend(predictor, texts, labels, reference=None, latency_samples=LATENCY_SAMPLES):
+    """Quality on the test split, agreement with the reference predictions, latency and throughput
+
+    predictor is anything with predict_proba(texts): a SentimentPredictor or a scikit-learn pipeline.
+    """
+    from sklearn.metrics import accuracy_score, f1_score
+
+    predictor.predict_proba(texts[:getattr(predictor, 'batch_size', BATCH_SIZE)])  # warm-up: first-call allocations and graph setup
+    start = time.perf_counter()
+    probabilities = predictor.predict_proba(texts)
+    elapsed = time.perf_counter() - start
+    predictions = probabilities.argmax(axis=1)
+
+    latencies = []
+    for text in texts[:latency_samples]:
+        single = time.perf_counter()
+        predictor.predict_proba([text])
+        latencies.append(time.perf_counter() - single)
+
+    result = {
+        'accuracy': round(float(accuracy_score(labels, predictions)), 4),
+        'f1_macro': round(float(f1_score(labels, predictions, average='macro')), 4),
+        'f1_per_class': [round(float(f1), 4) for f1 in f1_score(labels, predictions, average=None,
+                                                                  labels=range(probabilities.shape[1]))],
+        'throughput_per_s': round(len(texts) / elapsed, 1),
+        'latency_p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 2),
+        'latency_p95_ms': round(float(np.percentile(latencies, 95)) * 1000, 2),
+    }
+    if reference is not None:
+        result['agreement'] = round(float((predictions == reference['predictions']).mean()), 4)
+        result['max_probability_diff'] = round(float(np.abs(probabilities - reference['probabilities']).max()), 4)
+    return result, {'predictions': predictions, 'probabilities': probabilities}
+
+
+def run_export(model_path=MODEL_DIR, backends=('int8', 'onnx', 'onnx-int8'), test_path=TEST_CSV,
+               threads=None, batch_size=BATCH_SIZE, report_path=REPORT_PATH):
+    """Export the backends, compare them with the float32 model on the test split and save the report"""
+    test = pd.read_csv(test_path, encoding='utf-8-sig')
+    texts, labels = test['text'].astype(str).tolist(), test['label'].to_numpy()
+
+    base = SentimentPredictor.from_pretrained(model_path, batch_size=batch_size, threads=threads)
+    for backend in backends:
+        output_dir = artifact_dir(model_path, backend)
+        if os.path.isdir(output_dir):
+            shutil.rmtree(output_dir)
+        start = time.time()
+        EXPORTERS[backend](base, output_dir)
+        print(f"▶️  {backend}: exported to {output_dir} in {time.time() - start:.1f}s")
+
+    results = {}
+    reference = None
+    for backend in ['torch', *backends]:
+        predictor = base if backend == 'torch' else SentimentPredictor.from_pretrained(
+            model_path, backend=backend, batch_size=batch_size, threads=threads)
+        result, outputs = evaluate_backend(predictor, texts, labels, reference)
+        result['size_mb'] = directory_size_mb(artifact_dir(model_path, backend))
+        if backend == 'torch':
+            reference = outputs
+        else:
+            result['speedup'] = round(result['throughput_per_s'] / results['torch']['throughput_per_s'], 2)
+            info = {'source_model': os.path.basename(os.path.normpath(model_path)), 'backend': backend,
+                    'test_set': os.path.basename(test_path), **result}
+            with open(os.path.join(artifact_dir(model_path, backend), EXPORT_INFO), 'w', encoding='utf-8') as f:
+                json.dump(info, f, indent=4)
+        results[backend] = result
+
+    print(f"\n{'backend':<10} {'accuracy':>8} {'F1-macro':>8} {'agree':>6} {'p50 ms':>7} {'p95 ms':>7} "
+          f"{'texts/s':>8} {'MB':>7}")
+    for backend, result in results.items():
+        print(f"{backend:<10} {result['accuracy']:>8.4f} {result['f1_macro']:>8.4f} "
+              f"{result.get('agreement', 1.0):>6.1%} {result['latency_p50_ms']:>7.1f} {result['latency_p95_ms']:>7.1f} "
+              f"{result['throughput_per_s']:>8.1f} {result['size_mb']:>7.1f}")
+
+    report = {'model': os.path.basename(os.path.normpath(model_path)), 'test_samples': len(texts),
+              'threads': threads, 'batch_size': batch_size, 'backends': results}
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+        print(f"\nReport saved to: {report_path}")
+    return report
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Export INT8 / ONNX versions of the sentiment model and compare them")
+    parser.add_argument("--model", default=MODEL_DIR, help="saved model directory")
+    parser.add_argument("--backend", nargs="+", default=['int8', 'onnx', 'onnx-int8'],
+                        choices=[backend for backend in BACKENDS if backend != 'torch'], help="artifacts to export")
+    parser.add_argument("--test", default=TEST_CSV, help="labelled CSV (text, label) of the parity check")
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="texts per forward pass")
+    parser.add_argument("--report", default=REPORT_PATH, help="JSON report")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run_export(args.model, args.backend, args.test, threads=args.threads, batch_size=args.batch_size,
+               report_path=args.report)
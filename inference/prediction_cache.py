@@ -0,0 +1,163 @@
+"""
+Prediction cache - class probabilities keyed by normalized text and model version
+
+Two tiers: an in-process LRU dictionary (MEMORY_SIZE entries) and, optionally,
+a SQLite database shared by the Streamlit app and the bulk scoring jobs. Texts
+are normalized (whitespace collapsed, as the XLM-RoBERTa tokenizer does) before
+hashing, so whitespace variants of a comment share an entry. The model version
+is <model id>:<files hash>. The id comes from the resolved model directory, so
+relative, absolute and trailing-slash spellings of one model share their entries.
+The files hash covers the size and modification time of every file of the model
+and of its tokenizer: retraining or re-exporting a model gives it a new version,
+and the entries of its older versions are dropped when it is loaded.
+"""
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PREDICTION_CACHE = os.path.join(REPO_ROOT, "data", "cache", "predictions.db")
+MEMORY_SIZE = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    model         TEXT,
+    text_hash     TEXT,
+    probabilities BLOB,
+    PRIMARY KEY (model, text_hash)
+);
+"""
+
+WHITESPACE_REGEX = re.compile(r"\s+")
+
+
+def normalize(text):
+    """Text as the cache sees it: whitespace runs collapsed, ends stripped"""
+    return WHITESPACE_REGEX.sub(" ", text).strip()
+
+
+def text_hash(text):
+    """Cache key of a text"""
+    return hashlib.sha1(normalize(text).encode('utf-8')).hexdigest()
+
+
+def file_stats(path):
+    """Relative name, size and modification time of every file under a directory"""
+    stats = []
+    for root, _, names in os.walk(path):
+        for name in names:
+            stat = os.stat(os.path.join(root, name))
+            stats.append(f"{os.path.relpath(os.path.join(root, name), path)}:{stat.st_size}:{stat.st_mtime_ns}")
+    return sorted(stats)
+
+
+def model_id(path):
+    """<directory name>-<hash of the resolved directory>, the same for every spelling of the path"""
+    resolved = os.path.realpath(path)
+    return f"{os.path.basename(resolved)}-{hashlib.sha1(resolved.encode('utf-8')).hexdigest()[:8]}"
+
+
+def model_version(path, tokenizer_path=None, *extra):
+    """<model_id>:<hash of the model's and the tokenizer's files, and extra>
+
+    A tokenizer that is not a local directory (a Hub name) is hashed by name.
+    """
+    tokenizer = ([] if tokenizer_path is None or os.path.realpath(tokenizer_path) == os.path.realpath(path)
+                 else file_stats(tokenizer_path) if os.path.isdir(tokenizer_path) else [tokenizer_path])
+    key = "|".join([*file_stats(path), '#', *tokenizer, '#', *map(str, extra)])
+    return f"{model_id(path)}:{hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]}"
+
+
+class PredictionCache:
+    def __init__(self, db_filename=None, memory_size=MEMORY_SIZE):
+        """In-memory LRU, backed by the SQLite database db_filename if given"""
+        self.memory = OrderedDict()
+        self.memory_size = memory_size
+        self.lock = threading.Lock()
+        self.hits = {'memory': 0, 'disk': 0}
+        self.misses = 0
+
+        self.conn = None
+        if db_filename:
+            directory = os.path.dirname(db_filename)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.conn = sqlite3.connect(db_filename, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+
+    def remember(self, key, probabilities):
+        """Add to the LRU, evicting the least recently used entries (lock held)"""
+        self.memory[key] = probabilities
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def get_many(self, model, hashes, chunk_size=500):
+        """Cached probabilities of the given text hashes, as {hash: probabilities}"""
+        found = {}
+        with self.lock:
+            for key in hashes:
+                if (model, key) in self.memory:
+                    self.memory.move_to_end((model, key))
+                    found[key] = self.memory[(model, key)]
+            self.hits['memory'] += len(found)
+
+            missing = [key for key in hashes if key not in found]
+            if self.conn is not None:
+                for i in range(0, len(missing), chunk_size):
+                    chunk = missing[i:i + chunk_size]
+                    rows = self.conn.execute(
+                        f"SELECT text_hash, probabilities FROM predictions WHERE model = ? "
+                        f"AND text_hash IN ({', '.join('?' * len(chunk))})",
+                        [model, *chunk]
+                    )
+                    for key, blob in rows:
+                        found[key] = np.frombuffer(blob, dtype=np.float32)
+                        self.remember((model, key), found[key])
+                        self.hits['disk'] += 1
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, model, predictions):
+        """Store {hash: probabilities} in both tiers, one transaction"""
+        rows = [(model, key, np.asarray(probabilities, dtype=np.float32).tobytes())
+                for key, probabilities in predictions.items()]
+        with self.lock:
+            for _, key, blob in rows:
+                self.remember((model, key), np.frombuffer(blob, dtype=np.float32))
+            if self.conn is not None:
+                with self.conn:
+                    self.conn.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)", rows)
+
+    def prune(self, model):
+        """Drop the entries of the other versions of model (same resolved model directory, other files)"""
+        name = model.rsplit(":", 1)[0]
+        with self.lock:
+            for key in [key for key in self.memory if key[0] != model and key[0].rsplit(":", 1)[0] == name]:
+                del self.memory[key]
+            if self.conn is not None:
+                with self.conn:
+                    self.conn.execute("DELETE FROM predictions WHERE substr(model, 1, ?) = ? AND model != ?",
+                                      [len(name) + 1, f"{name}:", model])
+
+    def hit_rate(self):
+        """Share of the lookups answered by either tier"""
+        lookups = sum(self.hits.values()) + self.misses
+        return sum(self.hits.values()) / lookups if lookups else 0.0
+
+    def stats(self):
+        """Hits per tier, misses, hit rate and LRU size"""
+        return {'memory_hits': self.hits['memory'], 'disk_hits': self.hits['disk'], 'misses': self.misses,
+                'hit_rate': round(self.hit_rate(), 4), 'memory_entries': len(self.memory)}
+
+    def close(self):
+        """Close the database"""
+        if self.conn is not None:
+            self.conn.close()
@@ -0,0 +1,204 @@
+"""
+Sentiment predictor - batched, length-bucketed inference for the fine-tuned XLM-RoBERTa models
+
+    python -m inference.predictor [--model finetuning_models/my_sentiment_model_data_augmentation]
+                                  [--backend torch|int8|onnx|onnx-int8]
+                                  [--input data/cleaned/finetuning-splits/test_set.csv] [--column text]
+                                  [--clean] [--batch-size 32] [--threads 4] [--output predictions.csv]
+
+Texts are tokenized once without padding and sorted by token length; consecutive
+texts of similar length form a batch, padded only up to its longest text (at most
+MAX_LENGTH tokens, as in training). Forward passes run under torch.inference_mode()
+and the probabilities are put back in the input order. With a PredictionCache
+(inference.prediction_cache, --cache), only the texts this version of the model
+has not scored yet go through it, each distinct text once.
+"""
+import os
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from .backends import BACKENDS, artifact_dir, load_model
+from .prediction_cache import PREDICTION_CACHE, PredictionCache, model_version, text_hash
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.path.join(REPO_ROOT, "finetuning_models", "my_sentiment_model_data_augmentation")
+TEST_CSV = os.path.join(REPO_ROOT, "data", "cleaned", "finetuning-splits", "test_set.csv")
+BASE_TOKENIZER = "xlm-roberta-base"
+
+MAX_LENGTH = 96  # max_length of the fine-tuning notebooks
+BATCH_SIZE = 32
+LABELS = {0: "Négatif", 1: "Neutre", 2: "Positif"}
+
+
+class SentimentPredictor:
+    def __init__(self, model, tokenizer, max_length=MAX_LENGTH, batch_size=BATCH_SIZE, threads=None,
+                 cache=None, version=None):
+        """Wrap a loaded sequence-classification model and its tokenizer
+
+        threads sets torch's intra-op thread count (None leaves torch's default).
+        cache is a PredictionCache, used with version, the model_version of the model.
+        """
+        import torch
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = model.eval()
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.batches = []  # per-batch stats of the last call
+        if cache is not None and version is None:
+            raise ValueError("A prediction cache needs the model version, see prediction_cache.model_version")
+        self.cache = cache
+        self.version = version
+        if cache is not None:
+            cache.prune(version)
+
+    @classmethod
+    def from_pretrained(cls, model_path=MODEL_DIR, tokenizer_path=None, backend='torch', **options):
+        """Load a saved model, or its optimized artifact for backend (see inference.backends)
+
+        tokenizer_path defaults to the model directory, else xlm-roberta-base.
+        cache=True opens the shared on-disk PredictionCache, or pass a PredictionCache.
+        """
+        from transformers import AutoTokenizer
+
+        if tokenizer_path is None:
+            has_tokenizer = os.path.exists(os.path.join(model_path, "tokenizer_config.json"))
+            tokenizer_path = model_path if has_tokenizer else BASE_TOKENIZER
+        tokenizer = AutoTokenizer.from_pretrained(tokenizer_path)
+        model = load_model(model_path, backend, threads=options.get('threads'))
+        if options.get('cache') is True:
+            options['cache'] = PredictionCache(PREDICTION_CACHE)
+        if options.get('cache') is not None:
+            options['version'] = model_version(artifact_dir(model_path, backend), tokenizer_path,
+                                               options.get('max_length', MAX_LENGTH))
+        return cls(model, tokenizer, **options)
+
+    def buckets(self, encodings):
+        """Batches of input positions, texts of similar token length together"""
+        order = np.argsort([len(ids) for ids in encodings['input_ids']], kind='stable')
+        return [order[i:i + self.batch_size] for i in range(0, len(order), self.batch_size)]
+
+    def forward(self, features):
+        """Class probabilities of one padded batch"""
+        import torch
+
+        logits = self.model(**features).logits
+        return torch.softmax(logits.float(), dim=-1).numpy()
+
+    def predict_proba(self, texts, verbose=False):
+        """Class probabilities of every text, shape (len(texts), num_labels), in the input order"""
+        texts = ["" if pd.isna(text) else str(text) for text in texts]
+        if self.cache is None or not texts:
+            return self.compute(texts, verbose)
+
+        hashes = [text_hash(text) for text in texts]
+        unique = dict(zip(hashes, texts))
+        found = self.cache.get_many(self.version, list(unique))
+        new = [key for key in unique if key not in found]
+        self.batches = []
+        if new:
+            probabilities = self.compute([unique[key] for key in new], verbose)
+            self.cache.put_many(self.version, dict(zip(new, probabilities)))
+            found.update(zip(new, probabilities))
+        if verbose:
+            print(f"Prediction cache: {len(unique) - len(new):,} of {len(unique):,} distinct texts already scored "
+                  f"(hit rate {self.cache.hit_rate():.1%} since loading)")
+        return np.stack([found[key] for key in hashes]).astype(np.float32)
+
+    def compute(self, texts, verbose=False):
+        """predict_proba of a list of strings, without the cache"""
+        import torch
+
+        self.batches = []
+        if not texts:
+            return np.zeros((0, self.model.config.num_labels), dtype=np.float32)
+
+        encodings = self.tokenizer(texts, truncation=True, max_length=self.max_length)
+        probabilities = np.zeros((len(texts), self.model.config.num_labels), dtype=np.float32)
+        start = time.perf_counter()
+        with torch.inference_mode():
+            for number, positions in enumerate(self.buckets(encodings), 1):
+                batch_start = time.perf_counter()
+                features = self.tokenizer.pad(
+                    {key: [encodings[key][i] for i in positions] for key in encodings.keys()},
+                    padding='longest', return_tensors='pt'
+                )
+                probabilities[positions] = self.forward(features)
+
+                seconds = time.perf_counter() - batch_start
+                self.batches.append({'batch': number, 'texts': len(positions),
+                                     'tokens': int(features['input_ids'].shape[1]), 'seconds': round(seconds, 4),
+                                     'texts_per_s': round(len(positions) / seconds, 1) if seconds else None})
+                if verbose:
+                    print(f"   batch {number:>4}  {len(positions):>3} texts x {features['input_ids'].shape[1]:>3} tokens  "
+                          f"{len(positions) / seconds:,.1f} texts/s")
+        if verbose:
+            elapsed = time.perf_counter() - start
+            print(f"{len(texts):,} texts in {elapsed:.2f}s ({len(texts) / elapsed:,.1f} texts/s)")
+        return probabilities
+
+    def predict(self, texts, verbose=False):
+        """Predicted class of every text"""
+        return self.predict_proba(texts, verbose=verbose).argmax(axis=1)
+
+    def throughput(self):
+        """Texts per second over the last call"""
+        seconds = sum(batch['seconds'] for batch in self.batches)
+        return sum(batch['texts'] for batch in self.batches) / seconds if seconds else 0.0
+
+
+# ========== BATCH SCORING ==========
+
+def score_csv(predictor, input_path=TEST_CSV, column='text', clean=False, output=None):
+    """Predict a CSV column; prints accuracy and macro-F1 when the file has a label column"""
+    df = pd.read_csv(input_path, encoding='utf-8-sig')
+    texts = df[column]
+    if clean:
+        from preprocessing import clean_text_light_batch
+        texts = clean_text_light_batch(texts)
+
+    probabilities = predictor.predict_proba(texts.tolist(), verbose=True)
+    df['pred'] = probabilities.argmax(axis=1)
+    df['confidence'] = probabilities.max(axis=1)
+    cache = getattr(predictor, 'cache', None)
+    if cache is not None:
+        print(f"Prediction cache: {cache.stats()}")
+
+    if 'label' in df.columns:
+        from sklearn.metrics import accuracy_score, f1_score
+        print(f"Accuracy: {accuracy_score(df['label'], df['pred']):.4f}  "
+              f"F1-macro: {f1_score(df['label'], df['pred'], average='macro'):.4f}")
+    if output:
+        df.to_csv(output, index=False, encoding='utf-8-sig')
+        print(f"Saved the predictions to: {output}")
+    return df
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Score a CSV of reviews with a fine-tuned sentiment model")
+    parser.add_argument("--model", default=MODEL_DIR, help="saved model directory")
+    parser.add_argument("--backend", default='torch', choices=BACKENDS, help="model backend (see inference.export)")
+    parser.add_argument("--tokenizer", default=None, help="tokenizer (default: the model's, else xlm-roberta-base)")
+    parser.add_argument("--input", default=TEST_CSV, help="CSV to score")
+    parser.add_argument("--column", default="text", help="text column (comment for raw reviews, with --clean)")
+    parser.add_argument("--clean", action="store_true", help="apply clean_text_light first (raw comments)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="texts per forward pass")
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads (torch or ONNX Runtime)")
+    parser.add_argument("--output", default=None, help="CSV with pred and confidence columns")
+    parser.add_argument("--cache", action="store_true", help="reuse and store predictions in data/cache/predictions.db")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    predictor = SentimentPredictor.from_pretrained(args.model, args.tokenizer, backend=args.backend,
+                                                   batch_size=args.batch_size, threads=args.threads,
+                                                   cache=args.cache or None)
+    score_csv(predictor, args.input, column=args.column, clean=args.clean, output=args.output)
@@ -0,0 +1,18 @@
+"""
+Shared text preprocessing for training notebooks, app.py and batch scoring
+"""
+from .text_cleaning import (
+    clean_text_light,
+    clean_text_light_batch,
+    clean_text_ml,
+    clean_text_ml_batch,
+    remove_stopwords,
+    remove_stopwords_batch,
+    preprocess_ml_batch,
+    preprocess_ml_deep_batch,
+    load_stopwords,
+    DEEP_CLEANING,
+    EMOJI_REPLACEMENTS,
+    NEGATIONS,
+)
+from .labels import rating_to_sentiment, rating_to_sentiment_batch, SENTIMENT_MAP
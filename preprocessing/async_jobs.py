@@ -0,0 +1,103 @@
+"""
+Async jobs - bounded, rate-limited and retrying concurrent calls to blocking services
+
+Used by the translation service and the LLM back-fill: the blocking client call
+runs in a worker thread, at most `concurrency` calls are in flight, calls are
+spaced to stay under `rate` per second and failures are retried with
+exponential backoff before being reported.
+"""
+import time
+import random
+import asyncio
+import threading
+
+
+MAX_CONCURRENCY = 8
+MAX_RETRIES = 3
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+
+class RateLimiter:
+    def __init__(self, rate=None):
+        """Spaces calls to at most `rate` per second (None: no limit)"""
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    async def wait(self):
+        """Wait for the next free slot"""
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, maximum=BACKOFF_MAX):
+    """Exponential backoff with jitter before retry number `attempt` (1-based)"""
+    delay = min(maximum, base * 2 ** (attempt - 1))
+    return delay * (0.5 + random.random() / 2)
+
+
+async def call_with_retries(func, args, limiter, retries=MAX_RETRIES, backoff=BACKOFF_BASE):
+    """Run func(*args) in a thread, retrying on any exception
+
+    Returns (result, None) on success, (None, last_exception) once the retries are exhausted.
+    """
+    error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            await asyncio.sleep(backoff_delay(attempt, backoff))
+        await limiter.wait()
+        try:
+            return await asyncio.to_thread(func, *args), None
+        except Exception as e:
+            error = e
+    return None, error
+
+
+async def map_async(func, items, concurrency=MAX_CONCURRENCY, rate=None, retries=MAX_RETRIES,
+                    backoff=BACKOFF_BASE, on_result=None):
+    """Call func(*item) for every item with bounded concurrency, in input order
+
+    on_result(item, result, error) is called as soon as each call finishes
+    (checkpointing, caching, progress).
+    """
+    limiter = RateLimiter(rate)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(item):
+        async with semaphore:
+            result, error = await call_with_retries(func, item, limiter, retries, backoff)
+        if on_result is not None:
+            on_result(item, result, error)
+        return result, error
+
+    return await asyncio.gather(*(run(item) for item in items))
+
+
+def run_sync(coroutine):
+    """Run a coroutine to completion, also from Jupyter where an event loop is already running"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    result = {}
+
+    def target():
+        try:
+            result['value'] = asyncio.run(coroutine)
+        except BaseException as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    if 'error' in result:
+        raise result['error']
+    return result['value']
@@ -0,0 +1,276 @@
+"""
+Augmentation runner - balances the ML train split with back-translation and synonyms on every core
+
+    python -m preprocessing.augment_runner [--workers 4] [--target 0:250 1:250 2:250 | --ratio 0:1 1:0.8 2:1]
+                                           [--backend google|opus-mt|fake] [--seed 42] [--force]
+
+Rows to augment are cut into shards handled by a process pool, each worker
+loading its models once. Every row gets a seed derived from the base seed, its
+label and its text, so the output does not depend on the number of workers or
+the shard size. Originals and augmentations stream class by class into
+augmented_simple/train_augmented.csv, deduplicated on the fly: exact duplicates
+as the notebook's drop_duplicates, plus augmentations that are near-duplicates
+of a text already written (MinHash index). Goes through the stage cache: nothing runs when
+the train split, the code and the parameters are unchanged.
+"""
+import os
+import time
+import argparse
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from . import augmentation
+from .augmentation import augment_texts, derive_seed, seeded_synonyms
+from .embeddings import EmbeddingCache, SemanticFilter, EMBED_MODEL
+from .near_duplicates import NearDuplicateIndex
+from .pipeline import RANDOM_SEED, SplitWriter
+from .stage_cache import StageCache
+from .stages import ML_TRAIN_CSV, AUGMENTED_CSV, augment_stage
+from .translation import TranslationService, GoogleBackend, HuggingFaceBackend, FakeBackend, REQUESTS_PER_SECOND
+
+
+TARGET = {0: 250, 1: 250, 2: 250}
+SHARD_SIZE = 16
+NEAR_DUPLICATE_THRESHOLD = 0.9  # augmentations this close to a written text are dropped
+WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+BACKENDS = {'google': GoogleBackend, 'opus-mt': HuggingFaceBackend, 'fake': FakeBackend}
+NLTK_RESOURCES = {'taggers/averaged_perceptron_tagger_eng': 'averaged_perceptron_tagger_eng',
+                  'corpora/omw-1.4': 'omw-1.4'}
+
+
+# ========== PLANNING ==========
+
+def class_targets(counts, target=None, ratios=None):
+    """Wanted rows per class: absolute targets, or ratios of the largest class"""
+    if ratios:
+        largest = max(counts.values())
+        return {label: int(round(ratios[label] * largest)) if label in ratios else count
+                for label, count in counts.items()}
+    target = TARGET if target is None else target
+    return {label: target.get(label, count) for label, count in counts.items()}
+
+
+def augmentation_plan(df, targets, seed=RANDOM_SEED):
+    """(label, originals, tasks) per class, a task being (text, n_aug, row_seed)"""
+    plan = []
+    for label, group in df.groupby('label'):
+        texts = group['text_clean'].tolist()
+        tasks = []
+        if len(texts) < targets.get(label, len(texts)):
+            # same per-row count as the notebook
+            per_sample = max(1, (targets[label] - len(texts)) // len(texts) + 1)
+            tasks = [(text, per_sample, derive_seed(seed, label, text)) for text in texts]
+        plan.append((label, texts, tasks))
+    return plan
+
+
+# ========== WORKERS ==========
+
+_worker = {}
+
+
+def load_models(backend='google', embed_model=EMBED_MODEL, threads=None, rate=REQUESTS_PER_SECOND):
+    """Translator, similarity filter and synonym augmenter of one process"""
+    import nltk
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from nlpaug.augmenter.word import SynonymAug
+
+    for path, name in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            nltk.download(name, quiet=True)
+    if threads:
+        torch.set_num_threads(threads)
+
+    _worker['translator'] = TranslationService(BACKENDS[backend](), rate=rate)
+    _worker['filter'] = SemanticFilter(SentenceTransformer(embed_model), model_name=embed_model,
+                                       cache=EmbeddingCache())
+    _worker['synonym'] = seeded_synonyms(SynonymAug(aug_src='wordnet', lang='fra', aug_p=0.1))
+
+
+def timed(timings, name, func):
+    """func, adding its run time to timings[name]"""
+    def run(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings[name] += time.perf_counter() - start
+    return run
+
+
+def augment_shard(tasks):
+    """Augmentations of one shard of rows (all of the same class), with the time spent per step"""
+    timings = Counter()
+    start = time.perf_counter()
+    augmented = augment_texts(
+        [text for text, _, _ in tasks], tasks[0][1],
+        timed(timings, 'translation', _worker['translator'].back_translate),
+        timed(timings, 'synonyms', _worker['synonym']),
+        _worker['filter'],
+        seeds=[seed for _, _, seed in tasks],
+    )
+    # what is left is encoding and similarity
+    timings['similarity'] = time.perf_counter() - start - timings['translation'] - timings['synonyms']
+    return augmented, dict(timings)
+
+
+# ========== RUN ==========
+
+def run_augmentation(input_path=ML_TRAIN_CSV, output_path=AUGMENTED_CSV, target=None, ratios=None,
+                     seed=RANDOM_SEED, backend='google', embed_model=EMBED_MODEL,
+                     near_duplicate_threshold=NEAR_DUPLICATE_THRESHOLD,
+                     workers=WORKERS, shard_size=SHARD_SIZE, rate=REQUESTS_PER_SECOND):
+    """Augment the under-represented classes of the train split up to their targets
+
+    rate is the total of translation requests per second, shared by the workers (0: no limit),
+    near_duplicate_threshold=0 only drops exact duplicates.
+    """
+    start = time.time()
+    df = pd.read_csv(input_path, encoding='utf-8-sig')
+    targets = class_targets(df['label'].value_counts().to_dict(), target, ratios)
+    plan = augmentation_plan(df, targets, seed)
+    shards = [tasks[i:i + shard_size] for _, _, tasks in plan for i in range(0, len(tasks), shard_size)]
+    print(f"Augmenting {sum(len(shard) for shard in shards)} rows in {len(shards)} shards "
+          f"with {workers} worker(s), targets {targets}")
+
+    executor = None
+    if shards and workers > 1:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=load_models,
+                                       initargs=(backend, embed_model, threads, rate / workers if rate else None))
+        results = executor.map(augment_shard, shards)
+    elif shards:
+        load_models(backend, embed_model, rate=rate or None)
+        results = map(augment_shard, shards)
+    else:
+        results = iter(())
+
+    writer = SplitWriter(output_path, ['text_clean', 'label', 'is_aug'])
+    seen = set()
+    index = NearDuplicateIndex(near_duplicate_threshold) if near_duplicate_threshold else None
+    near_duplicates = Counter()
+    timings = Counter()
+    done = 0
+
+    def write(texts, label, is_aug):
+        """Append rows whose text was not written yet, and augmentations that are not near-duplicates"""
+        rows = []
+        for text in texts:
+            if text in seen:
+                continue
+            if index is not None:
+                if not is_aug:
+                    index.add(len(seen), text)
+                elif index.add_if_new(len(seen), text) is not None:
+                    near_duplicates[label] += 1
+                    continue
+            seen.add(text)
+            rows.append(text)
+        writer.write(pd.DataFrame({'text_clean': rows, 'label': label, 'is_aug': is_aug}), 'label')
+
+    try:
+        for label, originals, tasks in plan:
+            write(originals, label, False)
+            for _ in range(0, len(tasks), shard_size):
+                augmented, shard_timings = next(results)
+                timings.update(shard_timings)
+                write([text for texts in augmented for text in texts], label, True)
+                done += 1
+                elapsed = time.time() - start
+                print(f"   shard {done}/{len(shards)} (label {label})  {writer.rows:,} rows written  "
+                      f"{elapsed:.1f}s")
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    writer.commit()
+
+    elapsed = time.time() - start
+    print(f"\nAugmentation finished in {elapsed:.1f}s")
+    for label, originals, _ in plan:
+        print(f"   label {label}: {len(originals):>5} originals  target {targets[label]:>5}  "
+              f"{writer.labels[label]:>5} written  {near_duplicates[label]:>4} near-duplicates dropped")
+    print("   time per step (summed over workers): " +
+          ", ".join(f"{name} {seconds:.1f}s" for name, seconds in sorted(timings.items())))
+    return {'rows': writer.rows, 'labels': dict(writer.labels), 'targets': targets,
+            'near_duplicates': dict(near_duplicates),
+            'seconds': round(elapsed, 3), 'steps': {name: round(s, 3) for name, s in timings.items()}}
+
+
+def augment_with_cache(cache=None, target=None, ratios=None, seed=RANDOM_SEED, backend='google',
+                       embed_model=EMBED_MODEL, near_duplicate_threshold=NEAR_DUPLICATE_THRESHOLD,
+                       workers=WORKERS, shard_size=SHARD_SIZE, rate=REQUESTS_PER_SECOND, force=False):
+    """run_augmentation as the cached augment stage (workers, shard size and rate are not part of the key)
+
+    The code key covers what shapes the output: the worker models (load_models, the
+    synonym augmenter and NLTK resources), the augmentation module with its
+    similarity thresholds, the semantic filter, the near-duplicate index and the
+    translation service and backends.
+    """
+    return augment_stage(
+        cache or StageCache(), run_augmentation,
+        code=[class_targets, augmentation_plan, load_models, repr(NLTK_RESOURCES), augment_shard, augmentation,
+              SemanticFilter, NearDuplicateIndex, TranslationService, *BACKENDS.values()],
+        params={'target': target if target or ratios else TARGET, 'ratios': ratios, 'seed': seed,
+                'backend': backend, 'embed_model': embed_model, 'near_duplicate_threshold': near_duplicate_threshold},
+        options={'workers': workers, 'shard_size': shard_size, 'rate': rate},
+        force=force,
+    )
+
+
+def recorded_params(cache=None):
+    """augment_with_cache arguments of the last augment run ({} if it never ran), as preprocessing.stages reruns it"""
+    params = (cache or StageCache()).load_record('augment').get('params', {})
+    arguments = {name: params[name] for name in ('target', 'ratios', 'seed', 'backend', 'embed_model',
+                                                 'near_duplicate_threshold') if name in params}
+    # JSON turned the class labels into strings
+    for name in ('target', 'ratios'):
+        if arguments.get(name):
+            arguments[name] = {int(label): value for label, value in arguments[name].items()}
+    return arguments
+
+
+def parse_class_values(values, cast):
+    """["0:250", "1:250"] -> {0: 250, 1: 250}"""
+    if not values:
+        return None
+    pairs = (value.split(':') for value in values)
+    return {int(label): cast(amount) for label, amount in pairs}
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Balance the ML train split with data augmentation")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--target", nargs="+", metavar="LABEL:ROWS", help="rows wanted per class (default: 250 each)")
+    group.add_argument("--ratio", nargs="+", metavar="LABEL:RATIO",
+                       help="rows wanted per class, relative to the largest")
+    parser.add_argument("--seed", type=int, default=RANDOM_SEED, help="base seed of the per-row seeds")
+    parser.add_argument("--backend", default='google', choices=sorted(BACKENDS), help="translation backend")
+    parser.add_argument("--embed-model", default=EMBED_MODEL, help="sentence embedding model of the filter")
+    parser.add_argument("--near-duplicate-threshold", type=float, default=NEAR_DUPLICATE_THRESHOLD,
+                        help="drop augmentations this similar to a written text (0: exact duplicates only)")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="worker processes")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="rows per shard")
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND,
+                        help="translation requests per second, all workers together (0: no limit)")
+    parser.add_argument("--force", action="store_true", help="rerun even if the stage is up to date")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    augment_with_cache(target=parse_class_values(args.target, int), ratios=parse_class_values(args.ratio, float),
+                       seed=args.seed, backend=args.backend, embed_model=args.embed_model,
+                       near_duplicate_threshold=args.near_duplicate_threshold,
+                       workers=args.workers, shard_size=args.shard_size, rate=args.rate, force=args.force)
@@ -0,0 +1,79 @@
+"""
+Data augmentation - back-translation and synonym candidates filtered by semantic similarity in batches
+
+augment_texts gives the same result as calling the notebook's augment_text on
+every text, but works in rounds over all the texts at once: one round per pivot
+language, then synonym rounds. Each round's candidates are checked with a single
+batched SemanticFilter call, so the originals are encoded once and the number of
+forward passes depends on the rounds, not on the number of candidates.
+"""
+import random
+import hashlib
+
+import numpy as np
+
+
+PIVOTS = ['en', 'de', 'es']
+BACK_TRANSLATION_THRESHOLD = 0.80
+SYNONYM_THRESHOLD = 0.90
+
+
+def derive_seed(*parts):
+    """32-bit seed derived from any values (base seed, text, attempt...)"""
+    digest = hashlib.sha256("\x1f".join(map(str, parts)).encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'little')
+
+
+def seeded_synonyms(augmenter):
+    """synonym(text, seed) over an nlpaug augmenter, reseeding its random generators on every call"""
+    def synonym(text, seed):
+        random.seed(seed)
+        np.random.seed(seed)
+        syn = augmenter.augment(text)
+        # recent nlpaug versions return a list
+        return syn[0] if isinstance(syn, list) and syn else syn or None
+    return synonym
+
+
+def augment_texts(texts, n_aug, back_translate, synonym, sim_filter, pivots=PIVOTS, seeds=None):
+    """Up to n_aug augmentations of each text, as one list per text
+
+    back_translate(texts, pivot) returns one candidate or None per text (see
+    TranslationService.back_translate, which translates the whole round
+    concurrently), synonym(text, seed) a candidate or None, sim_filter is a SemanticFilter.
+    Every synonym attempt gets its own seed derived from the row seed (default:
+    derived from the text), so results do not depend on how rows are batched.
+    """
+    texts = list(texts)
+    seeds = [derive_seed(text) for text in texts] if seeds is None else list(seeds)
+    augmented = [[] for _ in texts]
+    attempts = [0] * len(texts)
+
+    # Back-translation: one round per pivot, for the texts that still need augmentations
+    for pivot in pivots:
+        needed = [i for i in range(len(texts)) if len(augmented[i]) < n_aug]
+        translations = back_translate([texts[i] for i in needed], pivot) if needed else []
+        candidates = [(i, bt) for i, bt in zip(needed, translations) if bt]
+        keep = sim_filter.keep([texts[i] for i, _ in candidates], [bt for _, bt in candidates],
+                               threshold=BACK_TRANSLATION_THRESHOLD)
+        for (i, bt), kept in zip(candidates, keep):
+            if kept:
+                augmented[i].append(bt)
+
+    # Synonyms: a text stops at its first rejected candidate
+    active = [i for i in range(len(texts)) if len(augmented[i]) < n_aug]
+    while active:
+        candidates = []
+        for i in active:
+            attempts[i] += 1
+            candidates.append((i, synonym(texts[i], derive_seed(seeds[i], attempts[i]))))
+        candidates = [(i, syn) for i, syn in candidates if syn and syn != texts[i]]
+        keep = sim_filter.keep([texts[i] for i, _ in candidates], [syn for _, syn in candidates],
+                               threshold=SYNONYM_THRESHOLD)
+        active = []
+        for (i, syn), kept in zip(candidates, keep):
+            if kept:
+                augmented[i].append(syn)
+                if len(augmented[i]) < n_aug:
+                    active.append(i)
+    return augmented
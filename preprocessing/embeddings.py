@@ -0,0 +1,126 @@
+"""
+Sentence embeddings - batched encoding with an on-disk cache, and the semantic similarity filter
+
+Texts are encoded once per model: vectors are stored in SQLite keyed by the hash
+of the text, so a rerun of the augmentation does not encode anything it has
+already seen. Similarities between many (original, candidate) pairs are one
+matrix operation on normalized vectors.
+"""
+import os
+import sqlite3
+import hashlib
+import threading
+
+import numpy as np
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EMBEDDING_CACHE = os.path.join(REPO_ROOT, "data", "cache", "embeddings.db")
+EMBED_MODEL = 'dangvantuan/sentence-camembert-base'
+BATCH_SIZE = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model     TEXT,
+    text_hash TEXT,
+    vector    BLOB,
+    PRIMARY KEY (model, text_hash)
+);
+"""
+
+
+def text_hash(text):
+    """Cache key of a text"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, db_filename=EMBEDDING_CACHE):
+        """Open (or create) the SQLite embedding cache"""
+        directory = os.path.dirname(db_filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_filename, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def get_many(self, model, hashes, chunk_size=500):
+        """Cached vectors of the given text hashes, as {hash: vector}"""
+        found = {}
+        with self.lock:
+            for i in range(0, len(hashes), chunk_size):
+                chunk = hashes[i:i + chunk_size]
+                rows = self.conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? "
+                    f"AND text_hash IN ({', '.join('?' * len(chunk))})",
+                    [model, *chunk]
+                )
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model, vectors):
+        """Store {hash: vector} in one transaction"""
+        rows = [(model, key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in vectors.items()]
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+
+    def close(self):
+        """Close the database"""
+        self.conn.close()
+
+
+class SemanticFilter:
+    def __init__(self, model, model_name=EMBED_MODEL, cache=None, batch_size=BATCH_SIZE):
+        """Cosine similarity filter over a SentenceTransformer, with cached embeddings
+
+        cache=None keeps the vectors in memory only.
+        """
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache
+        self.batch_size = batch_size
+        self.vectors = {}
+        self.encoded = 0
+
+    def encode(self, texts):
+        """Normalized embeddings of texts (one row per text), encoding only unseen texts"""
+        hashes = [text_hash(text) for text in texts]
+        missing = [key for key in dict.fromkeys(hashes) if key not in self.vectors]
+
+        if missing and self.cache is not None:
+            self.vectors.update(self.cache.get_many(self.model_name, missing))
+            missing = [key for key in missing if key not in self.vectors]
+
+        if missing:
+            wanted = set(missing)
+            missing_texts = {key: text for key, text in zip(hashes, texts) if key in wanted}
+            batch = self.model.encode(list(missing_texts.values()), batch_size=self.batch_size,
+                                      convert_to_numpy=True, normalize_embeddings=True)
+            new_vectors = dict(zip(missing_texts, np.asarray(batch, dtype=np.float32)))
+            self.vectors.update(new_vectors)
+            self.encoded += len(new_vectors)
+            if self.cache is not None:
+                self.cache.put_many(self.model_name, new_vectors)
+
+        if not hashes:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([self.vectors[key] for key in hashes])
+
+    def similarities(self, originals, candidates):
+        """Cosine similarity of each (original, candidate) pair"""
+        if len(candidates) == 0:
+            return np.empty(0, dtype=np.float32)
+        # one encode call for both sides, originals already seen come from the cache
+        vectors = self.encode(list(originals) + list(candidates))
+        return np.einsum('ij,ij->i', vectors[:len(originals)], vectors[len(originals):])
+
+    def keep(self, originals, candidates, threshold=0.80):
+        """Mask of the candidates at least `threshold` similar to their original"""
+        return self.similarities(originals, candidates) >= threshold
+
+    def is_semantic_sim(self, orig, aug, threshold=0.80):
+        """Single pair version, same answer as the notebook's is_semantic_sim"""
+        return bool(self.keep([orig], [aug], threshold)[0])
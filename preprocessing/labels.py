@@ -0,0 +1,24 @@
+"""
+Sentiment labels - rating to sentiment mapping shared by the notebooks and the pipeline
+"""
+import numpy as np
+import pandas as pd
+
+
+SENTIMENT_MAP = {'negatif': 0, 'neutre': 1, 'positif': 2}
+
+
+def rating_to_sentiment(rating):
+    if rating >= 4:
+        return 'positif'
+    elif rating == 3:
+        return 'neutre'
+    else:
+        return 'negatif'
+
+
+def rating_to_sentiment_batch(ratings):
+    """Vectorized rating_to_sentiment over a Series of ratings"""
+    ratings = pd.to_numeric(pd.Series(ratings), errors='coerce')
+    labels = np.select([ratings >= 4, ratings == 3], ['positif', 'neutre'], default='negatif')
+    return pd.Series(labels, index=ratings.index)
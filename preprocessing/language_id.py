@@ -0,0 +1,281 @@
+"""
+Language identification - character n-gram model trained on our own reviews, batched and cached
+
+    python -m preprocessing.language_id train [--input data/raw/reviews.db]
+    python -m preprocessing.language_id detect [--input data/raw/all_california_gym_reviews.csv]
+
+Labels: fr, en, arabizi (Tunisian in Latin script: "barcha", "behi", "3ala"...),
+ar (Arabic script) and unknown (empty or no letters).
+
+Training is weakly supervised: reviews whose function words clearly point to one
+language (SEED_WORDS) label the corpus, the seed words themselves are added as
+tiny documents, and a multinomial Naive Bayes over character 1-3-grams learns
+from them. The model is a small JSON file (preprocessing/langid_model.json);
+predictions are deterministic and cached by text hash and model version in
+data/cache/languages.db, so only new texts are scored.
+"""
+import os
+import re
+import json
+import math
+import sqlite3
+import hashlib
+import argparse
+import threading
+from collections import Counter
+
+import pandas as pd
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "langid_model.json")
+LANGUAGE_CACHE = os.path.join(REPO_ROOT, "data", "cache", "languages.db")
+RAW_DB = os.path.join(REPO_ROOT, "data", "raw", "reviews.db")
+RAW_CSV = os.path.join(REPO_ROOT, "data", "raw", "all_california_gym_reviews.csv")
+
+NGRAM_SIZES = (1, 2, 3)
+MAX_NGRAMS = 4000  # kept per language in the saved model
+SEED_WEIGHT = 3  # times each seed word is added as a document
+
+SEED_WORDS = {
+    'fr': {"le", "la", "les", "des", "est", "et", "très", "pas", "une", "pour", "avec", "je", "du", "en", "que",
+           "qui", "mais", "trop", "bien", "salle", "sont", "il", "elle", "nous", "vous", "on", "au", "aux", "ce",
+           "cette", "plus", "tout", "tous", "personnel", "propre", "bonne", "bon", "prix", "merci", "vraiment"},
+    'en': {"the", "and", "is", "very", "great", "good", "staff", "place", "with", "for", "but", "not", "it",
+           "this", "was", "are", "you", "they", "of", "to", "best", "really", "clean", "nice", "equipment",
+           "friendly", "price", "there", "have", "has"},
+    'arabizi': {"barcha", "behi", "behya", "mouch", "mech", "3ala", "3and", "fama", "famma", "ama", "brabi",
+                "yesser", "yeser", "ya5i", "kifech", "7aja", "w", "fi", "el", "ne9es", "mte3", "hakka", "chay",
+                "y7achem", "yradded", "sahit", "3aychek", "bahi", "lkol", "mouhich", "ye5i", "9a3da", "7ata",
+                "zeda", "kima", "tawa", "chwaya", "ken", "3lech", "wallah"},
+}
+
+ARABIC_REGEX = re.compile(r"[؀-ۿݐ-ݿﭐ-﷿ﹰ-﻿]")
+LETTER_REGEX = re.compile(r"[^\W\d_]")
+WORD_REGEX = re.compile(r"[\w']+")
+ARABIZI_REGEX = re.compile(r"^(?=.*[a-z])[a-z]*[235789][a-z]+$|^[a-z]+[235789]$")  # "3ala", "ne9es", "t7esha"
+ARABIC_SHARE = 0.3  # share of Arabic letters from which a text is "ar"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS languages (
+    model     TEXT,
+    text_hash TEXT,
+    lang      TEXT,
+    PRIMARY KEY (model, text_hash)
+);
+"""
+
+
+def normalize(text):
+    """Lowercase words (letters, digits, apostrophes) with single spaces, padded so n-grams see word boundaries"""
+    return " " + " ".join(WORD_REGEX.findall(str(text).lower().replace("’", "'"))) + " "
+
+
+def ngrams(text, sizes=NGRAM_SIZES):
+    """Character n-grams of a normalized text"""
+    return [text[i:i + n] for n in sizes for i in range(len(text) - n + 1)]
+
+
+def seed_label(text, min_hits=2):
+    """Language whose seed words clearly dominate the text, else None"""
+    hits = Counter()
+    for word in WORD_REGEX.findall(str(text).lower()):
+        if ARABIZI_REGEX.match(word):
+            hits['arabizi'] += 1
+            continue
+        for lang, words in SEED_WORDS.items():
+            if word in words:
+                hits[lang] += 1
+    if not hits:
+        return None
+    (best, count), *others = hits.most_common() + [(None, 0)]
+    return best if count >= min_hits and count >= 2 * others[0][1] else None
+
+
+def script_label(text):
+    """"ar" or "unknown" when the script alone decides, else None"""
+    letters = LETTER_REGEX.findall(str(text))
+    if not letters:
+        return 'unknown'
+    if len(ARABIC_REGEX.findall(str(text))) / len(letters) >= ARABIC_SHARE:
+        return 'ar'
+    return None
+
+
+class LanguageIdentifier:
+    def __init__(self, counts=None, totals=None, documents=None, vocabulary_size=1):
+        """Naive Bayes over character n-grams: counts[lang][ngram], totals[lang], documents[lang]"""
+        self.counts = counts or {}
+        self.totals = totals or {}
+        self.documents = documents or {}
+        self.vocabulary_size = vocabulary_size
+        self.prepare()
+
+    def prepare(self):
+        """Log-probabilities used at prediction time"""
+        self.log_probs = {}
+        self.log_unseen = {}
+        # class priors: short texts ("Top", "Cool") fall back on the language of most reviews
+        n_documents = sum(self.documents.values()) + len(self.documents)
+        self.log_priors = {lang: math.log((count + 1) / n_documents) for lang, count in self.documents.items()}
+        for lang, counts in self.counts.items():
+            denominator = self.totals[lang] + self.vocabulary_size
+            self.log_probs[lang] = {gram: math.log((count + 1) / denominator) for gram, count in counts.items()}
+            self.log_unseen[lang] = math.log(1 / denominator)
+        self.version = hashlib.sha1(json.dumps(self.to_dict(), sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+    # ========== TRAINING ==========
+
+    @classmethod
+    def fit(cls, texts, max_ngrams=MAX_NGRAMS):
+        """Train on the reviews that the seed words label, plus the seed words themselves"""
+        counts = {lang: Counter() for lang in SEED_WORDS}
+        documents = Counter({lang: 0 for lang in SEED_WORDS})
+        for text in texts:
+            if script_label(text) is not None:
+                continue
+            lang = seed_label(text)
+            if lang is not None:
+                counts[lang].update(ngrams(normalize(text)))
+                documents[lang] += 1
+        for lang, words in SEED_WORDS.items():
+            for word in words:
+                for _ in range(SEED_WEIGHT):
+                    counts[lang].update(ngrams(normalize(word)))
+
+        vocabulary = set().union(*counts.values())
+        totals = {lang: sum(grams.values()) for lang, grams in counts.items()}
+        kept = {lang: dict(grams.most_common(max_ngrams)) for lang, grams in counts.items()}
+        return cls(kept, totals, dict(documents), len(vocabulary))
+
+    def to_dict(self):
+        """JSON-serializable model"""
+        return {'counts': self.counts, 'totals': self.totals, 'documents': self.documents,
+                'vocabulary_size': self.vocabulary_size}
+
+    def save(self, path=MODEL_PATH):
+        """Write the model as JSON"""
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, sort_keys=True)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        """Read a model written by save()"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(**json.load(f))
+
+    # ========== PREDICTION ==========
+
+    def predict(self, text):
+        """Language of one text"""
+        if not isinstance(text, str) or not text.strip():
+            return 'unknown'
+        lang = script_label(text)
+        if lang is not None:
+            return lang
+
+        grams = Counter(ngrams(normalize(text)))
+        scores = {}
+        for lang, log_probs in self.log_probs.items():
+            unseen = self.log_unseen[lang]
+            scores[lang] = self.log_priors.get(lang, 0.0) + sum(count * log_probs.get(gram, unseen) for gram, count in grams.items())
+        return max(scores, key=scores.get)
+
+
+class LanguageCache:
+    def __init__(self, db_filename=LANGUAGE_CACHE):
+        """Open (or create) the SQLite language cache"""
+        directory = os.path.dirname(db_filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_filename, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def get_many(self, model, hashes, chunk_size=500):
+        """Cached languages of the given text hashes, as {hash: lang}"""
+        found = {}
+        with self.lock:
+            for i in range(0, len(hashes), chunk_size):
+                chunk = hashes[i:i + chunk_size]
+                rows = self.conn.execute(
+                    f"SELECT text_hash, lang FROM languages WHERE model = ? "
+                    f"AND text_hash IN ({', '.join('?' * len(chunk))})",
+                    [model, *chunk]
+                )
+                found.update(rows)
+        return found
+
+    def put_many(self, model, languages):
+        """Store {hash: lang} in one transaction"""
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO languages VALUES (?, ?, ?)",
+                                  [(model, key, lang) for key, lang in languages.items()])
+
+    def close(self):
+        """Close the database"""
+        self.conn.close()
+
+
+_default = {}
+
+
+def default_identifier():
+    """The shipped model, loaded once"""
+    if 'identifier' not in _default:
+        _default['identifier'] = LanguageIdentifier.load()
+    return _default['identifier']
+
+
+def detect_languages(texts, identifier=None, cache=None):
+    """Language of every text as a string Series with the same index, each distinct text scored once
+
+    cache=None keeps the results in memory only.
+    """
+    identifier = identifier or default_identifier()
+    index = texts.index if isinstance(texts, pd.Series) else None
+    values = pd.Series(texts, dtype="string").fillna("").tolist()
+
+    hashes = [hashlib.sha1(text.encode('utf-8')).hexdigest() for text in values]
+    unique = dict(zip(hashes, values))
+    found = cache.get_many(identifier.version, list(unique)) if cache is not None else {}
+    new = {key: identifier.predict(text) for key, text in unique.items() if key not in found}
+    if new and cache is not None:
+        cache.put_many(identifier.version, new)
+    found.update(new)
+    return pd.Series([found[key] for key in hashes], index=index, dtype="string")
+
+
+def read_comments(path):
+    """All comments of the review store or a CSV export"""
+    if path.endswith('.db'):
+        with sqlite3.connect(path) as conn:
+            return pd.read_sql_query("SELECT comment FROM reviews", conn)['comment']
+    return pd.read_csv(path, encoding='utf-8-sig', usecols=['comment'])['comment']
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Train the language model or tag reviews with their language")
+    parser.add_argument("command", choices=['train', 'detect'])
+    parser.add_argument("--input", default=None,
+                        help="review store (.db) or CSV export (default: data/raw/reviews.db, else the CSV)")
+    parser.add_argument("--model", default=MODEL_PATH, help="model file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    source = args.input or (RAW_DB if os.path.exists(RAW_DB) else RAW_CSV)
+    comments = read_comments(source).dropna()
+    if args.command == 'train':
+        identifier = LanguageIdentifier.fit(comments)
+        identifier.save(args.model)
+        seeded = Counter(label for label in map(seed_label, comments) if label)
+        print(f"Model trained on {sum(seeded.values())} seed-labelled reviews {dict(seeded)}, saved to {args.model}")
+    else:
+        languages = detect_languages(comments, LanguageIdentifier.load(args.model), LanguageCache())
+        print(languages.value_counts().to_string())
@@ -0,0 +1,462 @@
+"""
+LLM back-fill - concurrent, cached and resumable rating and comment generation for incomplete reviews
+
+    python -m preprocessing.llm_backfill ratings  [--input data/raw/all_california_gym_reviews.csv]
+                                                  [--output data/raw/reviews_all_filled.csv]
+                                                  [--backend hf|http|fake] [--url http://127.0.0.1:8000]
+    python -m preprocessing.llm_backfill comments [...]
+    python -m preprocessing.llm_backfill serve-fake [--port 8000]
+
+Replaces the row-by-row chat_completion loops of data_preparation_generated_comments.ipynb:
+requests run concurrently under a rate limit with retries (async_jobs), every
+prompt -> response is kept in data/cache/llm_responses.db and every filled row is
+appended to a JSON-lines checkpoint (one per backend, model and set of requests),
+so an interrupted run resumes where it stopped and a rerun costs no API call.
+
+Backends only need a `name` and complete(messages, max_tokens):
+HuggingFaceChatBackend (Inference API, the notebook's client), HttpChatBackend
+(any OpenAI-compatible /v1/chat/completions server) and FakeChatBackend. The
+fake also runs behind a local HTTP server (FakeChatServer) for offline tests of
+the whole network path.
+"""
+import os
+import re
+import json
+import random
+import sqlite3
+import hashlib
+import argparse
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pandas as pd
+
+from .async_jobs import map_async, run_sync, MAX_RETRIES
+from .augmentation import derive_seed
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESPONSE_CACHE = os.path.join(REPO_ROOT, "data", "cache", "llm_responses.db")
+CHECKPOINT_DIR = os.path.join(REPO_ROOT, "data", "cache", "llm_checkpoints")
+RAW_CSV = os.path.join(REPO_ROOT, "data", "raw", "all_california_gym_reviews.csv")
+FILLED_CSV = os.path.join(REPO_ROOT, "data", "raw", "reviews_all_filled.csv")
+
+MODEL = "meta-llama/Meta-Llama-3-8B-Instruct"
+CONCURRENCY = 4
+REQUESTS_PER_SECOND = 1.0
+RANDOM_SEED = 42
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    backend    TEXT,
+    prompt_key TEXT,
+    response   TEXT,
+    PRIMARY KEY (backend, prompt_key)
+);
+"""
+
+# --- Variations de prompts (generate_comment_chat) ---
+STYLES = [
+    "enthousiaste", "neutre", "humoristique", "concise", "sincère",
+    "positif", "constructif", "critique légère", "motivant", "amical", ""
+]
+FOCUS = [
+    "l'ambiance", "les équipements", "les coachs", "la propreté", "la diversité des cours",
+    "l'espace et confort", "la musique et l'atmosphère", "le prix et les abonnements",
+    "la disponibilité des machines", "les horaires et flexibilité", "le suivi personnalisé", ""
+]
+
+RATING_REGEX = re.compile(r"[1-5]")
+
+
+# ========== PROMPTS ==========
+
+def rating_prompt(comment):
+    """Prompt of generate_rating_from_comment"""
+    return (
+        f"En te basant sur ce commentaire, donne une note entière entre 1 et 5 étoiles pour la salle de sport :\n"
+        f"{comment}\nRéponds uniquement par le chiffre."
+    )
+
+
+def parse_rating(text):
+    """First digit between 1 and 5 of the answer, None if there is none"""
+    match = RATING_REGEX.search(text or "")
+    return int(match.group()) if match else None
+
+
+def comment_prompt(stars, location, rng=random):
+    """Prompt of generate_comment_chat, with a random style and focus"""
+    style = rng.choice(STYLES)
+    f = rng.choice(FOCUS)
+
+    prompt = f"Génère un commentaire court pour une salle de sport notée {stars}/5. Lieu : {location}."
+    if style.strip():
+        prompt += f" Style : {style}."
+    if f.strip():
+        prompt += f" Mets l'accent sur {f}."
+    prompt += " Le commentaire doit être naturel et convaincant, 1 à 2 phrases maximum."
+    return prompt
+
+
+def first_sentence(comment):
+    """Keep only the first sentence of a generated comment"""
+    return comment.split('.')[0].strip() + '.'
+
+
+# ========== BACKENDS ==========
+
+class HuggingFaceChatBackend:
+    def __init__(self, model=MODEL, api_key=None):
+        """Hugging Face Inference API chat model (HF_TOKEN by default)"""
+        from huggingface_hub import InferenceClient
+
+        self.name = f"hf:{model}"
+        self.model = model
+        self.client = InferenceClient(api_key=api_key or os.getenv("HF_TOKEN"))
+
+    def complete(self, messages, max_tokens):
+        """One chat completion"""
+        response = self.client.chat_completion(model=self.model, messages=messages, max_tokens=max_tokens)
+        return response.choices[0].message["content"]
+
+
+class HttpChatBackend:
+    def __init__(self, url, model=MODEL, api_key=None, timeout=60):
+        """OpenAI-compatible chat completions server (local model, FakeChatServer...)"""
+        self.url = url.rstrip('/') + "/v1/chat/completions"
+        self.name = f"http:{self.url}:{model}"
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def complete(self, messages, max_tokens):
+        """POST one chat completion request"""
+        body = json.dumps({'model': self.model, 'messages': messages, 'max_tokens': max_tokens}).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f"Bearer {self.api_key}"
+        request = urllib.request.Request(self.url, data=body, headers=headers)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.load(response)['choices'][0]['message']['content']
+
+
+POSITIVE_WORDS = ("super", "top", "excellent", "propre", "recommande", "génial", "bien", "sympa", "bon")
+NEGATIVE_WORDS = ("sale", "horrible", "nul", "déçu", "pire", "mauvais", "cher", "arnaque", "catastrophique")
+
+
+def fake_reply(messages):
+    """Deterministic answer: a keyword rating for rating prompts, a short comment otherwise"""
+    prompt = messages[-1]['content']
+    if prompt.startswith("En te basant sur ce commentaire"):
+        text = prompt.lower()
+        score = sum(word in text for word in POSITIVE_WORDS) - sum(word in text for word in NEGATIVE_WORDS)
+        return str(max(1, min(5, 3 + score)))
+    stars = re.search(r"notée (\d)", prompt)
+    return f"Avis {stars.group(1) if stars else 3}/5 généré hors ligne. Deuxième phrase."
+
+
+class FakeChatBackend:
+    name = 'fake'
+
+    def __init__(self):
+        """In-process stand-in for tests and dry runs"""
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def complete(self, messages, max_tokens):
+        """fake_reply of the messages"""
+        with self.lock:
+            self.calls += 1
+        return fake_reply(messages)
+
+
+class FakeChatHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        """Answer /v1/chat/completions with fake_reply, failing every `fail_every`-th request"""
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        with self.server.lock:
+            self.server.requests += 1
+            fail = self.server.fail_every and self.server.requests % self.server.fail_every == 0
+
+        if fail:
+            self.send_error(503, "Service Unavailable")
+            return
+        body = json.dumps({'choices': [{'message': {'role': 'assistant',
+                                                    'content': fake_reply(payload['messages'])}}]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeChatServer:
+    def __init__(self, host='127.0.0.1', port=0, fail_every=0):
+        """Local OpenAI-compatible stub server answering with fake_reply"""
+        self.host = host
+        self.port = port
+        self.fail_every = fail_every
+        self.httpd = None
+        self.thread = None
+
+    @property
+    def url(self):
+        """Base URL to give to HttpChatBackend"""
+        return f"http://{self.host}:{self.httpd.server_address[1]}"
+
+    def start(self):
+        """Start serving in a background thread"""
+        self.httpd = ThreadingHTTPServer((self.host, self.port), FakeChatHandler)
+        self.httpd.lock = threading.Lock()
+        self.httpd.requests = 0
+        self.httpd.fail_every = self.fail_every
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Shut the server down"""
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# ========== CACHE AND CHECKPOINTS ==========
+
+class ResponseCache:
+    def __init__(self, db_filename=RESPONSE_CACHE):
+        """Open (or create) the SQLite prompt -> response cache"""
+        directory = os.path.dirname(db_filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_filename, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    @staticmethod
+    def prompt_key(messages, max_tokens, variant=''):
+        """Key of a request; variant separates rows that must not share an answer"""
+        payload = json.dumps([messages, max_tokens, variant], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, backend, key):
+        """Cached response, or None"""
+        with self.lock:
+            row = self.conn.execute("SELECT response FROM responses WHERE backend = ? AND prompt_key = ?",
+                                    (backend, key)).fetchone()
+        return row[0] if row else None
+
+    def put(self, backend, key, response):
+        """Store one response"""
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (backend, key, response))
+
+    def close(self):
+        """Close the database"""
+        self.conn.close()
+
+
+class Checkpoint:
+    def __init__(self, filename):
+        """JSON-lines record of the rows already filled by a job"""
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.filename = filename
+        self.lock = threading.Lock()
+
+    def load(self):
+        """{row id: value} of the rows filled so far (a truncated last line is ignored)"""
+        done = {}
+        try:
+            with open(self.filename, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    done[entry['id']] = entry['value']
+        except OSError:
+            pass
+        return done
+
+    def append(self, row_id, value):
+        """Record one filled row"""
+        with self.lock:
+            with open(self.filename, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'id': row_id, 'value': value}, ensure_ascii=False) + '\n')
+
+    def clear(self):
+        """Forget the previous run"""
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+
+# ========== JOBS ==========
+
+class BackfillJob:
+    def __init__(self, backend, cache=None, concurrency=CONCURRENCY, rate=REQUESTS_PER_SECOND, retries=MAX_RETRIES,
+                 checkpoint_dir=CHECKPOINT_DIR):
+        """Concurrent LLM requests through `backend`, cached and checkpointed"""
+        self.backend = backend
+        self.cache = cache if cache is not None else ResponseCache()
+        self.concurrency = concurrency
+        self.rate = rate
+        self.retries = retries
+        self.checkpoint_dir = checkpoint_dir
+        self.stats = {'checkpointed': 0, 'cached': 0, 'requests': 0, 'failures': 0}
+        self.errors = []
+
+    def complete_many(self, requests, on_response=None):
+        """Answers of (row_id, messages, max_tokens, variant) requests, as {row_id: response}
+
+        Cached answers are served without a call, on_response(row_id, response) is
+        called as soon as each answer is known.
+        """
+        answers = {}
+        missing = []
+        for row_id, messages, max_tokens, variant in requests:
+            key = ResponseCache.prompt_key(messages, max_tokens, variant)
+            response = self.cache.get(self.backend.name, key)
+            if response is None:
+                missing.append((row_id, key, messages, max_tokens))
+                continue
+            self.stats['cached'] += 1
+            answers[row_id] = response
+            if on_response is not None:
+                on_response(row_id, response)
+
+        def request(row_id, key, messages, max_tokens):
+            return self.backend.complete(messages, max_tokens)
+
+        def store(item, response, error):
+            row_id, key = item[:2]
+            if error is not None:
+                self.stats['failures'] += 1
+                self.errors.append((row_id, repr(error)))
+                return
+            self.cache.put(self.backend.name, key, response)
+            answers[row_id] = response
+            if on_response is not None:
+                on_response(row_id, response)
+
+        if missing:
+            self.stats['requests'] += len(missing)
+            run_sync(map_async(request, missing, concurrency=self.concurrency, rate=self.rate,
+                               retries=self.retries, on_result=store))
+        return answers
+
+    def checkpoint_filename(self, name, requests):
+        """<name>-<hash of the backend and the requests>.jsonl: another backend, model or input gets its own file"""
+        keys = [f"{row_id}:{ResponseCache.prompt_key(messages, max_tokens, variant)}"
+                for row_id, messages, max_tokens, variant in requests]
+        key = hashlib.sha1("|".join([self.backend.name, *keys]).encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.checkpoint_dir, f"{name}-{key}.jsonl")
+
+    def run(self, name, df, column, requests, parse, resume=True):
+        """Fill df[column] from the answers of the requests, checkpointing every row"""
+        checkpoint = Checkpoint(self.checkpoint_filename(name, requests))
+        if not resume:
+            checkpoint.clear()
+        done = checkpoint.load()
+        self.stats['checkpointed'] += sum(1 for row_id, *_ in requests if row_id in done)
+
+        def fill(row_id, response):
+            value = parse(response)
+            if value is not None:
+                done[row_id] = value
+                checkpoint.append(row_id, value)
+
+        self.complete_many([request for request in requests if request[0] not in done], on_response=fill)
+
+        df = df.copy()
+        filled = df['id'].map(done)
+        mask = filled.notna() & df['id'].isin([row_id for row_id, *_ in requests])
+        if column == 'rating':
+            df['rating'] = df['rating'].astype('float64')
+        df.loc[mask, column] = filled[mask]
+        print(f"{name}: {int(mask.sum())} of {len(requests)} rows filled  {self.stats}")
+        return df
+
+    def backfill_ratings(self, df, resume=True):
+        """Rating 1-5 inferred from the comment where the rating is missing or 0 (generate_rating_from_comment)"""
+        comments = df['comment'].fillna('').astype(str)
+        missing = (df['rating'].isna() | (df['rating'] == 0)) & (comments.str.strip() != '')
+        requests = [(row_id, [{"role": "user", "content": rating_prompt(comment)}], 10, '')
+                    for row_id, comment in zip(df.loc[missing, 'id'], comments[missing])]
+        return self.run('ratings', df, 'rating', requests, parse_rating, resume)
+
+    def backfill_comments(self, df, seed=RANDOM_SEED, resume=True):
+        """Short synthetic comment where it is missing, from the rating and location (generate_comment_chat)
+
+        The style and focus of each row come from a seed derived from its id, and the
+        row id is part of the cache key: rows with the same prompt still get their own comment.
+        """
+        empty = df['comment'].isna() | (df['comment'].fillna('').astype(str).str.strip() == '')
+        missing = empty & df['rating'].notna() & (df['rating'] != 0) & df['location'].notna()
+        requests = []
+        for row_id, stars, location in zip(df.loc[missing, 'id'], df.loc[missing, 'rating'], df.loc[missing, 'location']):
+            prompt = comment_prompt(stars, location, random.Random(derive_seed(seed, row_id)))
+            requests.append((row_id, [{"role": "user", "content": prompt}], 80, row_id))
+        return self.run('comments', df, 'comment', requests, lambda text: first_sentence(text) if text else None,
+                        resume)
+
+
+def make_backend(name, url=None, model=MODEL):
+    """Backend from its command line name"""
+    if name == 'hf':
+        return HuggingFaceChatBackend(model)
+    if name == 'http':
+        return HttpChatBackend(url, model)
+    return FakeChatBackend()
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Fill missing ratings or comments with an LLM")
+    parser.add_argument("job", choices=['ratings', 'comments', 'serve-fake'])
+    parser.add_argument("--input", default=RAW_CSV, help="reviews CSV")
+    parser.add_argument("--output", default=FILLED_CSV, help="completed reviews CSV")
+    parser.add_argument("--backend", default='hf', choices=['hf', 'http', 'fake'], help="chat backend")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="server of the http backend")
+    parser.add_argument("--model", default=MODEL, help="chat model")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="requests in flight")
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND, help="requests per second (0: no limit)")
+    parser.add_argument("--fresh", action="store_true", help="ignore the checkpoint of a previous run")
+    parser.add_argument("--port", type=int, default=8000, help="port of serve-fake")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.job == 'serve-fake':
+        server = FakeChatServer(port=args.port).start()
+        print(f"Fake chat server on {server.url} (Ctrl+C to stop)")
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            server.stop()
+    else:
+        job = BackfillJob(make_backend(args.backend, args.url, args.model), concurrency=args.concurrency,
+                          rate=args.rate or None)
+        df = pd.read_csv(args.input, encoding='utf-8-sig')
+        if args.job == 'ratings':
+            df = job.backfill_ratings(df, resume=not args.fresh)
+        else:
+            df = job.backfill_comments(df, resume=not args.fresh)
+        df.to_csv(args.output, index=False)
+        print(f"Saved to: {args.output}")
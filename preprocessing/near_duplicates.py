@@ -0,0 +1,200 @@
+"""
+Near-duplicate index - MinHash signatures with LSH banding over review texts
+
+    python -m preprocessing.near_duplicates [--train data/cleaned/finetuning-splits/train_set.csv]
+                                            [--test data/cleaned/finetuning-splits/test_set.csv]
+                                            [--threshold 0.8] [--output leakage.csv]
+
+Texts are normalized (lowercase, single spaces) and cut into character 5-grams.
+A MinHash signature estimates the Jaccard similarity of two shingle sets; LSH
+bands put similar signatures in the same bucket, so a query only compares the
+few candidates sharing a bucket instead of the whole corpus. Candidates are
+kept when their estimated similarity reaches the threshold.
+
+Used by the scraper writer (reposted reviews across sources), the augmentation
+runner (near-identical augmentations) and the train/test leakage check below.
+"""
+import os
+import zlib
+import argparse
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FINETUNING_SPLITS_DIR = os.path.join(REPO_ROOT, "data", "cleaned", "finetuning-splits")
+
+NUM_PERM = 128
+SHINGLE_SIZE = 5
+THRESHOLD = 0.8
+MIN_LENGTH = 20  # shorter texts ("Top", "Super salle") are left out, they collide by nature
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def normalize(text):
+    """Lowercase text with single spaces"""
+    return " ".join(str(text).lower().split())
+
+
+def shingle_hashes(text, size=SHINGLE_SIZE):
+    """32-bit hashes of the character n-grams of a normalized text"""
+    if len(text) <= size:
+        grams = {text}
+    else:
+        grams = {text[i:i + size] for i in range(len(text) - size + 1)}
+    return np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams), dtype=np.uint64, count=len(grams))
+
+
+def lsh_bands(num_perm, threshold):
+    """(bands, rows) whose LSH threshold sits a bit below the wanted similarity (recall first)"""
+    target = threshold * 0.85
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= target:
+            best = (bands, rows)
+    return best
+
+
+class NearDuplicateIndex:
+    def __init__(self, threshold=THRESHOLD, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE,
+                 min_length=MIN_LENGTH, seed=1):
+        """Empty index; texts are near-duplicates above `threshold` estimated Jaccard similarity"""
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.min_length = min_length
+
+        generator = np.random.RandomState(seed)
+        self.a = generator.randint(1, (1 << 61) - 1, num_perm, dtype=np.uint64)
+        self.b = generator.randint(0, (1 << 61) - 1, num_perm, dtype=np.uint64)
+
+        self.bands, self.rows = lsh_bands(num_perm, threshold)
+        self.buckets = [defaultdict(list) for _ in range(self.bands)]
+        self.keys = []
+        self.signatures = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def signature(self, text):
+        """MinHash signature of a text, None if it is too short to be indexed"""
+        text = normalize(text)
+        if len(text) < self.min_length:
+            return None
+        hashes = shingle_hashes(text, self.shingle_size)
+        # universal hashing (a * h + b) mod p, wrapping in uint64 like the usual MinHash implementations
+        with np.errstate(over='ignore'):
+            permuted = (np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def band_keys(self, signature):
+        """Bucket key of the signature in every band"""
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def add(self, key, text, signature=None):
+        """Index a text under `key`, returns False if it is too short to be indexed"""
+        signature = self.signature(text) if signature is None else signature
+        if signature is None:
+            return False
+        position = len(self.keys)
+        self.keys.append(key)
+        self.signatures.append(signature)
+        for bucket, band_key in zip(self.buckets, self.band_keys(signature)):
+            bucket[band_key].append(position)
+        return True
+
+    def query(self, text, signature=None):
+        """Indexed (key, similarity) pairs at least `threshold` similar to text, most similar first"""
+        signature = self.signature(text) if signature is None else signature
+        if signature is None:
+            return []
+        candidates = set()
+        for bucket, band_key in zip(self.buckets, self.band_keys(signature)):
+            candidates.update(bucket.get(band_key, ()))
+        if not candidates:
+            return []
+
+        positions = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarities = (np.stack([self.signatures[i] for i in positions]) == signature).mean(axis=1)
+        found = [(self.keys[i], float(s)) for i, s in zip(positions, similarities) if s >= self.threshold]
+        return sorted(found, key=lambda pair: -pair[1])
+
+    def add_if_new(self, key, text):
+        """Index text unless it is a near-duplicate, returns the best (key, similarity) match or None"""
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        matches = self.query(text, signature)
+        if matches:
+            return matches[0]
+        self.add(key, text, signature)
+        return None
+
+
+# ========== CORPUS CHECKS ==========
+
+def near_duplicate_mask(texts, threshold=THRESHOLD, **options):
+    """True for every text that is a near-duplicate of an earlier one (the first occurrence is kept)"""
+    index = NearDuplicateIndex(threshold, **options)
+    return pd.Series([index.add_if_new(i, text) is not None for i, text in enumerate(texts)],
+                     index=texts.index if isinstance(texts, pd.Series) else None)
+
+
+def find_leakage(train_texts, test_texts, threshold=THRESHOLD, **options):
+    """Test texts with a near-duplicate in train: test_index, train_index, similarity per pair"""
+    train_texts = pd.Series(train_texts)
+    test_texts = pd.Series(test_texts)
+    index = NearDuplicateIndex(threshold, **options)
+    for key, text in train_texts.items():
+        index.add(key, text)
+
+    pairs = [(test_key, train_key, similarity)
+             for test_key, text in test_texts.items()
+             for train_key, similarity in index.query(text)]
+    return pd.DataFrame(pairs, columns=['test_index', 'train_index', 'similarity'])
+
+
+def leakage_report(train_path, test_path, column='text', threshold=THRESHOLD, output=None):
+    """Print and return the near-duplicate pairs between a train and a test split"""
+    train = pd.read_csv(train_path, encoding='utf-8-sig')
+    test = pd.read_csv(test_path, encoding='utf-8-sig')
+    pairs = find_leakage(train[column], test[column], threshold)
+
+    leaked = pairs['test_index'].unique()
+    print(f"{len(leaked)} of {len(test):,} test rows ({len(leaked) / max(len(test), 1):.1%}) have a "
+          f"near-duplicate in train (similarity >= {threshold}), {len(pairs)} pairs")
+    if 'label' in test.columns and len(leaked):
+        print("   per label: " + ", ".join(f"{label}: {count}"
+                                            for label, count in test.loc[leaked, 'label'].value_counts().sort_index().items()))
+        conflicts = (test.loc[pairs['test_index'], 'label'].to_numpy() != train.loc[pairs['train_index'], 'label'].to_numpy())
+        print(f"   pairs with different labels: {int(conflicts.sum())}")
+
+    pairs = pairs.assign(test_text=test.loc[pairs['test_index'], column].to_numpy(),
+                         train_text=train.loc[pairs['train_index'], column].to_numpy())
+    for row in pairs.head(5).itertuples():
+        print(f"   {row.similarity:.2f}  test: {str(row.test_text)[:60]!r}  train: {str(row.train_text)[:60]!r}")
+    if output:
+        pairs.to_csv(output, index=False, encoding='utf-8-sig')
+        print(f"Saved the pairs to: {output}")
+    return pairs
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Find near-duplicate reviews leaking from train into test")
+    parser.add_argument("--train", default=os.path.join(FINETUNING_SPLITS_DIR, "train_set.csv"), help="train split")
+    parser.add_argument("--test", default=os.path.join(FINETUNING_SPLITS_DIR, "test_set.csv"), help="test split")
+    parser.add_argument("--column", default="text", help="text column (text_clean for the ML splits)")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="estimated Jaccard similarity")
+    parser.add_argument("--output", default=None, help="CSV of the leaking pairs")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    leakage_report(args.train, args.test, column=args.column, threshold=args.threshold, output=args.output)
@@ -0,0 +1,238 @@
+"""
+Streaming preprocessing pipeline - raw reviews to cleaned data and train/test splits in one pass
+
+    python -m preprocessing.pipeline [--input data/raw/reviews.db] [--chunk-size 10000]
+
+Reads the raw reviews in chunks and, for each chunk: drops empty comments, labels
+the ratings (rating_to_sentiment), tags the language of the comment (language_id),
+applies clean_text_light, filters empty texts,
+assigns every review to train or test with a salted hash of its text and appends
+the rows to all outputs at once. Memory use only depends on the chunk size.
+
+Outputs (same files and columns as the notebooks):
+    data/cleaned/cleaned_reviews_general.csv        rating, sentiment, comment_clean, sentiment_encoded, lang
+    data/cleaned/finetuning_reviews_general.csv     text, label
+    data/cleaned/finetuning-splits/{train,test}_set.csv   text, label
+    data/cleaned/ml-methods-splits/{train,test}_set.csv   text_clean, label
+"""
+import os
+import sys
+import time
+import argparse
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from .labels import SENTIMENT_MAP, rating_to_sentiment_batch
+from .language_id import LanguageCache, detect_languages
+from .text_cleaning import clean_text_light_batch, preprocess_ml_batch, load_stopwords
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_DB = os.path.join(REPO_ROOT, "data", "raw", "reviews.db")
+RAW_CSV = os.path.join(REPO_ROOT, "data", "raw", "all_california_gym_reviews.csv")
+CLEANED_DIR = os.path.join(REPO_ROOT, "data", "cleaned")
+
+CHUNK_SIZE = 10000
+TEST_SIZE = 0.20
+RANDOM_SEED = 42
+
+
+# ========== INPUT ==========
+
+def iter_raw_chunks(path, chunk_size=CHUNK_SIZE):
+    """Yield DataFrames of (rating, comment) from the review store or a CSV export"""
+    if path.endswith('.db'):
+        # The review store lives with the scraper modules
+        sys.path.append(os.path.join(REPO_ROOT, "scraper"))
+        from storage import ReviewStore
+
+        store = ReviewStore(path)
+        try:
+            for rows in store.iter_batches(columns=['rating', 'comment'], batch_size=chunk_size):
+                yield pd.DataFrame(rows, columns=['rating', 'comment'])
+        finally:
+            store.close()
+    else:
+        yield from pd.read_csv(path, encoding='utf-8-sig', usecols=['rating', 'comment'], chunksize=chunk_size)
+
+
+# ========== SPLITTING ==========
+
+def test_mask(texts, test_size=TEST_SIZE, seed=RANDOM_SEED):
+    """Deterministic train/test assignment from a salted hash of each text
+
+    A text always lands in the same split whatever the chunking, the row order
+    or the size of the corpus, and duplicated texts never end up on both sides.
+    Assignment is independent of the label, so every class gets the same
+    expected test ratio: the split is stratified in expectation without
+    having to see the whole corpus first.
+    """
+    hashes = pd.util.hash_pandas_object(pd.Series(texts, dtype=object), index=False,
+                                        hash_key=f"{seed:016d}"[-16:])
+    fractions = hashes.to_numpy(dtype=np.uint64) / float(2 ** 64)
+    return pd.Series(fractions < test_size, index=texts.index)
+
+
+# ========== CHUNK STEPS ==========
+# Shared by run_pipeline (one streaming pass) and the cached stages of preprocessing.stages
+
+def clean_chunk(chunk, language_cache=None):
+    """Drop empty comments, tag the language and apply clean_text_light"""
+    chunk = chunk.dropna(subset=['comment'])
+    chunk = chunk[chunk['comment'].astype(str).str.strip() != '']
+    return chunk.assign(
+        lang=detect_languages(chunk['comment'].astype(str), cache=language_cache),
+        comment_clean=clean_text_light_batch(chunk['comment']),
+    )
+
+
+def label_chunk(chunk):
+    """Sentiment of every cleaned review, and the fine-tuning rows (text, label) of the non-empty texts"""
+    chunk = chunk.assign(sentiment=rating_to_sentiment_batch(chunk['rating']))
+    chunk['sentiment_encoded'] = chunk['sentiment'].map(SENTIMENT_MAP)
+    data = chunk.loc[chunk['comment_clean'] != '', ['comment_clean', 'sentiment_encoded']]
+    data = data.rename(columns={'comment_clean': 'text', 'sentiment_encoded': 'label'}).dropna()
+    return chunk, data
+
+
+def split_chunk(data, test_size=TEST_SIZE, seed=RANDOM_SEED, stopwords=None):
+    """{output: rows} of the fine-tuning splits, and of the classical-ML splits if stopwords is given"""
+    is_test = test_mask(data['text'], test_size=test_size, seed=seed)
+    splits = {'ft_train': data[~is_test], 'ft_test': data[is_test]}
+
+    # Classical ML splits: same assignment, deeper cleaning
+    if stopwords is not None:
+        ml_data = data.assign(text_clean=preprocess_ml_batch(data['text'], stopwords=stopwords))
+        keep = ml_data['text_clean'] != ''
+        splits['ml_train'] = ml_data[~is_test & keep]
+        splits['ml_test'] = ml_data[is_test & keep]
+    return splits
+
+
+# ========== OUTPUT ==========
+
+class SplitWriter:
+    def __init__(self, path, columns, encoding='utf-8-sig'):
+        """CSV written to a temp file chunk by chunk, moved in place on commit"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.columns = columns
+        self.rows = 0
+        self.labels = Counter()
+        self.tmp_path = path + '.tmp'
+        self.file = open(self.tmp_path, 'w', encoding=encoding, newline='')
+        pd.DataFrame(columns=columns).to_csv(self.file, index=False)
+
+    def write(self, df, label_column=None):
+        """Append a chunk"""
+        if df.empty:
+            return
+        df[self.columns].to_csv(self.file, header=False, index=False)
+        self.rows += len(df)
+        if label_column is not None:
+            self.labels.update(df[label_column].tolist())
+
+    def commit(self):
+        """Close and replace the previous output"""
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        """Close and drop the partial output"""
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def output_writers(output_dir=CLEANED_DIR, names=None):
+    """SplitWriter of every pipeline output (or of names only)"""
+    outputs = {
+        'cleaned': (os.path.join(output_dir, "cleaned_reviews_general.csv"),
+                    ['rating', 'sentiment', 'comment_clean', 'sentiment_encoded', 'lang'], 'utf-8'),
+        'finetuning': (os.path.join(output_dir, "finetuning_reviews_general.csv"), ['text', 'label'], 'utf-8'),
+        'ft_train': (os.path.join(output_dir, "finetuning-splits", "train_set.csv"), ['text', 'label'], 'utf-8-sig'),
+        'ft_test': (os.path.join(output_dir, "finetuning-splits", "test_set.csv"), ['text', 'label'], 'utf-8-sig'),
+        'ml_train': (os.path.join(output_dir, "ml-methods-splits", "train_set.csv"), ['text_clean', 'label'], 'utf-8-sig'),
+        'ml_test': (os.path.join(output_dir, "ml-methods-splits", "test_set.csv"), ['text_clean', 'label'], 'utf-8-sig'),
+    }
+    return {name: SplitWriter(path, columns, encoding=encoding)
+            for name, (path, columns, encoding) in outputs.items() if names is None or name in names}
+
+
+def write_splits(writers, splits):
+    """Append each split to its writer"""
+    for name, rows in splits.items():
+        writers[name].write(rows, 'label')
+
+
+def print_outputs(writers, output_dir=CLEANED_DIR):
+    """Rows and label distribution of every output"""
+    for name, writer in writers.items():
+        distribution = ", ".join(f"{label}: {count}" for label, count in sorted(writer.labels.items()))
+        print(f"   {os.path.relpath(writer.path, output_dir):<42} {writer.rows:>8,} rows  {distribution}")
+
+
+# ========== PIPELINE ==========
+
+def run_pipeline(source=None, output_dir=CLEANED_DIR, chunk_size=CHUNK_SIZE, test_size=TEST_SIZE,
+                 seed=RANDOM_SEED, ml=True):
+    """Stream the raw reviews through cleaning, labelling, filtering and splitting"""
+    if source is None:
+        source = RAW_DB if os.path.exists(RAW_DB) else RAW_CSV
+    stopwords = load_stopwords() if ml else None
+    language_cache = LanguageCache()
+    writers = output_writers(output_dir, None if ml else ['cleaned', 'finetuning', 'ft_train', 'ft_test'])
+
+    start = time.time()
+    raw_rows = 0
+    languages = Counter()
+    try:
+        for chunk in iter_raw_chunks(source, chunk_size):
+            raw_rows += len(chunk)
+
+            # Light cleaning and language, then labels
+            chunk, data = label_chunk(clean_chunk(chunk, language_cache))
+            languages.update(chunk['lang'])
+            writers['cleaned'].write(chunk)
+
+            # Fine-tuning data (non-empty cleaned texts) and the train/test splits
+            writers['finetuning'].write(data)
+            write_splits(writers, split_chunk(data, test_size, seed, stopwords))
+
+            print(f"   {raw_rows:,} raw reviews processed")
+    except BaseException:
+        for writer in writers.values():
+            writer.abort()
+        raise
+    finally:
+        language_cache.close()
+
+    for writer in writers.values():
+        writer.commit()
+
+    elapsed = time.time() - start
+    print(f"\nPipeline finished in {elapsed:.1f}s ({raw_rows / elapsed if elapsed > 0 else 0:,.0f} reviews/s)")
+    print_outputs(writers, output_dir)
+    print("   languages: " + ", ".join(f"{lang}: {count}" for lang, count in languages.most_common()))
+    return {name: writer.rows for name, writer in writers.items()}
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Raw reviews to cleaned data and train/test splits")
+    parser.add_argument("--input", default=None,
+                        help="review store (.db) or CSV export (default: data/raw/reviews.db, else the CSV)")
+    parser.add_argument("--output-dir", default=CLEANED_DIR, help="directory of the cleaned outputs")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="reviews per chunk")
+    parser.add_argument("--test-size", type=float, default=TEST_SIZE, help="expected share of each class in test")
+    parser.add_argument("--seed", type=int, default=RANDOM_SEED, help="salt of the split hash")
+    parser.add_argument("--no-ml", action="store_true", help="skip the classical-ML splits (no NLTK needed)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run_pipeline(args.input, output_dir=args.output_dir, chunk_size=args.chunk_size,
+                 test_size=args.test_size, seed=args.seed, ml=not args.no_ml)
@@ -0,0 +1,188 @@
+"""
+Stage cache - content-addressed caching of preprocessing stages
+
+A stage is keyed by the hash of its input files, the source code it runs and its
+parameters. When the key matches the last run and the outputs are untouched the
+stage is skipped; when an older run had the same key its outputs are restored from
+the cache; otherwise the stage runs and its outputs are stored under the new key.
+"""
+import os
+import json
+import shutil
+import hashlib
+import inspect
+from datetime import datetime
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(REPO_ROOT, "data", "cache", "stages")
+
+
+def repo_path(path):
+    """Path relative to the repository root, so notebooks and scripts share records"""
+    return os.path.relpath(os.path.abspath(path), REPO_ROOT).replace(os.sep, '/')
+
+
+def sha256_file(path, block_size=1 << 20):
+    """SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def key_params(params):
+    """Parameters as keyed: absolute paths are made relative to the repository root"""
+    return {name: repo_path(value) if isinstance(value, str) and os.path.isabs(value) else value
+            for name, value in (params or {}).items()}
+
+
+def code_hash(*parts):
+    """Hash of the source of functions, classes or modules (strings are hashed as is)"""
+    digest = hashlib.sha256()
+    for part in parts:
+        source = part if isinstance(part, str) else inspect.getsource(part)
+        digest.update(source.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class StageCache:
+    def __init__(self, cache_dir=CACHE_DIR):
+        """Stage records and stored outputs live in cache_dir"""
+        self.cache_dir = cache_dir
+        os.makedirs(os.path.join(self.cache_dir, "objects"), exist_ok=True)
+        self.hash_index_path = os.path.join(self.cache_dir, "file_hashes.json")
+        self.hash_index = self.read_json(self.hash_index_path)
+
+    # ========== RECORDS ==========
+
+    @staticmethod
+    def read_json(path):
+        """Load a JSON file, or an empty dict"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def write_json(path, data):
+        """Write a JSON file atomically"""
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+
+    def record_path(self, name):
+        """Record of the last run of a stage"""
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def load_record(self, name):
+        """Last run of a stage: key, input and output hashes"""
+        return self.read_json(self.record_path(name))
+
+    # ========== HASHING ==========
+
+    def file_hash(self, path):
+        """Content hash of a file, recomputed only when its size or mtime changed"""
+        stat = os.stat(path)
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        entry = self.hash_index.get(repo_path(path))
+        if entry and entry['stamp'] == stamp:
+            return entry['sha256']
+
+        digest = sha256_file(path)
+        self.hash_index[repo_path(path)] = {'stamp': stamp, 'sha256': digest}
+        self.write_json(self.hash_index_path, self.hash_index)
+        return digest
+
+    def key(self, name, inputs, code=(), params=None):
+        """Cache key of a stage from its input hashes, code version and parameters"""
+        payload = {
+            'stage': name,
+            'inputs': {repo_path(path): self.file_hash(path) for path in inputs},
+            'code': code_hash(*code),
+            'params': key_params(params),
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def stale_inputs(self, name):
+        """Inputs whose content changed since the stage last ran (missing ones included)"""
+        stale = []
+        for path, digest in self.load_record(name).get('inputs', {}).items():
+            full_path = os.path.join(REPO_ROOT, path)
+            if not os.path.exists(full_path) or self.file_hash(full_path) != digest:
+                stale.append(path)
+        return stale
+
+    # ========== RUNNING ==========
+
+    def outputs_match(self, record, outputs):
+        """True if every output exists with the content of the recorded run"""
+        recorded = record.get('outputs', {})
+        for path in outputs:
+            if not os.path.exists(path) or recorded.get(repo_path(path)) != self.file_hash(path):
+                return False
+        return True
+
+    def object_dir(self, key):
+        """Directory of the stored outputs of a key"""
+        return os.path.join(self.cache_dir, "objects", key)
+
+    def store(self, key, outputs):
+        """Copy the outputs into the cache under the stage key"""
+        directory = self.object_dir(key)
+        os.makedirs(directory, exist_ok=True)
+        for index, path in enumerate(outputs):
+            shutil.copyfile(path, os.path.join(directory, f"{index}_{os.path.basename(path)}"))
+
+    def restore(self, key, outputs):
+        """Copy stored outputs back in place, returns False if the key is not stored"""
+        directory = self.object_dir(key)
+        stored = [os.path.join(directory, f"{index}_{os.path.basename(path)}") for index, path in enumerate(outputs)]
+        if not all(os.path.exists(path) for path in stored):
+            return False
+
+        for source, path in zip(stored, outputs):
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            shutil.copyfile(source, path + '.tmp')
+            os.replace(path + '.tmp', path)
+        return True
+
+    def save_record(self, name, key, inputs, outputs, params):
+        """Remember the key and the hashes of the run"""
+        self.write_json(self.record_path(name), {
+            'stage': name,
+            'key': key,
+            'inputs': {repo_path(path): self.file_hash(path) for path in inputs},
+            'outputs': {repo_path(path): self.file_hash(path) for path in outputs},
+            'params': key_params(params),
+            'finished': datetime.now().isoformat(timespec='seconds'),
+        })
+
+    def run(self, name, func, inputs, outputs, code=(), params=None, force=False, keep=True, options=None):
+        """Run func(**params, **options) unless a run with the same key is already available
+
+        Returns True if the stage was computed, False if it was skipped or restored.
+        options are arguments that do not change the outputs (number of workers...)
+        and are not part of the key. keep=False does not store a copy of the
+        outputs (very large stages).
+        """
+        key = self.key(name, inputs, code, params)
+        record = self.load_record(name)
+
+        if not force:
+            if record.get('key') == key and self.outputs_match(record, outputs):
+                print(f"⏭  {name}: up to date")
+                return False
+            if self.restore(key, outputs):
+                self.save_record(name, key, inputs, outputs, params)
+                print(f"♻️  {name}: restored from cache ({key[:12]})")
+                return False
+
+        print(f"▶️  {name}: running")
+        func(**(params or {}), **(options or {}))
+        if keep:
+            self.store(key, outputs)
+        self.save_record(name, key, inputs, outputs, params)
+        return True
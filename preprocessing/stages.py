@@ -0,0 +1,267 @@
+"""
+Preprocessing stages - the cached steps from raw reviews to the model inputs
+
+    python -m preprocessing.stages [--force clean label split augment deep_clean] [--input data/raw/reviews.db]
+                                   [--no-augment]
+
+    clean        raw reviews -> empty comments dropped, language, clean_text_light (data/cache/stages/work/)
+    label        cleaned reviews -> sentiment labels: cleaned_reviews_general.csv, finetuning_reviews_general.csv
+    split        labelled texts -> finetuning-splits/ and ml-methods-splits/ train/test sets
+    augment      ML train split -> augmented_simple/train_augmented.csv (augment_runner)
+    deep_clean   augmented train -> augmented_simple/train_augmented_cleaned.csv
+
+Every stage goes through StageCache: it only reruns when the content of its inputs,
+the source of the code it runs or its parameters changed. The code key of a stage
+lists the functions (and the regexes / tables) it actually calls, so editing
+clean_text_light reruns clean, not deep_clean. Keys are built on file content, so
+a change that leaves a stage's output identical does not invalidate the stages
+after it. The stages produce the same files as pipeline.run_pipeline (one
+streaming pass, no cache), from the same chunk steps.
+"""
+import os
+import argparse
+
+import pandas as pd
+
+from . import language_id, text_cleaning
+from .labels import SENTIMENT_MAP, rating_to_sentiment_batch
+from .language_id import LanguageCache, LanguageIdentifier, detect_languages
+from .pipeline import (CLEANED_DIR, RAW_CSV, RAW_DB, TEST_SIZE, RANDOM_SEED, CHUNK_SIZE, SplitWriter,
+                       iter_raw_chunks, clean_chunk, label_chunk, split_chunk, test_mask,
+                       output_writers, write_splits, print_outputs)
+from .stage_cache import CACHE_DIR, StageCache, repo_path
+from .text_cleaning import (DEEP_CLEANING, as_text_list, clean_text_light, clean_text_light_batch, clean_text_ml,
+                            load_stopwords, preprocess_ml_batch)
+
+
+CLEAN_CSV = os.path.join(CACHE_DIR, "work", "reviews_clean.csv")
+CLEANED_CSV = os.path.join(CLEANED_DIR, "cleaned_reviews_general.csv")
+FINETUNING_CSV = os.path.join(CLEANED_DIR, "finetuning_reviews_general.csv")
+ML_SPLITS_DIR = os.path.join(CLEANED_DIR, "ml-methods-splits")
+ML_TRAIN_CSV = os.path.join(ML_SPLITS_DIR, "train_set.csv")
+AUGMENTED_DIR = os.path.join(ML_SPLITS_DIR, "augmented_simple")
+AUGMENTED_CSV = os.path.join(AUGMENTED_DIR, "train_augmented.csv")
+AUGMENTED_CLEANED_CSV = os.path.join(AUGMENTED_DIR, "train_augmented_cleaned.csv")
+
+SPLIT_OUTPUTS = [
+    os.path.join(CLEANED_DIR, "finetuning-splits", "train_set.csv"),
+    os.path.join(CLEANED_DIR, "finetuning-splits", "test_set.csv"),
+    ML_TRAIN_CSV,
+    os.path.join(ML_SPLITS_DIR, "test_set.csv"),
+]
+
+STAGES = ['clean', 'label', 'split', 'augment', 'deep_clean']
+
+# What each stage runs, for its code key: functions, plus the regexes and tables they read
+LIGHT_CLEANING_CODE = [as_text_list, clean_text_light, clean_text_light_batch,
+                       text_cleaning.URL_REGEX.pattern, text_cleaning.MENTION_HASHTAG_REGEX.pattern]
+LANGUAGE_CODE = [detect_languages, LanguageIdentifier.prepare, LanguageIdentifier.predict,
+                 language_id.normalize, language_id.ngrams, language_id.script_label,
+                 language_id.WORD_REGEX.pattern, language_id.LETTER_REGEX.pattern,
+                 language_id.ARABIC_REGEX.pattern, str(language_id.ARABIC_SHARE)]
+ML_CLEANING_CODE = [as_text_list, clean_text_ml, preprocess_ml_batch, load_stopwords,
+                    repr(text_cleaning.ML_REPLACEMENTS), repr(sorted(text_cleaning.NEGATIONS)),
+                    *(regex.pattern for regex in (text_cleaning.UNWANTED_CHARS_REGEX, text_cleaning.EXCLAMATIONS_REGEX,
+                                                  text_cleaning.QUESTIONS_REGEX, text_cleaning.ML_URL_REGEX))]
+CLEAN_CODE = [iter_raw_chunks, clean_chunk, *LIGHT_CLEANING_CODE, *LANGUAGE_CODE]
+LABEL_CODE = [label_chunk, rating_to_sentiment_batch, repr(SENTIMENT_MAP)]
+SPLIT_CODE = [split_chunk, test_mask, *ML_CLEANING_CODE]
+
+
+# ========== CLEAN / LABEL / SPLIT ==========
+
+def read_chunks(path, text_columns, chunk_size=CHUNK_SIZE, encoding='utf-8'):
+    """CSV chunks of a stage output, texts kept as written (an empty text is '', not NaN)"""
+    return pd.read_csv(path, encoding=encoding, chunksize=chunk_size, keep_default_na=False,
+                       na_values={'rating': ['']}, dtype={column: str for column in text_columns})
+
+
+def clean_reviews(source, output_path=CLEAN_CSV, chunk_size=CHUNK_SIZE):
+    """Raw reviews without empty comments, with their language and clean_text_light comment"""
+    writer = SplitWriter(output_path, ['rating', 'comment_clean', 'lang'], encoding='utf-8')
+    language_cache = LanguageCache()
+    try:
+        for chunk in iter_raw_chunks(source, chunk_size):
+            writer.write(clean_chunk(chunk, language_cache))
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        language_cache.close()
+    writer.commit()
+    print(f"   {writer.rows:,} cleaned reviews")
+
+
+def label_reviews(input_path=CLEAN_CSV, output_dir=CLEANED_DIR, chunk_size=CHUNK_SIZE):
+    """Sentiment labels: cleaned_reviews_general.csv and the fine-tuning rows (text, label)"""
+    writers = output_writers(output_dir, ['cleaned', 'finetuning'])
+    try:
+        for chunk in read_chunks(input_path, ['comment_clean', 'lang'], chunk_size):
+            chunk, data = label_chunk(chunk)
+            writers['cleaned'].write(chunk)
+            writers['finetuning'].write(data, 'label')
+    except BaseException:
+        for writer in writers.values():
+            writer.abort()
+        raise
+    for writer in writers.values():
+        writer.commit()
+    print_outputs(writers, output_dir)
+
+
+def split_reviews(input_path=FINETUNING_CSV, output_dir=CLEANED_DIR, test_size=TEST_SIZE, seed=RANDOM_SEED,
+                  chunk_size=CHUNK_SIZE):
+    """Train/test splits of the fine-tuning rows, and the classical-ML splits (deeper cleaning)"""
+    writers = output_writers(output_dir, ['ft_train', 'ft_test', 'ml_train', 'ml_test'])
+    stopwords = load_stopwords()
+    try:
+        for data in read_chunks(input_path, ['text'], chunk_size):
+            write_splits(writers, split_chunk(data, test_size, seed, stopwords))
+    except BaseException:
+        for writer in writers.values():
+            writer.abort()
+        raise
+    for writer in writers.values():
+        writer.commit()
+    print_outputs(writers, output_dir)
+
+
+# ========== DEEP CLEANING ==========
+
+def deep_clean(input_path=AUGMENTED_CSV, output_path=AUGMENTED_CLEANED_CSV):
+    """Deep cleaning of the augmented train set (moved from data_augmentation.ipynb)
+
+    "!!!" / "???" marked once, emojis dropped, full French stopword list, words of
+    1 char removed, then empty and duplicated texts dropped.
+    """
+    df = pd.read_csv(input_path, encoding='utf-8-sig')[['text_clean', 'label']]
+    df = df.dropna(subset=['text_clean'])
+    df = df[df['text_clean'].str.strip() != '']
+
+    df['text_clean'] = preprocess_ml_batch(df['text_clean'], stopwords=load_stopwords(keep_negations=False),
+                                           **DEEP_CLEANING)
+    before = len(df)
+    df = df[df['text_clean'] != '']
+    print(f"Removed {before - len(df)} empty rows after preprocessing.")
+
+    before = len(df)
+    df = df.drop_duplicates(subset=['text_clean'])
+    print(f"Removed {before - len(df)} duplicate rows.")
+
+    df.to_csv(output_path, index=False, encoding='utf-8-sig')
+    return df
+
+
+# ========== STAGES ==========
+
+def clean_stage(cache, source=None, force=False):
+    """Empty comments dropped, language tagged, light cleaning"""
+    if source is None:
+        source = RAW_DB if os.path.exists(RAW_DB) else RAW_CSV
+    return cache.run(
+        'clean', clean_reviews,
+        inputs=[source, language_id.MODEL_PATH],
+        outputs=[CLEAN_CSV],
+        code=[clean_reviews, *CLEAN_CODE],
+        params={'source': source, 'output_path': CLEAN_CSV},
+        force=force,
+    )
+
+
+def label_stage(cache, force=False):
+    """Sentiment labels of the cleaned reviews"""
+    return cache.run(
+        'label', label_reviews,
+        inputs=[CLEAN_CSV],
+        outputs=[CLEANED_CSV, FINETUNING_CSV],
+        code=[label_reviews, read_chunks, *LABEL_CODE],
+        params={'input_path': CLEAN_CSV, 'output_dir': CLEANED_DIR},
+        force=force,
+    )
+
+
+def split_stage(cache, test_size=TEST_SIZE, seed=RANDOM_SEED, force=False):
+    """Train/test splits for fine-tuning and classical ML"""
+    return cache.run(
+        'split', split_reviews,
+        inputs=[FINETUNING_CSV],
+        outputs=SPLIT_OUTPUTS,
+        code=[split_reviews, read_chunks, *SPLIT_CODE],
+        params={'input_path': FINETUNING_CSV, 'output_dir': CLEANED_DIR, 'test_size': test_size, 'seed': seed},
+        force=force,
+    )
+
+
+def augment_stage(cache, augment, code, params=None, force=False, options=None):
+    """Back-translation / synonym augmentation of the ML train split
+
+    augment(input_path, output_path, **params, **options) is augment_runner.run_augmentation,
+    code lists the functions it calls so that editing one of them invalidates the stage.
+    """
+    return cache.run(
+        'augment', augment,
+        inputs=[ML_TRAIN_CSV],
+        outputs=[AUGMENTED_CSV],
+        code=[augment, *code],
+        params={'input_path': ML_TRAIN_CSV, 'output_path': AUGMENTED_CSV, **(params or {})},
+        force=force,
+        options=options,
+    )
+
+
+def deep_clean_stage(cache, force=False):
+    """Deep cleaning of the augmented train set"""
+    return cache.run(
+        'deep_clean', deep_clean,
+        inputs=[AUGMENTED_CSV],
+        outputs=[AUGMENTED_CLEANED_CSV],
+        code=[deep_clean, repr(DEEP_CLEANING), *ML_CLEANING_CODE],
+        params={'input_path': AUGMENTED_CSV, 'output_path': AUGMENTED_CLEANED_CSV},
+        force=force,
+    )
+
+
+def run_stages(source=None, test_size=TEST_SIZE, seed=RANDOM_SEED, force=(), cache=None, augment=True):
+    """Bring every stage up to date, skipping the ones whose key did not change
+
+    The augmentation reruns with the parameters of its last run (see
+    augment_runner.recorded_params); augment=False skips it when its input
+    changed, as it loads translation and embedding models, and only reports it.
+    """
+    from .augment_runner import augment_with_cache, recorded_params
+
+    cache = cache or StageCache()
+    clean_stage(cache, source, force='clean' in force)
+    label_stage(cache, force='label' in force)
+    split_stage(cache, test_size=test_size, seed=seed, force='split' in force)
+
+    if augment:
+        augment_with_cache(cache, force='augment' in force, **recorded_params(cache))
+    else:
+        stale = cache.stale_inputs('augment')
+        if stale:
+            print(f"⚠️  augment: {', '.join(stale)} changed, rerun python -m preprocessing.augment_runner")
+
+    if os.path.exists(AUGMENTED_CSV):
+        deep_clean_stage(cache, force='deep_clean' in force)
+    else:
+        print(f"⚠️  deep_clean: {repo_path(AUGMENTED_CSV)} not found, run python -m preprocessing.augment_runner first")
+    return cache
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Run the preprocessing stages that are out of date")
+    parser.add_argument("--input", default=None,
+                        help="review store (.db) or CSV export (default: data/raw/reviews.db, else the CSV)")
+    parser.add_argument("--test-size", type=float, default=TEST_SIZE, help="expected share of each class in test")
+    parser.add_argument("--seed", type=int, default=RANDOM_SEED, help="salt of the split hash")
+    parser.add_argument("--force", nargs="*", default=[], choices=STAGES, help="stages to rerun anyway")
+    parser.add_argument("--no-augment", action="store_true",
+                        help="do not rerun the augmentation (translation models), only report it when stale")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run_stages(args.input, test_size=args.test_size, seed=args.seed, force=args.force, augment=not args.no_augment)
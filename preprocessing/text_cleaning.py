@@ -0,0 +1,187 @@
+"""
+Text cleaning - compiled versions of clean_text_light, clean_text_ml and remove_stopwords
+
+Every function has a scalar form (one comment, used by app.py and serving) and a
+`*_batch` form cleaning a whole pandas column in one pass (used by the notebooks).
+Both give exactly the same output as the original notebook functions.
+"""
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+
+# ========== COMPILED TABLES AND PATTERNS ==========
+
+EMOJI_REPLACEMENTS = {
+    "😊": " _emoji_souriant_ ",
+    "😍": " _emoji_coeur_ ",
+    "👍": " _emoji_ok_ ",
+    "👎": " _emoji_pas_ok_ ",
+    "😠": " _emoji_enerve_ ",
+    "😔": " _emoji_triste_ ",
+    "⭐": " _emoji_etoile_ ",
+    "🌟": " _emoji_etoile_brillante_ ",
+}
+
+PUNCTUATION_MARKERS = {
+    "!": " _exclamation_ ",
+    "?": " _question_ ",
+}
+
+# One replacement table, applied in a single pass of one precompiled alternation
+# (str.translate with a dict is ~4x slower on accented text)
+ML_REPLACEMENTS = {**EMOJI_REPLACEMENTS, **PUNCTUATION_MARKERS}
+
+
+def replacement_regex(table):
+    """Alternation matching any key of a replacement table"""
+    return re.compile("|".join(re.escape(key) for key in table))
+
+
+ML_REPLACE_REGEX = replacement_regex(ML_REPLACEMENTS)
+EMOJI_REGEX = replacement_regex(EMOJI_REPLACEMENTS)
+MARKER_REGEX = replacement_regex(PUNCTUATION_MARKERS)
+
+URL_REGEX = re.compile(r"http\S+|www\S+|https\S+")
+MENTION_HASHTAG_REGEX = re.compile(r"\@\w+|\#\w+")
+UNWANTED_CHARS_REGEX = re.compile(r"[^\w\sàâäéèêëîïôöùûüç.!?,;:]")
+EXCLAMATIONS_REGEX = re.compile(r"!+")
+QUESTIONS_REGEX = re.compile(r"\?+")
+ML_URL_REGEX = re.compile(r"http\S+|www\S+")
+
+# Negations carry the sentiment, they are never removed as stopwords
+NEGATIONS = frozenset({"ne", "pas", "jamais", "rien", "aucun", "sans", "not", "no", "never", "none"})
+
+
+# ========== STOPWORDS ==========
+
+@lru_cache(maxsize=None)
+def load_stopwords(keep_negations=True):
+    """French NLTK stopwords as a frozenset, without the negations by default"""
+    import nltk
+    from nltk.corpus import stopwords
+
+    try:
+        nltk.data.find("corpora/stopwords")
+    except LookupError:
+        nltk.download("stopwords")
+
+    words = frozenset(stopwords.words("french"))
+    return words - NEGATIONS if keep_negations else words
+
+
+def as_text_list(texts):
+    """Values of a Series / array / list as a list of str (missing values become "")"""
+    return pd.Series(texts, dtype="string").fillna("").tolist()
+
+
+def replace_from(table):
+    """Substitution callback looking the match up in a replacement table"""
+    return lambda match: table[match.group()]
+
+
+REPLACE_ML = replace_from(ML_REPLACEMENTS)
+REPLACE_EMOJI = replace_from(EMOJI_REPLACEMENTS)
+REPLACE_MARKER = replace_from(PUNCTUATION_MARKERS)
+
+
+# ========== LIGHT CLEANING (transformers) ==========
+
+def clean_text_light(text):
+    """
+    Nettoyage léger : conserve la ponctuation importante pour le sentiment.
+    """
+    text = URL_REGEX.sub("", text)
+    text = MENTION_HASHTAG_REGEX.sub("", text)
+    # same as re.sub(r"\s+", " ", text).strip(), without the regex
+    return " ".join(text.split())
+
+
+def clean_text_light_batch(texts):
+    """clean_text_light over a whole column, returns a string Series with the same index"""
+    index = texts.index if isinstance(texts, pd.Series) else None
+    return pd.Series([clean_text_light(text) for text in as_text_list(texts)], index=index, dtype="string")
+
+
+# ========== ML CLEANING (TF-IDF / classical models) ==========
+
+def clean_text_ml(text, collapse_punctuation=False, map_emojis=True):
+    """Clean text for TF-IDF / classical ML.
+
+    collapse_punctuation marks a run of "!!!" once instead of once per character,
+    map_emojis=False drops the emojis instead of turning them into tokens (deep
+    cleaning of already cleaned, augmented texts).
+    """
+    if not isinstance(text, str) or text.strip() == "":
+        return ""
+
+    text = text.lower()
+    if collapse_punctuation:
+        text = EMOJI_REGEX.sub(REPLACE_EMOJI, text) if map_emojis else text
+    elif map_emojis:
+        text = ML_REPLACE_REGEX.sub(REPLACE_ML, text)
+    else:
+        text = MARKER_REGEX.sub(REPLACE_MARKER, text)
+
+    # remove unwanted chars but keep basic punctuation
+    text = UNWANTED_CHARS_REGEX.sub(" ", text)
+
+    if collapse_punctuation:
+        text = EXCLAMATIONS_REGEX.sub(" _exclamation_ ", text)
+        text = QUESTIONS_REGEX.sub(" _question_ ", text)
+
+    # @ and # are already gone at this point, so only URLs are left to remove
+    text = ML_URL_REGEX.sub(" ", text)
+
+    return " ".join(text.split())
+
+
+def clean_text_ml_batch(texts, collapse_punctuation=False, map_emojis=True):
+    """clean_text_ml over a whole column, returns a string Series with the same index"""
+    index = texts.index if isinstance(texts, pd.Series) else None
+    cleaned = [clean_text_ml(text, collapse_punctuation, map_emojis) for text in as_text_list(texts)]
+    return pd.Series(cleaned, index=index, dtype="string")
+
+
+# ========== STOPWORD REMOVAL ==========
+
+def remove_stopwords(text, stopwords=None, min_length=1):
+    """Drop stopwords (and words shorter than min_length) from a cleaned text"""
+    stopwords = load_stopwords() if stopwords is None else stopwords
+    return " ".join([w for w in text.split() if w not in stopwords and len(w) >= min_length])
+
+
+def remove_stopwords_batch(texts, stopwords=None, min_length=1):
+    """remove_stopwords over a whole column, with one frozenset lookup per word"""
+    stopwords = load_stopwords() if stopwords is None else stopwords
+    index = texts.index if isinstance(texts, pd.Series) else None
+    cleaned = [
+        " ".join([w for w in text.split() if w not in stopwords and len(w) >= min_length])
+        for text in as_text_list(texts)
+    ]
+    return pd.Series(cleaned, index=index, dtype="string")
+
+
+def preprocess_ml_batch(texts, stopwords=None, min_length=1, collapse_punctuation=False, map_emojis=True):
+    """Full classical-ML pipeline: clean_text_ml then remove_stopwords, in one pass per row"""
+    stopwords = load_stopwords() if stopwords is None else stopwords
+    index = texts.index if isinstance(texts, pd.Series) else None
+    cleaned = [
+        " ".join([w for w in clean_text_ml(text, collapse_punctuation, map_emojis).split()
+                  if w not in stopwords and len(w) >= min_length])
+        for text in as_text_list(texts)
+    ]
+    return pd.Series(cleaned, index=index, dtype="string")
+
+
+# Second pass of the augmented train set (stages.deep_clean): "!!!" / "???" marked
+# once, emojis dropped, full stopword list, words of 1 char removed
+DEEP_CLEANING = {'min_length': 2, 'collapse_punctuation': True, 'map_emojis': False}
+
+
+def preprocess_ml_deep_batch(texts):
+    """Text as the augmented-data models were trained on: preprocess_ml_batch as in
+    the ML splits, then the deep_clean pass"""
+    return preprocess_ml_batch(preprocess_ml_batch(texts), stopwords=load_stopwords(keep_negations=False),
+                               **DEEP_CLEANING)
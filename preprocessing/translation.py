@@ -0,0 +1,173 @@
+"""
+Translation service - concurrent, rate-limited translations with a persistent SQLite cache
+
+    service = TranslationService(GoogleBackend())
+    service.back_translate(texts, pivot='en')
+
+Backends only need a `name` and a blocking translate(text, source, target):
+GoogleBackend (deep_translator, the notebook's translator), HuggingFaceBackend
+(local MarianMT models, offline) and FakeBackend (deterministic, for tests and
+dry runs). Every (backend, source, target, text) is translated once: reruns are
+served from data/cache/translations.db. Failed calls are retried, counted and
+never cached.
+"""
+import os
+import sqlite3
+import threading
+
+from .async_jobs import map_async, run_sync, MAX_CONCURRENCY, MAX_RETRIES
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRANSLATION_CACHE = os.path.join(REPO_ROOT, "data", "cache", "translations.db")
+REQUESTS_PER_SECOND = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS translations (
+    backend     TEXT,
+    source      TEXT,
+    target      TEXT,
+    text        TEXT,
+    translation TEXT,
+    PRIMARY KEY (backend, source, target, text)
+);
+"""
+
+
+# ========== BACKENDS ==========
+
+class GoogleBackend:
+    name = 'google'
+
+    def translate(self, text, source, target):
+        """Google Translate through deep_translator"""
+        from deep_translator import GoogleTranslator
+        return GoogleTranslator(source=source, target=target).translate(text)
+
+
+class HuggingFaceBackend:
+    name = 'opus-mt'
+
+    def __init__(self, model_template='Helsinki-NLP/opus-mt-{source}-{target}', device=-1):
+        """Local MarianMT models, one per language pair, loaded on first use"""
+        self.model_template = model_template
+        self.device = device
+        self.pipelines = {}
+        self.lock = threading.Lock()
+
+    def translate(self, text, source, target):
+        """Translate with the local model of the pair"""
+        from transformers import pipeline
+
+        with self.lock:
+            if (source, target) not in self.pipelines:
+                model = self.model_template.format(source=source, target=target)
+                self.pipelines[(source, target)] = pipeline('translation', model=model, device=self.device)
+            return self.pipelines[(source, target)](text)[0]['translation_text']
+
+
+class FakeBackend:
+    name = 'fake'
+
+    def __init__(self, translations=None):
+        """Deterministic stand-in: known (text, source, target) from a table, else a tagged copy"""
+        self.translations = translations or {}
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def translate(self, text, source, target):
+        """Table lookup or "text [source>target]" """
+        with self.lock:
+            self.calls += 1
+        return self.translations.get((text, source, target), f"{text} [{source}>{target}]")
+
+
+# ========== CACHE ==========
+
+class TranslationCache:
+    def __init__(self, db_filename=TRANSLATION_CACHE):
+        """Open (or create) the SQLite translation cache"""
+        directory = os.path.dirname(db_filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_filename, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def get_many(self, backend, source, target, texts, chunk_size=500):
+        """Cached translations of texts, as {text: translation}"""
+        found = {}
+        with self.lock:
+            for i in range(0, len(texts), chunk_size):
+                chunk = texts[i:i + chunk_size]
+                rows = self.conn.execute(
+                    f"SELECT text, translation FROM translations WHERE backend = ? AND source = ? AND target = ? "
+                    f"AND text IN ({', '.join('?' * len(chunk))})",
+                    [backend, source, target, *chunk]
+                )
+                found.update(rows)
+        return found
+
+    def put(self, backend, source, target, text, translation):
+        """Store one translation"""
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?)",
+                              (backend, source, target, text, translation))
+
+    def close(self):
+        """Close the database"""
+        self.conn.close()
+
+
+# ========== SERVICE ==========
+
+class TranslationService:
+    def __init__(self, backend, cache=None, concurrency=MAX_CONCURRENCY, rate=REQUESTS_PER_SECOND,
+                 retries=MAX_RETRIES):
+        """Translations through `backend`, cached in `cache` (None: the default cache file)"""
+        self.backend = backend
+        self.cache = cache if cache is not None else TranslationCache()
+        self.concurrency = concurrency
+        self.rate = rate
+        self.retries = retries
+        self.stats = {'hits': 0, 'calls': 0, 'failures': 0}
+        self.errors = []
+
+    def translate(self, texts, source, target):
+        """Translations of texts (None where the backend kept failing), in input order"""
+        texts = list(texts)
+        unique = list(dict.fromkeys(texts))
+        found = self.cache.get_many(self.backend.name, source, target, unique)
+        missing = [text for text in unique if text not in found]
+        self.stats['hits'] += len(unique) - len(missing)
+
+        def store(item, translation, error):
+            text = item[0]
+            if error is not None:
+                self.stats['failures'] += 1
+                self.errors.append((text, source, target, repr(error)))
+                return
+            found[text] = translation
+            self.cache.put(self.backend.name, source, target, text, translation)
+
+        if missing:
+            self.stats['calls'] += len(missing)
+            run_sync(map_async(self.backend.translate, [(text, source, target) for text in missing],
+                               concurrency=self.concurrency, rate=self.rate, retries=self.retries,
+                               on_result=store))
+        return [found.get(text) for text in texts]
+
+    def back_translate(self, texts, pivot='en', source='fr'):
+        """Back-translations through `pivot`, None where unusable (same rules as back_translate_fr)"""
+        texts = list(texts)
+        inter = self.translate(texts, source, pivot)
+        usable = [i for i, text in enumerate(inter) if text and len(text.strip()) >= 3]
+        back = self.translate([inter[i] for i in usable], pivot, source)
+
+        results = [None] * len(texts)
+        for i, text in zip(usable, back):
+            if text and text.strip() != "" and text.strip() != texts[i].strip():
+                results[i] = text
+        return results
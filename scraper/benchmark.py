@@ -0,0 +1,209 @@
+"""
+Offline benchmark - replays recorded pages and reports scraping throughput per source
+"""
+import os
+import time
+import json
+import argparse
+import tempfile
+
+from config import RECORD_DIR, REPLAY_BATCH_SIZE
+from scraper import UnifiedReviewScraper
+from writer import ReviewWriter
+from storage import ReviewStore
+from state import ScrapeState
+from replay import ReplayServer, load_manifest
+from http_fetcher import HttpSourceFetcher, PARSERS
+from pool import percentile
+
+
+# Selenium scraper method for each non-Google source
+BROWSER_SCRAPERS = {
+    "top-rated.online": "scrape_top_rated",
+    "expat.com": "scrape_expat",
+    "trustburn.com": "scrape_trustburn",
+}
+
+
+class TimedWriter(ReviewWriter):
+    def __init__(self, *args, **kwargs):
+        """ReviewWriter that records the latency of every flush"""
+        self.flush_times = []
+        super().__init__(*args, **kwargs)
+
+    def _flush_locked(self):
+        """Time the write of the pending rows"""
+        start = time.perf_counter()
+        written = super()._flush_locked()
+        if written:
+            self.flush_times.append((written, time.perf_counter() - start))
+        return written
+
+
+def count_webdriver_calls(driver):
+    """Count every WebDriver command sent by the driver and its elements"""
+    counter = {'calls': 0}
+    execute = driver.command_executor.execute
+
+    def counting_execute(command, params=None):
+        counter['calls'] += 1
+        return execute(command, params)
+
+    driver.command_executor.execute = counting_execute
+    return counter
+
+
+def measure(source, location, mode, run, writer, counter):
+    """Run one scrape and collect throughput, WebDriver calls and write latency"""
+    calls_before = counter['calls']
+    flushes_before = len(writer.flush_times)
+
+    start = time.perf_counter()
+    found, successful, failed, new = run()
+    elapsed = time.perf_counter() - start
+
+    calls = counter['calls'] - calls_before
+    write_times = [seconds * 1000 for _, seconds in writer.flush_times[flushes_before:]]
+    return {
+        'source': source,
+        'location': location,
+        'mode': mode,
+        'reviews': found,
+        'failed': failed,
+        'seconds': round(elapsed, 3),
+        'reviews_per_second': round(found / elapsed, 2) if elapsed > 0 else 0.0,
+        'webdriver_calls': calls,
+        'calls_per_review': round(calls / found, 2) if found else None,
+        'flushes': len(write_times),
+        'write_p50_ms': round(percentile(write_times, 50), 2),
+        'write_max_ms': round(max(write_times, default=0.0), 2),
+    }
+
+
+def mode_scraper(tmp_dir, mode, backend, replay_url):
+    """Scraper and store writing to their own throwaway subdirectory, so every mode starts empty"""
+    directory = os.path.join(tmp_dir, mode)
+    os.makedirs(directory)
+    store = ReviewStore(os.path.join(directory, "reviews.db")) if backend == "sqlite" else None
+    writer = TimedWriter(os.path.join(directory, "reviews.csv"), store=store,
+                         near_duplicates_filename=os.path.join(directory, "near_duplicates.jsonl"))
+    scraper = UnifiedReviewScraper(writer=writer, state=ScrapeState(os.path.join(directory, "state")),
+                                   replay_url=replay_url)
+    return scraper, store
+
+
+def run_benchmark(record_dir=RECORD_DIR, backend="sqlite", http=True, browser=True, headless=True,
+                  condition_timeout=1, scroll_wait_max=2, batch_size=REPLAY_BATCH_SIZE):
+    """Scrape every recorded page from the local replay server, returns one result per page and mode"""
+    pages = list(load_manifest(record_dir).values())
+    if not pages:
+        print(f"No recorded pages in {record_dir} (run `python run_scraper.py --record` first)")
+        return []
+
+    results = []
+    counter = {'calls': 0}
+    browser_pages = [page for page in pages if page['source'] == "Google Maps" or page['source'] in BROWSER_SCRAPERS] if browser else []
+    http_pages = [page for page in pages if page['source'] in PARSERS] if http else []
+
+    # Throwaway outputs so a benchmark never touches the real review data
+    with tempfile.TemporaryDirectory() as tmp_dir, ReplayServer(record_dir, batch_size=batch_size) as server:
+        if browser_pages:
+            scraper, store = mode_scraper(tmp_dir, "browser", backend, server.url)
+            scraper.condition_timeout = condition_timeout
+            scraper.scroll_wait_max = scroll_wait_max
+            try:
+                scraper.setup_driver(headless=headless)
+                counter = count_webdriver_calls(scraper.driver)
+
+                for page in browser_pages:
+                    source, location = page['source'], page['location']
+                    print(f"\n[browser] {source} - {location}")
+                    if source == "Google Maps":
+                        run = lambda: scraper.scrape_google_location(page['url'], location, full=True)
+                    else:
+                        run = getattr(scraper, BROWSER_SCRAPERS[source])
+                    results.append(measure(source, location, "browser", run, scraper.writer, counter))
+            finally:
+                scraper.close()
+                if store is not None:
+                    store.close()
+
+        if http_pages:
+            # a store of its own: sharing the browser's would make every review a duplicate
+            scraper, store = mode_scraper(tmp_dir, "http", backend, server.url)
+            counter = {'calls': 0}
+            try:
+                for page in http_pages:
+                    source, location = page['source'], page['location']
+                    print(f"\n[http] {source} - {location}")
+                    fetcher = HttpSourceFetcher(scraper, sources=[(source, page['url'], location)])
+
+                    def run():
+                        stats, _ = fetcher.run()
+                        return stats.get(source, (0, 0, 0, 0))
+                    results.append(measure(source, location, "http", run, scraper.writer, counter))
+            finally:
+                scraper.close()
+                if store is not None:
+                    store.close()
+
+    return results
+
+
+def print_report(results):
+    """Print the per-page results and the totals per source"""
+    print("\nREPLAY BENCHMARK")
+    print(f"{'Source':<18} {'Location':<36} {'Mode':<8} {'Reviews':>8} {'Rev/s':>8} "
+          f"{'Calls/rev':>9} {'Write p50 (ms)':>14} {'Write max (ms)':>14}")
+
+    for r in results:
+        calls_per_review = f"{r['calls_per_review']:.2f}" if r['calls_per_review'] is not None else "-"
+        print(f"{r['source']:<18} {r['location'][:36]:<36} {r['mode']:<8} {r['reviews']:>8} "
+              f"{r['reviews_per_second']:>8.2f} {calls_per_review:>9} "
+              f"{r['write_p50_ms']:>14.2f} {r['write_max_ms']:>14.2f}")
+
+    print("\nPER SOURCE")
+    totals = {}
+    for r in results:
+        total = totals.setdefault((r['source'], r['mode']), {'reviews': 0, 'seconds': 0.0, 'calls': 0})
+        total['reviews'] += r['reviews']
+        total['seconds'] += r['seconds']
+        total['calls'] += r['webdriver_calls']
+
+    for (source, mode), total in sorted(totals.items()):
+        rate = total['reviews'] / total['seconds'] if total['seconds'] > 0 else 0.0
+        calls = total['calls'] / total['reviews'] if total['reviews'] else 0.0
+        print(f"   {source} ({mode}): {total['reviews']} reviews in {total['seconds']:.1f}s, "
+              f"{rate:.2f} reviews/s, {calls:.2f} WebDriver calls/review")
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Replay recorded pages and benchmark the scraper")
+    parser.add_argument("--record-dir", default=RECORD_DIR, help="directory of recorded pages")
+    parser.add_argument("--backend", choices=["sqlite", "csv"], default="sqlite", help="review storage to benchmark")
+    parser.add_argument("--no-http", action="store_true", help="skip the HTTP fetcher for static sources")
+    parser.add_argument("--no-browser", action="store_true", help="only benchmark the HTTP fetcher (no Chrome needed)")
+    parser.add_argument("--show-browser", action="store_true", help="run Chrome with a window")
+    parser.add_argument("--condition-timeout", type=float, default=1,
+                        help="page-state wait timeout in seconds (recorded pages have no cookie banners)")
+    parser.add_argument("--scroll-wait-max", type=float, default=2,
+                        help="scroll backoff ceiling in seconds (replayed pages load in milliseconds)")
+    parser.add_argument("--batch-size", type=int, default=REPLAY_BATCH_SIZE,
+                        help="review cards revealed per scroll on replayed Google Maps pages")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run_benchmark(args.record_dir, backend=args.backend, http=not args.no_http,
+                            browser=not args.no_browser, headless=not args.show_browser,
+                            condition_timeout=args.condition_timeout,
+                            scroll_wait_max=args.scroll_wait_max, batch_size=args.batch_size)
+    if results:
+        print_report(results)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+            print(f"\nResults saved: {args.output}")
@@ -1,10 +1,29 @@
 """
 Configuration settings for the California Gym scraper
 """
+import os
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 # CSV Configuration
 CSV_FILENAME = "data/raw/all_california_gym_reviews.csv"
 CSV_ENCODING = "utf-8-sig"
+STATE_DIR = "data/raw/scrape_state"  # Per source/location high-water marks
+JOURNAL_FILENAME = "data/raw/scrape_journal.json"  # Finished tasks of the current run (resume after a crash)
+METRICS_FILENAME = "data/raw/scrape_metrics.jsonl"  # One JSON line per finished task and per run
+
+# Storage Configuration
+STORAGE_BACKEND = "sqlite"  # "sqlite" (indexed store, CSV exported after each run) or "csv"
+DB_FILENAME = "data/raw/reviews.db"
+WRITE_BATCH_SIZE = 50  # Buffered reviews are flushed to disk at this size
+NEAR_DUPLICATES = "flag"  # Reposted reviews (same text, new ID): "flag" logs them, "drop" skips them, "off"
+NEAR_DUPLICATE_THRESHOLD = 0.8  # Estimated Jaccard similarity of the character 5-grams
+NEAR_DUPLICATES_FILENAME = os.path.join(REPO_ROOT, "data", "raw", "near_duplicates.jsonl")  # One JSON line per repost found
+REVIEW_CACHE_DIR = "data/cache/reviews"  # Compact Arrow copies of the reviews, memory-mapped by load_reviews
+
+# Record/Replay Configuration (offline benchmarks)
+RECORD_DIR = "data/raw/recordings"  # Rendered pages saved by `run_scraper.py --record`
+REPLAY_BATCH_SIZE = 10  # Review cards revealed per scroll when replaying a Google Maps page
 
 # Browser Configuration
 HEADLESS = False
@@ -12,12 +31,19 @@ IMPLICIT_WAIT = 15
 PAGE_LOAD_TIMEOUT = 30
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 
+# HTTP Configuration (static sources fetched without a browser)
+HTTP_FETCH = True
+HTTP_MAX_CONNECTIONS = 10
+
 # Scraping Configuration
-SCROLL_ATTEMPTS_CONTAINER = 8
-SCROLL_ATTEMPTS_WINDOW = 6
-SCROLL_DELAY = 1.5
+SCROLL_WAIT_MIN = 0.5  # First wait for new reviews after a scroll (seconds)
+SCROLL_WAIT_MAX = 8  # Backoff ceiling: no new reviews after this long ends the scroll
+SCROLL_MAX_TIME = 600  # Hard cap on scrolling a single location (seconds)
+REVIEW_TARGET = None  # Stop scrolling once this many reviews are loaded (None = all)
+CONDITION_TIMEOUT = 5  # Timeout for page-state waits (cookies, tabs, review lists)
 DELAY_BETWEEN_LOCATIONS = 2
-PROCESSING_DELAY = 0.05
+JS_EXTRACTION = True  # Extract all Google reviews in one execute_script call (selectors as fallback)
+WORKERS = 1  # Parallel browsers for Google Maps (1 = sequential)
 
 # Google Maps locations to scrape
 GOOGLE_LOCATIONS = {
@@ -0,0 +1,147 @@
+"""
+Relative date parser - converts "il y a 2 mois" / "a year ago" / "قبل 3 أيام" to DD-MM-YYYY
+"""
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from language_dict import DATE_NUMBERS, DATE_UNITS, DATE_DUALS, DATE_KEYWORDS, DATE_MONTHS
+
+
+def alternation(words):
+    """Regex alternation of literal words, longest first so plurals win"""
+    return '|'.join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+
+
+# One combined pattern: a stand-alone keyword, or an optional number followed by a unit
+DATE_REGEX = re.compile(
+    r'(?<!\w)(?:'
+    rf'(?P<keyword>{alternation(DATE_KEYWORDS)})'
+    r'|'
+    rf'(?:(?P<num>\d+|{alternation(DATE_NUMBERS)})\s*)?(?P<unit>{alternation(list(DATE_UNITS) + list(DATE_DUALS))})'
+    r')(?!\w)',
+    re.IGNORECASE
+)
+
+EXACT_DATE_REGEX = re.compile(r'\d{1,2}-\d{1,2}-\d{4}')
+
+# Absolute dates written with a month name: "07 mai 2012", "8 August 2012"
+NAMED_DATE_REGEX = re.compile(
+    rf'(?<!\w)(?P<day>\d{{1,2}})\s+(?P<month>{alternation(DATE_MONTHS)})\s+(?P<year>\d{{4}})(?!\w)',
+    re.IGNORECASE
+)
+
+# Arabic-Indic digits -> ASCII digits
+ARABIC_DIGITS = str.maketrans('٠١٢٣٤٥٦٧٨٩', '0123456789')
+
+
+class DateParser:
+    def __init__(self, reference_date=None, cache_size=4096):
+        """Parser with one fixed reference date for the whole run"""
+        self.reference_date = reference_date or datetime.now()
+        self.parse = lru_cache(maxsize=cache_size)(self._parse)
+
+    @staticmethod
+    def normalize(date_text):
+        """Lowercase, trim and convert Arabic-Indic digits"""
+        return date_text.strip().lower().translate(ARABIC_DIGITS)
+
+    @staticmethod
+    def offset_days(text):
+        """Days between the reference date and a normalized relative date, or None"""
+        match = DATE_REGEX.search(text)
+        if not match:
+            return None
+
+        keyword = match.group('keyword')
+        if keyword:
+            return DATE_KEYWORDS[keyword]
+
+        unit = match.group('unit')
+        if unit in DATE_DUALS:
+            return DATE_DUALS[unit]
+
+        num = match.group('num')
+        if not num:
+            count = 1
+        elif num.isdigit():
+            count = int(num)
+        else:
+            count = DATE_NUMBERS[num]
+        return count * DATE_UNITS[unit]
+
+    @staticmethod
+    def exact_date(text):
+        """D-M-YYYY text as DD-MM-YYYY, "N/A" if that day does not exist (as parse_column)"""
+        try:
+            return datetime.strptime(text, '%d-%m-%Y').strftime('%d-%m-%Y')
+        except ValueError:
+            return "N/A"
+
+    def _parse(self, date_text):
+        """Convert relative date to exact date (DD-MM-YYYY), "N/A" if unknown"""
+        if not date_text or date_text == "N/A":
+            return "N/A"
+
+        text = self.normalize(date_text)
+
+        # Already an exact date
+        if EXACT_DATE_REGEX.fullmatch(text):
+            return self.exact_date(text)
+
+        named = NAMED_DATE_REGEX.search(text)
+        if named:
+            day, month, year = int(named.group('day')), DATE_MONTHS[named.group('month')], int(named.group('year'))
+            return self.exact_date(f"{day}-{month}-{year}")
+
+        days = self.offset_days(text)
+        if days is None:
+            return "N/A"
+        return (self.reference_date - timedelta(days=days)).strftime('%d-%m-%Y')
+
+    def parse_column(self, series, as_datetime=False):
+        """Vectorized parse of a pandas Series of date texts
+
+        Exact DD-MM-YYYY values are kept, relative ones are resolved against the
+        reference date. Returns DD-MM-YYYY strings ("N/A" when unknown), or a
+        datetime64 Series (NaT when unknown) if as_datetime is True.
+        """
+        import pandas as pd
+
+        text = series.astype("string").str.strip().str.lower().str.translate(ARABIC_DIGITS)
+
+        exact = pd.to_datetime(text.where(text.str.fullmatch(EXACT_DATE_REGEX.pattern)),
+                               format='%d-%m-%Y', errors='coerce')
+
+        named = text.str.extract(NAMED_DATE_REGEX)
+        named_text = named['day'] + '-' + named['month'].map(DATE_MONTHS).astype("Int64").astype("string") + '-' + named['year']
+        exact = exact.fillna(pd.to_datetime(named_text, format='%d-%m-%Y', errors='coerce'))
+
+        parts = text.str.extract(DATE_REGEX)
+        count = pd.to_numeric(parts['num'], errors='coerce')
+        count = count.fillna(parts['num'].map(DATE_NUMBERS)).fillna(1)
+        days = (count * parts['unit'].map(DATE_UNITS).astype(float))
+        days = days.fillna(parts['unit'].map(DATE_DUALS)).fillna(parts['keyword'].map(DATE_KEYWORDS))
+
+        reference = pd.Timestamp(self.reference_date).normalize()
+        relative = reference - pd.to_timedelta(days.astype(float), unit='D')
+        result = exact.fillna(relative)
+
+        if as_datetime:
+            return result
+        return result.dt.strftime('%d-%m-%Y').fillna("N/A")
+
+
+# Shared parser for a scraping run: every review uses the same reference date
+default_parser = DateParser()
+
+
+def convert_date(date_text):
+    """Convert relative date to exact date (DD-MM-YYYY) with the run's parser"""
+    return default_parser.parse(date_text)
+
+
+def parse_date_column(series, reference_date=None, as_datetime=False):
+    """Vectorized convert_date for a pandas date column"""
+    parser = default_parser if reference_date is None else DateParser(reference_date)
+    return parser.parse_column(series, as_datetime=as_datetime)
@@ -0,0 +1,212 @@
+"""
+Lightweight HTTP fetcher - scrapes server-rendered sources without Selenium
+"""
+import re
+import time
+import asyncio
+from datetime import datetime
+
+import httpx
+from bs4 import BeautifulSoup
+
+from config import OTHER_SOURCES, USER_AGENT, PAGE_LOAD_TIMEOUT, HTTP_MAX_CONNECTIONS
+
+
+def clean_comment(text):
+    """Collapse whitespace and line breaks in a comment"""
+    return re.sub(r'\s+', ' ', text.replace('\n', ' ').replace('\r', '')).strip()
+
+
+def text_of(node, selector):
+    """Stripped text of the first node matching a CSS selector, or None"""
+    found = node.select_one(selector)
+    if found is None:
+        return None
+    return found.get_text(" ", strip=True)
+
+
+def build_review(prefix, source_name, location_name, name, exact_date, rating, comment):
+    """Build a review dict with the same ID scheme as the Selenium scrapers"""
+    clean_name = re.sub(r'[^a-zA-Z0-9]', '_', name)
+    clean_date = re.sub(r'[^a-zA-Z0-9]', '_', exact_date)
+    clean_location = re.sub(r'[^a-zA-Z0-9]', '_', location_name)
+    unique_id = f"{prefix}_{clean_location}_{clean_name}_{clean_date}"[:100]
+
+    return {
+        "id": unique_id,
+        "name": name,
+        "source": source_name,
+        "location": location_name,
+        "date": exact_date,
+        "rating": rating,
+        "comment": comment
+    }
+
+
+# ========== PARSERS (pure functions, testable on saved HTML) ==========
+
+def parse_top_rated(html, source_name, location_name, convert_date):
+    """Parse reviews from a top-rated.online page"""
+    soup = BeautifulSoup(html, "html.parser")
+    reviews = []
+
+    for rev in soup.select("div.border-b"):
+        rating_text = text_of(rev, "span.text-white")
+        try:
+            rating = float(rating_text) if rating_text else 0
+        except ValueError:
+            rating = 0
+
+        name = text_of(rev, "span.font-semibold a") or "Anonymous"
+
+        info = text_of(rev, "div.text-sm")
+        exact_date = convert_date(info.split("on Google")[0].strip()) if info else "N/A"
+
+        comment = clean_comment(text_of(rev, "p.text-gray-700") or "")
+
+        reviews.append(build_review("toprated", source_name, location_name, name, exact_date, rating, comment))
+
+    return reviews
+
+
+def parse_expat(html, source_name, location_name, convert_date):
+    """Parse forum posts from an expat.com thread"""
+    soup = BeautifulSoup(html, "html.parser")
+    reviews = []
+
+    for post in soup.select("div.card-post"):
+        username = text_of(post, "a.card-post--content--author--username") or "Anonymous"
+
+        exact_date = "N/A"
+        time_elem = post.select_one("time")
+        if time_elem is not None and time_elem.get("datetime"):
+            date_text = time_elem["datetime"].strip()
+            try:
+                dt = datetime.fromisoformat(date_text.replace('Z', '+00:00'))
+                exact_date = dt.strftime('%d-%m-%Y')
+            except ValueError:
+                exact_date = date_text
+
+        comment = clean_comment(text_of(post, "div.card-post--content--message") or "")
+
+        # Forum posts don't have ratings
+        reviews.append(build_review("expat", source_name, location_name, username, exact_date, 0, comment))
+
+    return reviews
+
+
+def parse_trustburn(html, source_name, location_name, convert_date):
+    """Parse reviews from a trustburn.com page"""
+    soup = BeautifulSoup(html, "html.parser")
+    reviews = []
+
+    for review in soup.select("article.review-card"):
+        user = text_of(review, "div.username span") or "Anonymous"
+
+        # Each star is partially filled through its CSS width
+        rating = 0
+        try:
+            for star in review.select("i.fa-star.rate"):
+                width = star.get("style", "")
+                percent = int(width.replace("width:", "").replace("%;", "").strip())
+                rating += percent / 100
+        except ValueError:
+            rating = 0
+
+        date_text = text_of(review, "time.datetime")
+        exact_date = convert_date(date_text) if date_text else "N/A"
+
+        comment = clean_comment(text_of(review, "p.text") or "")
+
+        reviews.append(build_review("trustburn", source_name, location_name, user, exact_date, rating, comment))
+
+    return reviews
+
+
+PARSERS = {
+    "top-rated.online": parse_top_rated,
+    "expat.com": parse_expat,
+    "trustburn.com": parse_trustburn,
+}
+
+
+def parse_saved_page(source_name, path, location_name, convert_date):
+    """Run a source parser on a saved HTML file (offline fixtures)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return PARSERS[source_name](f.read(), source_name, location_name, convert_date)
+
+
+# ========== CONCURRENT FETCHING ==========
+
+class HttpSourceFetcher:
+    def __init__(self, scraper, sources=OTHER_SOURCES, journal=None):
+        """Fetch static sources over HTTP, saving through the scraper's writer"""
+        self.scraper = scraper
+        self.sources = sources
+        self.journal = journal
+
+    async def fetch_source(self, client, source_name, url, location_name):
+        """Fetch and parse one source, returns (stats, needs_browser)"""
+        start = time.time()
+        try:
+            response = await client.get(self.scraper.page_url(source_name, location_name, url))
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            print(f"   {source_name}: HTTP fetch failed ({e}), using browser")
+            return source_name, (0, 0, 0, 0), True
+
+        try:
+            reviews = PARSERS[source_name](response.text, source_name, location_name, self.scraper.convert_date)
+        except Exception as e:
+            print(f"   {source_name}: could not parse page ({e}), using browser")
+            return source_name, (0, 0, 0, 0), True
+
+        # Nothing in the static HTML: the page probably needs JavaScript
+        if not reviews:
+            print(f"   {source_name}: no reviews in static HTML, using browser")
+            return source_name, (0, 0, 0, 0), True
+
+        self.scraper.record_page(source_name, location_name, url, html=response.text)
+
+        new_reviews = 0
+        for review_data in reviews:
+            if self.scraper.save_review(review_data):
+                new_reviews += 1
+        self.scraper.state.update_from_reviews(source_name, location_name, reviews)
+
+        stats = (len(reviews), len(reviews), 0, new_reviews)
+        duration = time.time() - start
+        if self.journal is not None:
+            self.scraper.flush_reviews()
+            self.journal.record(source_name, location_name, stats, duration, method="http")
+
+        print(f"   {source_name}: {len(reviews)} reviews in {duration:.1f}s")
+        return source_name, stats, False
+
+    async def fetch_all(self):
+        """Fetch all supported sources concurrently over one pooled client"""
+        limits = httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS)
+        headers = {"User-Agent": USER_AGENT}
+
+        async with httpx.AsyncClient(headers=headers, limits=limits, timeout=PAGE_LOAD_TIMEOUT,
+                                     follow_redirects=True) as client:
+            tasks = [
+                self.fetch_source(client, source_name, url, location_name)
+                for source_name, url, location_name in self.sources
+                if source_name in PARSERS
+            ]
+            return await asyncio.gather(*tasks)
+
+    def run(self):
+        """Scrape static sources, returns (stats per source, sources needing a browser)"""
+        results = {}
+        needs_browser = [source_name for source_name, _, _ in self.sources if source_name not in PARSERS]
+
+        for source_name, stats, fallback in asyncio.run(self.fetch_all()):
+            if fallback:
+                needs_browser.append(source_name)
+            else:
+                results[source_name] = stats
+
+        self.scraper.flush_reviews()
+        return results, needs_browser
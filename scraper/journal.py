@@ -0,0 +1,156 @@
+"""
+Run journal - checkpoints finished (source, location) tasks and logs run metrics as JSON lines
+
+A task that crashed is kept under 'failed', not 'done': it stays pending, so a
+resumed run scrapes it again, and a run with failed tasks is left resumable.
+"""
+import os
+import json
+import threading
+from datetime import datetime
+
+from config import JOURNAL_FILENAME, METRICS_FILENAME
+
+
+STAT_FIELDS = ['found', 'successful', 'failed', 'new']
+
+
+def task_key(source, location):
+    """Journal key of a (source, location) task"""
+    return f"{source}::{location}"
+
+
+class RunJournal:
+    def __init__(self, journal_filename=JOURNAL_FILENAME, metrics_filename=METRICS_FILENAME):
+        """Journal of the current scrape run, resumable after a crash"""
+        for filename in (journal_filename, metrics_filename):
+            directory = os.path.dirname(filename)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        self.journal_filename = journal_filename
+        self.metrics_filename = metrics_filename
+        self.lock = threading.Lock()
+        self.run = {}
+
+    def load(self):
+        """Return the saved journal, or an empty dict"""
+        try:
+            with open(self.journal_filename, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        """Write the journal atomically, caller must hold the lock"""
+        tmp_filename = self.journal_filename + '.tmp'
+        with open(tmp_filename, 'w', encoding='utf-8') as f:
+            json.dump(self.run, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_filename, self.journal_filename)
+
+    def log_metrics(self, record):
+        """Append one JSON line to the metrics log, caller must hold the lock"""
+        record = {'timestamp': datetime.now().isoformat(timespec='seconds'), 'run_id': self.run['run_id'], **record}
+        with open(self.metrics_filename, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def start(self, tasks, resume=True, mode=None):
+        """Start a run over (source, location) tasks, resuming an unfinished one if possible
+
+        Returns True when an interrupted run is resumed.
+        """
+        with self.lock:
+            previous = self.load()
+            if resume and previous.get('status') == 'running':
+                self.run = previous
+                self.run['resumes'] = self.run.get('resumes', 0) + 1
+                self.save()
+                return True
+
+            self.run = {
+                'run_id': datetime.now().strftime('%Y%m%d-%H%M%S'),
+                'started': datetime.now().isoformat(timespec='seconds'),
+                'status': 'running',
+                'mode': mode,
+                'resumes': 0,
+                'tasks': [task_key(source, location) for source, location in tasks],
+                'done': {},
+                'failed': {},
+            }
+            self.save()
+            return False
+
+    def is_done(self, source, location):
+        """True if the task already finished in this run (failed tasks are not)"""
+        with self.lock:
+            return task_key(source, location) in self.run.get('done', {})
+
+    def pending(self, tasks):
+        """The (source, location) tasks that have not finished yet, in order"""
+        return [(source, location) for source, location in tasks if not self.is_done(source, location)]
+
+    def record(self, source, location, stats, duration, method=None):
+        """Checkpoint a finished task with its (found, successful, failed, new) counts"""
+        entry = dict(zip(STAT_FIELDS, stats))
+        entry['seconds'] = round(duration, 3)
+        entry['reviews_per_second'] = round(entry['found'] / duration, 2) if duration > 0 else 0.0
+        if method:
+            entry['method'] = method
+
+        with self.lock:
+            self.run['done'][task_key(source, location)] = entry
+            self.run.setdefault('failed', {}).pop(task_key(source, location), None)
+            self.save()
+            self.log_metrics({'event': 'task', 'source': source, 'location': location, **entry})
+
+    def record_failure(self, source, location, error, duration, method=None):
+        """Checkpoint a task that crashed, it stays pending and is retried on resume"""
+        entry = {'error': str(error), 'seconds': round(duration, 3)}
+        if method:
+            entry['method'] = method
+
+        with self.lock:
+            failed = self.run.setdefault('failed', {})
+            entry['attempts'] = failed.get(task_key(source, location), {}).get('attempts', 0) + 1
+            failed[task_key(source, location)] = entry
+            self.save()
+            self.log_metrics({'event': 'task_failed', 'source': source, 'location': location, **entry})
+
+    def failed(self):
+        """Keys of the tasks whose last attempt crashed"""
+        with self.lock:
+            return list(self.run.get('failed', {}))
+
+    def totals(self):
+        """Summed counts of every finished task of the run (resumed ones included)"""
+        with self.lock:
+            totals = {field: 0 for field in STAT_FIELDS}
+            totals['seconds'] = 0.0
+            for entry in self.run.get('done', {}).values():
+                for field in STAT_FIELDS:
+                    totals[field] += entry[field]
+                totals['seconds'] += entry['seconds']
+            return totals
+
+    def finish(self, elapsed):
+        """Mark the run complete and log its summary, unless tasks failed: then the run stays resumable"""
+        totals = self.totals()
+        with self.lock:
+            failed = list(self.run.get('failed', {}))
+            self.run['status'] = 'running' if failed else 'complete'
+            self.run['finished'] = datetime.now().isoformat(timespec='seconds')
+            self.save()
+
+            rate = totals['found'] / totals['seconds'] if totals['seconds'] > 0 else 0.0
+            self.log_metrics({
+                'event': 'run',
+                'mode': self.run.get('mode'),
+                'tasks': len(self.run['tasks']),
+                'resumes': self.run.get('resumes', 0),
+                'failed_tasks': failed,
+                **{field: totals[field] for field in STAT_FIELDS},
+                'task_seconds': round(totals['seconds'], 3),
+                'wall_seconds': round(elapsed, 3),
+                'reviews_per_second': round(rate, 2),
+            })
+        return totals
@@ -2,28 +2,71 @@
 Language dictionaries for date parsing and text matching
 """
 
-# Date patterns for relative date parsing
-DATE_PATTERNS = {
+# Relative date vocabulary (French, English, Arabic, Tunisian Arabizi).
+# Phrases are matched as "<number> <unit>", e.g. "il y a 2 mois", "a year ago", "قبل 3 أيام".
+
+# Number words -> count
+DATE_NUMBERS = {
+    # French / English
+    'un': 1, 'une': 1, 'a': 1, 'an': 1, 'one': 1,
+    'deux': 2, 'two': 2, 'trois': 3, 'three': 3,
+    # Arabic
+    'واحد': 1, 'اثنين': 2, 'ثلاث': 3, 'ثلاثة': 3,
+    # Tunisian dialect
+    'wa7ed': 1, 'wa7da': 1, 'zouz': 2, 'thletha': 3,
+}
+
+# Unit words -> days
+DATE_UNITS = {
     # French
-    'il y a un an': 365, 'il y a 1 an': 365,
-    'il y a 2 ans': 365 * 2, 'il y a 3 ans': 365 * 3,
-    'il y a un mois': 30, 'il y a 1 mois': 30,
-    'il y a 2 mois': 30 * 2, 'il y a 3 mois': 30 * 3,
-    'il y a une semaine': 7, 'il y a 1 semaine': 7,
-    'il y a 2 semaines': 7 * 2, 'il y a 3 semaines': 7 * 3,
-    'il y a un jour': 1, 'il y a 1 jour': 1,
-    'il y a 2 jours': 2, 'il y a 3 jours': 3,
-    'depuis un an': 365, 'depuis 1 an': 365,
-    
+    'an': 365, 'ans': 365, 'année': 365, 'années': 365,
+    'mois': 30,
+    'semaine': 7, 'semaines': 7,
+    'jour': 1, 'jours': 1,
+    'heure': 0, 'heures': 0, 'minute': 0, 'minutes': 0,
     # English
-    'a year ago': 365, '1 year ago': 365,
-    '2 years ago': 365 * 2, '3 years ago': 365 * 3,
-    'a month ago': 30, '1 month ago': 30,
-    '2 months ago': 30 * 2, '3 months ago': 30 * 3,
-    'a week ago': 7, '1 week ago': 7,
-    '2 weeks ago': 7 * 2, '3 weeks ago': 7 * 3,
-    'a day ago': 1, '1 day ago': 1,
-    '2 days ago': 2, '3 days ago': 3,
+    'year': 365, 'years': 365,
+    'month': 30, 'months': 30,
+    'week': 7, 'weeks': 7,
+    'day': 1, 'days': 1,
+    'hour': 0, 'hours': 0,
+    # Arabic
+    'سنة': 365, 'سنوات': 365, 'عام': 365, 'أعوام': 365,
+    'شهر': 30, 'أشهر': 30, 'شهور': 30,
+    'أسبوع': 7, 'أسابيع': 7,
+    'يوم': 1, 'أيام': 1,
+    'ساعة': 0, 'ساعات': 0, 'دقيقة': 0, 'دقائق': 0,
+    # Tunisian dialect
+    'sna': 365, 'snin': 365,
+    'chhar': 30, 'chhor': 30,
+    'jem3a': 7, 'jem3at': 7,
+    'nhar': 1, 'ayem': 1, 'iyem': 1,
+}
+
+# Arabic dual forms carry their own count -> days
+DATE_DUALS = {
+    'سنتين': 365 * 2, 'سنتان': 365 * 2, 'عامين': 365 * 2,
+    'شهرين': 30 * 2,
+    'أسبوعين': 7 * 2,
+    'يومين': 2,
+    'ساعتين': 0,
+}
+
+# Stand-alone words -> days
+DATE_KEYWORDS = {
+    "aujourd'hui": 0, "aujourd’hui": 0, 'hier': 1,
+    'today': 0, 'yesterday': 1,
+    'اليوم': 0, 'أمس': 1, 'البارحة': 1,
+    'lyoum': 0, 'elbera7': 1, 'lbera7': 1,
+}
+
+# Month names of absolute dates such as "07 Mai 2012 13:51:08"
+DATE_MONTHS = {
+    'janvier': 1, 'février': 2, 'fevrier': 2, 'mars': 3, 'avril': 4, 'mai': 5, 'juin': 6,
+    'juillet': 7, 'août': 8, 'aout': 8, 'septembre': 9, 'octobre': 10, 'novembre': 11,
+    'décembre': 12, 'decembre': 12,
+    'january': 1, 'february': 2, 'march': 3, 'april': 4, 'may': 5, 'june': 6,
+    'july': 7, 'august': 8, 'september': 9, 'october': 10, 'november': 11, 'december': 12,
 }
 
 # Cookie accept button selectors
@@ -42,6 +85,21 @@ REVIEW_BUTTONS = [
     "//button[@data-tab-index='1']",
 ]
 
+# Sort button of the Google Maps review list
+SORT_BUTTONS = [
+    "//button[@aria-label='Sort reviews']",
+    "//button[@aria-label='Trier les avis']",
+    "//button[@data-value='Sort']",
+    "//button[contains(., 'Sort') or contains(., 'Trier')]",
+]
+
+# "Newest" entry of the sort menu
+NEWEST_OPTIONS = [
+    "//div[@role='menuitemradio'][contains(., 'Newest')]",
+    "//div[@role='menuitemradio'][contains(., 'Plus récents')]",
+    "//div[@role='menuitemradio'][@data-index='1']",
+]
+
 # Container selectors for scrollable content
 CONTAINER_SELECTORS = [
     '//div[@role="main"]',
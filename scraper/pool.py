@@ -0,0 +1,128 @@
+"""
+Worker pool - scrapes Google Maps locations with several browsers in parallel
+"""
+import time
+import queue
+import threading
+
+from config import DELAY_BETWEEN_LOCATIONS
+from scraper import UnifiedReviewScraper
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class ScraperPool:
+    def __init__(self, writer, num_workers=2, state=None, full=False, record_dir=None, replay_url=None,
+                 journal=None):
+        """Pool of UnifiedReviewScraper workers sharing one writer"""
+        self.writer = writer
+        self.journal = journal
+        self.state = state
+        self.full = full
+        self.record_dir = record_dir
+        self.replay_url = replay_url
+        self.num_workers = max(1, num_workers)
+        self.tasks = queue.Queue()
+        self.results = []
+        self.worker_stats = {}
+        self.lock = threading.Lock()
+
+    def worker(self, worker_id, progress=None):
+        """Take locations from the queue until it is empty"""
+        stats = {'locations': 0, 'found': 0, 'new': 0, 'busy_time': 0.0, 'durations': []}
+        scraper = UnifiedReviewScraper(writer=self.writer, state=self.state,
+                                       record_dir=self.record_dir, replay_url=self.replay_url)
+
+        try:
+            scraper.setup_driver()
+        except Exception as e:
+            print(f"   Worker {worker_id}: could not start browser: {e}")
+            return
+
+        try:
+            while True:
+                try:
+                    location_name, url = self.tasks.get_nowait()
+                except queue.Empty:
+                    break
+
+                # Politeness delay between two locations of the same browser
+                if stats['locations'] > 0:
+                    time.sleep(DELAY_BETWEEN_LOCATIONS)
+
+                start = time.time()
+                loc_found, loc_success, loc_failed, loc_new = scraper.scrape_google_location(url, location_name, full=self.full)
+                duration = time.time() - start
+
+                stats['locations'] += 1
+                stats['found'] += loc_found
+                stats['new'] += loc_new
+                stats['busy_time'] += duration
+                stats['durations'].append(duration)
+                
+                # Checkpoint as soon as the location is done, so a crash only loses running tasks;
+                # a location that crashed stays pending for the next resume
+                if self.journal is not None:
+                    if scraper.last_error is not None:
+                        self.journal.record_failure("Google Maps", location_name, scraper.last_error,
+                                                    duration, method="browser")
+                    else:
+                        self.journal.record("Google Maps", location_name,
+                                            (loc_found, loc_success, loc_failed, loc_new), duration, method="browser")
+
+                with self.lock:
+                    self.results.append((location_name, loc_found, loc_success, loc_failed, loc_new))
+                    print(f"\n[worker {worker_id}] {location_name}")
+                    print(f"   📈 Results: Found: {loc_found}, Successful: {loc_success}, Failed: {loc_failed}, New: {loc_new}")
+                    if progress is not None:
+                        progress.update(1)
+
+                self.tasks.task_done()
+        finally:
+            scraper.close()
+            with self.lock:
+                self.worker_stats[worker_id] = stats
+
+    def run(self, locations, progress=None):
+        """Scrape all (location_name, url) pairs, returns per-location results"""
+        for item in locations:
+            self.tasks.put(item)
+
+        threads = []
+        for worker_id in range(1, min(self.num_workers, len(locations)) + 1):
+            thread = threading.Thread(target=self.worker, args=(worker_id, progress), daemon=True)
+            thread.start()
+            threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+
+        self.writer.flush()
+        return self.results
+
+    def print_summary(self):
+        """Print per-worker throughput and tail latency"""
+        print("\nWORKER SUMMARY")
+        print(f"{'Worker':<8} {'Locations':>9} {'Reviews':>8} {'Rev/s':>7} {'p50 (s)':>8} {'p95 (s)':>8} {'max (s)':>8}")
+
+        all_durations = []
+        for worker_id in sorted(self.worker_stats):
+            stats = self.worker_stats[worker_id]
+            durations = stats['durations']
+            all_durations.extend(durations)
+            throughput = stats['found'] / stats['busy_time'] if stats['busy_time'] > 0 else 0.0
+
+            print(f"{worker_id:<8} {stats['locations']:>9} {stats['found']:>8} {throughput:>7.2f} "
+                  f"{percentile(durations, 50):>8.1f} {percentile(durations, 95):>8.1f} "
+                  f"{max(durations, default=0.0):>8.1f}")
+
+        if all_durations:
+            print(f"All locations: p50 {percentile(all_durations, 50):.1f}s, "
+                  f"p95 {percentile(all_durations, 95):.1f}s, max {max(all_durations):.1f}s")
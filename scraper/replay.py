@@ -0,0 +1,218 @@
+"""
+Record/replay harness - saves rendered source pages and serves them back from a local server
+"""
+import os
+import re
+import sys
+import json
+import threading
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from config import RECORD_DIR, REPLAY_BATCH_SIZE
+from language_dict import REVIEW_SELECTORS, CONTAINER_SELECTORS
+
+
+MANIFEST_FILENAME = "manifest.json"
+
+# Scripts and external resources are dropped so a replay never touches the network
+SCRIPT_REGEX = re.compile(r'<script\b[^>]*>.*?</script\s*>', re.IGNORECASE | re.DOTALL)
+EXTERNAL_REGEX = re.compile(r'<(?:link|iframe)\b[^>]*>', re.IGNORECASE)
+
+# Injected into replayed pages: the review list starts with one batch of cards and
+# the next batch appears shortly after each scroll, like Google Maps' lazy loading.
+LAZY_LOAD_SCRIPT = """
+<script>
+(function() {
+    var reviewSelectors = %(review_selectors)s;
+    var containerSelectors = %(container_selectors)s;
+    var batchSize = %(batch_size)d;
+
+    function first(selectors, all) {
+        for (var i = 0; i < selectors.length; i++) {
+            var result = document.evaluate(selectors[i], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            if (result.snapshotLength > 0) {
+                if (!all) {
+                    return result.snapshotItem(0);
+                }
+                var nodes = [];
+                for (var j = 0; j < result.snapshotLength; j++) {
+                    nodes.push(result.snapshotItem(j));
+                }
+                return nodes;
+            }
+        }
+        return all ? [] : null;
+    }
+
+    // Stylesheets are stripped, so make the review container scrollable again
+    var container = first(containerSelectors, false);
+    if (container) {
+        container.style.overflowY = 'auto';
+        container.style.height = '600px';
+    }
+
+    // Swap every card after the first batch for an empty placeholder
+    var hidden = first(reviewSelectors, true).slice(batchSize).map(function(card) {
+        var placeholder = document.createComment('review');
+        card.parentNode.replaceChild(placeholder, card);
+        return {card: card, placeholder: placeholder};
+    });
+
+    var pending = false;
+    document.addEventListener('scroll', function() {
+        if (pending || hidden.length === 0) {
+            return;
+        }
+        pending = true;
+        setTimeout(function() {
+            hidden.splice(0, batchSize).forEach(function(item) {
+                item.placeholder.parentNode.replaceChild(item.card, item.placeholder);
+            });
+            pending = false;
+        }, 50);
+    }, true);
+})();
+</script>
+"""
+
+manifest_lock = threading.Lock()
+
+
+def page_slug(source, location):
+    """File-safe name of a recorded source/location page"""
+    return re.sub(r'[^a-zA-Z0-9]+', '_', f"{source}_{location}").strip('_').lower()
+
+
+def recording_path(record_dir, source, location):
+    """Path of the recorded HTML for a source/location pair"""
+    return os.path.join(record_dir, f"{page_slug(source, location)}.html")
+
+
+def strip_page(html):
+    """Remove scripts and external resources from a rendered page"""
+    return EXTERNAL_REGEX.sub('', SCRIPT_REGEX.sub('', html))
+
+
+def load_manifest(record_dir=RECORD_DIR):
+    """Recorded pages as {slug: {'source', 'location', 'url', 'recorded'}}"""
+    try:
+        with open(os.path.join(record_dir, MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_page(record_dir, source, location, url, html):
+    """Save a rendered page and register it in the recording manifest"""
+    os.makedirs(record_dir, exist_ok=True)
+    path = recording_path(record_dir, source, location)
+
+    with manifest_lock:
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(strip_page(html))
+        os.replace(tmp_path, path)
+
+        manifest = load_manifest(record_dir)
+        manifest[page_slug(source, location)] = {
+            'source': source,
+            'location': location,
+            'url': url,
+            'recorded': datetime.now().isoformat(timespec='seconds'),
+        }
+        manifest_path = os.path.join(record_dir, MANIFEST_FILENAME)
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(manifest_path + '.tmp', manifest_path)
+    return path
+
+
+# ========== LOCAL PAGE SERVER ==========
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        """Serve a recorded page with the lazy-loading script injected"""
+        name = os.path.basename(self.path.split('?')[0])
+        path = os.path.join(self.server.record_dir, name)
+        if not name.endswith('.html') or not os.path.isfile(path):
+            self.send_error(404)
+            return
+
+        with open(path, 'r', encoding='utf-8') as f:
+            html = f.read()
+
+        script = LAZY_LOAD_SCRIPT % {
+            'review_selectors': json.dumps(REVIEW_SELECTORS),
+            'container_selectors': json.dumps(CONTAINER_SELECTORS),
+            'batch_size': self.server.batch_size,
+        }
+        if '</body>' in html:
+            html = html.replace('</body>', script + '</body>', 1)
+        else:
+            html += script
+        body = html.encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Keep the scraper output readable"""
+        pass
+
+
+class ReplayServer:
+    def __init__(self, record_dir=RECORD_DIR, host='127.0.0.1', port=0, batch_size=REPLAY_BATCH_SIZE):
+        """Local stand-in for the review sites, serving recorded pages"""
+        self.record_dir = record_dir
+        self.host = host
+        self.port = port
+        self.batch_size = batch_size
+        self.httpd = None
+        self.thread = None
+
+    @property
+    def url(self):
+        """Base URL to give to UnifiedReviewScraper(replay_url=...)"""
+        return f"http://{self.host}:{self.httpd.server_address[1]}"
+
+    def url_for(self, source, location):
+        """Replay URL of a recorded source/location page"""
+        return f"{self.url}/{page_slug(source, location)}.html"
+
+    def start(self):
+        """Start serving in a background thread"""
+        self.httpd = ThreadingHTTPServer((self.host, self.port), ReplayHandler)
+        self.httpd.record_dir = self.record_dir
+        self.httpd.batch_size = self.batch_size
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Shut the server down"""
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    # Serve recordings on a fixed port: python replay.py [record_dir] [port]
+    record_dir = sys.argv[1] if len(sys.argv) > 1 else RECORD_DIR
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8765
+    server = ReplayServer(record_dir, port=port).start()
+    print(f"Serving {len(load_manifest(record_dir))} recorded pages from {record_dir} at {server.url}")
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
@@ -2,20 +2,44 @@
 Main entry point - shows progress bars and results
 """
 import time
+import argparse
 import pandas as pd
 import os
 
-from config import GOOGLE_LOCATIONS, OTHER_SOURCES
+from config import GOOGLE_LOCATIONS, OTHER_SOURCES, WORKERS, HTTP_FETCH, RECORD_DIR
 from scraper import UnifiedReviewScraper
+from pool import ScraperPool
+from http_fetcher import HttpSourceFetcher
+from journal import RunJournal
 
 
-def main():
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="California Gym reviews scraper")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="number of parallel browsers for Google Maps (1 = sequential)")
+    parser.add_argument("--full", action="store_true",
+                        help="re-scrape every review instead of stopping at already known ones")
+    parser.add_argument("--fresh", action="store_true",
+                        help="start a new run instead of resuming an interrupted one")
+    parser.add_argument("--record", nargs="?", const=RECORD_DIR, default=None, metavar="DIR",
+                        help=f"save the rendered pages for offline replays (default dir: {RECORD_DIR})")
+    return parser.parse_args()
+
+
+def main(workers=WORKERS, full=False, record_dir=None, resume=True):
     """Main function to scrape from all sources"""
     
     # Create unified scraper
-    scraper = UnifiedReviewScraper()
+    scraper = UnifiedReviewScraper(record_dir=record_dir)
     scraper.setup_driver()
     
+    # Every (source, location) task of the run, checkpointed in the journal
+    google_tasks = [("Google Maps", location_name) for location_name in GOOGLE_LOCATIONS]
+    other_tasks = [(source_name, location_name) for source_name, _, location_name in OTHER_SOURCES]
+    journal = RunJournal()
+    resumed = journal.start(google_tasks + other_tasks, resume=resume, mode='full' if full else 'incremental')
+    
     try:
         # Get initial count
         initial_total = scraper.get_total_reviews()
@@ -23,6 +47,12 @@ def main():
         print("CALIFORNIA GYM REVIEWS SCRAPER - ALL SOURCES")
         print("="*80)
         print(f"Initial reviews in CSV: {initial_total}")
+        print(f"Mode: {'full re-scrape' if full else 'incremental (new reviews only)'}")
+        if record_dir:
+            print(f"Recording rendered pages to: {record_dir}")
+        if resumed:
+            remaining = journal.pending(google_tasks + other_tasks)
+            print(f"Resuming run {journal.run['run_id']}: {len(remaining)} of {len(google_tasks + other_tasks)} tasks left")
         print()
         
         # Statistics
@@ -39,28 +69,54 @@ def main():
         print("📱 SOURCE 1: GOOGLE MAPS")
         print("-" * 60)
         
-        google_list = list(GOOGLE_LOCATIONS.items())
-        with tqdm(total=len(google_list), desc="Google Maps locations", 
-                 bar_format='{desc}: {percentage:3.0f}%|{bar}| {n_fmt}/{total_fmt}') as google_pbar:
+        google_list = [(location_name, url) for location_name, url in GOOGLE_LOCATIONS.items()
+                       if not journal.is_done("Google Maps", location_name)]
+        
+        if workers > 1:
+            # Parallel mode: one browser per worker, all feeding the shared writer
+            print(f"Running {workers} parallel browsers")
+            pool = ScraperPool(scraper.writer, num_workers=workers, state=scraper.state, full=full,
+                               record_dir=record_dir, journal=journal)
+            with tqdm(total=len(google_list), desc="Google Maps locations", 
+                     bar_format='{desc}: {percentage:3.0f}%|{bar}| {n_fmt}/{total_fmt}') as google_pbar:
+                results = pool.run(google_list, progress=google_pbar)
             
-            for idx, (location_name, url) in enumerate(google_list, 1):
-                print(f"\n[{idx}/{len(google_list)}] {location_name}")
-                
-                loc_found, loc_success, loc_failed, loc_new = scraper.scrape_google_location(url, location_name)
-                
-                # Update totals
+            for location_name, loc_found, loc_success, loc_failed, loc_new in results:
                 total_stats['found'] += loc_found
                 total_stats['successful'] += loc_success
                 total_stats['failed'] += loc_failed
                 total_stats['new'] += loc_new
+            
+            pool.print_summary()
+        else:
+            with tqdm(total=len(google_list), desc="Google Maps locations", 
+                     bar_format='{desc}: {percentage:3.0f}%|{bar}| {n_fmt}/{total_fmt}') as google_pbar:
                 
-                print(f"   📈 Results: Found: {loc_found}, Successful: {loc_success}, Failed: {loc_failed}, New: {loc_new}")
-                
-                # Small delay between locations
-                if idx < len(google_list):
-                    time.sleep(2)
-                
-                google_pbar.update(1)
+                for idx, (location_name, url) in enumerate(google_list, 1):
+                    print(f"\n[{idx}/{len(google_list)}] {location_name}")
+                    
+                    task_start = time.time()
+                    loc_found, loc_success, loc_failed, loc_new = scraper.scrape_google_location(url, location_name, full=full)
+                    if scraper.last_error is not None:
+                        journal.record_failure("Google Maps", location_name, scraper.last_error,
+                                               time.time() - task_start, method="browser")
+                    else:
+                        journal.record("Google Maps", location_name, (loc_found, loc_success, loc_failed, loc_new),
+                                       time.time() - task_start, method="browser")
+                    
+                    # Update totals
+                    total_stats['found'] += loc_found
+                    total_stats['successful'] += loc_success
+                    total_stats['failed'] += loc_failed
+                    total_stats['new'] += loc_new
+                    
+                    print(f"   📈 Results: Found: {loc_found}, Successful: {loc_success}, Failed: {loc_failed}, New: {loc_new}")
+                    
+                    # Small delay between locations
+                    if idx < len(google_list):
+                        time.sleep(2)
+                    
+                    google_pbar.update(1)
         
         print("\n" + "="*60)
         print("GOOGLE MAPS COMPLETE")
@@ -77,13 +133,43 @@ def main():
             ("trustburn.com", scraper.scrape_trustburn),
         ]
         
-        with tqdm(total=len(other_sources), desc="Other websites", 
+        # Skip the sources already finished before an interruption
+        pending_sources = [source for source in OTHER_SOURCES if not journal.is_done(source[0], source[2])]
+        pending_names = {source_name for source_name, _, _ in pending_sources}
+        other_sources = [(name, func) for name, func in other_sources if name in pending_names]
+        
+        # Server-rendered pages are fetched concurrently over HTTP first,
+        # the browser is only used for the ones that need JavaScript
+        if HTTP_FETCH:
+            http_results, needs_browser = HttpSourceFetcher(scraper, sources=pending_sources, journal=journal).run()
+            
+            for source_name, (source_found, source_success, source_failed, source_new) in http_results.items():
+                total_stats['found'] += source_found
+                total_stats['successful'] += source_success
+                total_stats['failed'] += source_failed
+                total_stats['new'] += source_new
+                
+                print(f"   {source_name} Results: Found: {source_found}, Successful: {source_success}, Failed: {source_failed}, New: {source_new}")
+            
+            browser_sources = [(name, func) for name, func in other_sources if name in needs_browser]
+        else:
+            browser_sources = other_sources
+        
+        with tqdm(total=len(browser_sources), desc="Other websites", 
                  bar_format='{desc}: {percentage:3.0f}%|{bar}| {n_fmt}/{total_fmt}') as other_pbar:
             
-            for source_name, scrape_func in other_sources:
+            for source_name, scrape_func in browser_sources:
                 print(f"\n{source_name.upper()}")
                 
+                task_start = time.time()
                 source_found, source_success, source_failed, source_new = scrape_func()
+                location_name = next(location for name, _, location in OTHER_SOURCES if name == source_name)
+                if scraper.last_error is not None:
+                    journal.record_failure(source_name, location_name, scraper.last_error,
+                                           time.time() - task_start, method="browser")
+                else:
+                    journal.record(source_name, location_name, (source_found, source_success, source_failed, source_new),
+                                   time.time() - task_start, method="browser")
                 
                 # Update totals
                 total_stats['found'] += source_found
@@ -99,6 +185,12 @@ def main():
         
         end_time = time.time()
         
+        # Keep the CSV export in sync for the notebooks and older tools
+        scraper.writer.export_csv()
+        
+        # Close the journal and log the run summary (resumed tasks included)
+        run_totals = journal.finish(end_time - start_time)
+        
         # Get final count
         final_total = scraper.get_total_reviews()
         
@@ -108,9 +200,15 @@ def main():
         print("="*80)
         print(f"Total time: {end_time - start_time:.1f} seconds")
         print(f"Sources processed: {len(google_list) + len(other_sources)}")
+        if resumed:
+            print(f"Whole run (with tasks before the interruption): Found: {run_totals['found']}, New: {run_totals['new']}")
         print(f"Total reviews in CSV: {final_total}")
         print(f"New reviews added: {total_stats['new']}")
         print(f"Reviews failed to scrape: {total_stats['failed']}")
+        failed_tasks = journal.failed()
+        if failed_tasks:
+            print(f"⚠️  {len(failed_tasks)} task(s) crashed and will be retried on the next run: {', '.join(failed_tasks)}")
+        print(f"Run metrics appended to: {journal.metrics_filename}")
         print("="*80)
         
         # Show CSV sample
@@ -129,4 +227,5 @@ def main():
 if __name__ == "__main__":
     # Import tqdm here to avoid circular imports
     from tqdm import tqdm
-    main()
\ No newline at end of file
+    args = parse_args()
+    main(workers=args.workers, full=args.full, record_dir=args.record, resume=not args.fresh)
\ No newline at end of file
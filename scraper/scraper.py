@@ -1,11 +1,9 @@
 """
 Main scraper class - Core scraping logic
 """
-import os
-import csv
 import time
 import re
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, Set
 
 from selenium import webdriver
@@ -14,27 +12,156 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
 from tqdm import tqdm
 
-from config import CSV_FILENAME, CSV_ENCODING, HEADLESS, IMPLICIT_WAIT, PAGE_LOAD_TIMEOUT, USER_AGENT
-from config import SCROLL_ATTEMPTS_CONTAINER, SCROLL_ATTEMPTS_WINDOW, SCROLL_DELAY, DELAY_BETWEEN_LOCATIONS, PROCESSING_DELAY
-from language_dict import DATE_PATTERNS, COOKIE_SELECTORS, REVIEW_BUTTONS, CONTAINER_SELECTORS, REVIEW_SELECTORS
+from config import CSV_FILENAME, DB_FILENAME, STORAGE_BACKEND, HEADLESS, IMPLICIT_WAIT, PAGE_LOAD_TIMEOUT, USER_AGENT
+from config import SCROLL_WAIT_MIN, SCROLL_WAIT_MAX, SCROLL_MAX_TIME, REVIEW_TARGET, CONDITION_TIMEOUT
+from config import JS_EXTRACTION
+from language_dict import COOKIE_SELECTORS, REVIEW_BUTTONS, CONTAINER_SELECTORS, REVIEW_SELECTORS
+from language_dict import SORT_BUTTONS, NEWEST_OPTIONS
+from writer import ReviewWriter
+from date_parser import convert_date
+from storage import ReviewStore
+from state import ScrapeState, is_below_mark
+from replay import page_slug, save_page
+
+
+# Expands every truncated review and serializes all cards in one round trip.
+# arguments[0] is the list of REVIEW_SELECTORS XPaths, tried in order.
+EXTRACT_REVIEWS_SCRIPT = """
+var selectors = arguments[0];
+var cards = [];
+for (var i = 0; i < selectors.length && cards.length === 0; i++) {
+    var result = document.evaluate(selectors[i], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    for (var j = 0; j < result.snapshotLength; j++) {
+        cards.push(result.snapshotItem(j));
+    }
+}
+
+function textOf(card, selector) {
+    var el = card.querySelector(selector);
+    return el ? (el.innerText || el.textContent || '').trim() : null;
+}
+
+// Expand all "More" / "Plus" buttons first
+cards.forEach(function(card) {
+    card.querySelectorAll('button').forEach(function(btn) {
+        var text = btn.textContent || '';
+        if (text.includes('More') || text.includes('Plus')) {
+            btn.click();
+        }
+    });
+});
+
+return cards.map(function(card) {
+    var ratingEl = card.querySelector('span.kvMYJc');
+    return {
+        name: textOf(card, 'div[class*="d4r55"]'),
+        rating_label: ratingEl ? ratingEl.getAttribute('aria-label') : null,
+        date: textOf(card, 'span.rsqaWe'),
+        comment: textOf(card, 'span.wiI7pd')
+    };
+});
+"""
+
+# Counts the review cards currently in the page (first matching selector wins)
+COUNT_REVIEWS_SCRIPT = """
+var selectors = arguments[0];
+for (var i = 0; i < selectors.length; i++) {
+    var result = document.evaluate(selectors[i], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    if (result.snapshotLength > 0) {
+        return result.snapshotLength;
+    }
+}
+return 0;
+"""
+
+# Scrolls the container (or window) and resolves on the first DOM mutation
+# inside it, or with false once the timeout expires.
+SCROLL_AND_WAIT_SCRIPT = """
+var container = arguments[0];
+var timeoutMs = arguments[1];
+var scroll = arguments[2];
+var done = arguments[arguments.length - 1];
+var target = container || document.body;
+
+var timer = null;
+var observer = new MutationObserver(function() {
+    observer.disconnect();
+    clearTimeout(timer);
+    done(true);
+});
+observer.observe(target, {childList: true, subtree: true});
+timer = setTimeout(function() {
+    observer.disconnect();
+    done(false);
+}, timeoutMs);
+
+if (scroll) {
+    if (container) {
+        container.scrollTop = container.scrollHeight;
+    } else {
+        window.scrollTo(0, document.body.scrollHeight);
+    }
+}
+"""
+
+# Name and date text of the last loaded review card
+LAST_REVIEW_SCRIPT = """
+var selectors = arguments[0];
+for (var i = 0; i < selectors.length; i++) {
+    var result = document.evaluate(selectors[i], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    if (result.snapshotLength > 0) {
+        var card = result.snapshotItem(result.snapshotLength - 1);
+        var name = card.querySelector('div[class*="d4r55"]');
+        var date = card.querySelector('span.rsqaWe');
+        return {
+            name: name ? (name.innerText || name.textContent) : null,
+            date: date ? (date.innerText || date.textContent) : null
+        };
+    }
+}
+return null;
+"""
 
 
 class UnifiedReviewScraper:
-    def __init__(self, csv_filename=CSV_FILENAME):
+    def __init__(self, csv_filename=CSV_FILENAME, writer=None, state=None, record_dir=None, replay_url=None):
         """Initialize the unified scraper for all sources"""
-        # Ensure data directory exists
-        os.makedirs(os.path.dirname(csv_filename), exist_ok=True)
+        # Reviews go through a (possibly shared) deduplicating writer
+        if writer is None:
+            store = ReviewStore(DB_FILENAME) if STORAGE_BACKEND == "sqlite" else None
+            writer = ReviewWriter(csv_filename, store=store)
+        self.writer = writer
+        self.csv_filename = self.writer.csv_filename
+        
+        # High-water marks for incremental scraping
+        self.state = state if state is not None else ScrapeState()
+        
+        # Statistics of the last scroll (reviews loaded, seconds, reviews/s)
+        self.scroll_stats = {}
+        
+        # Timing knobs (the replay benchmark shortens them)
+        self.condition_timeout = CONDITION_TIMEOUT
+        self.scroll_wait_max = SCROLL_WAIT_MAX
         
-        self.csv_filename = csv_filename
-        self.initialize_csv()
+        # Record rendered pages to record_dir, or load them from a local replay server
+        self.record_dir = record_dir
+        self.replay_url = replay_url
         
-    def setup_driver(self):
+        # Error of the last scrape_* call (None if it finished), so callers can tell
+        # a crashed task from one that found no reviews
+        self.last_error = None
+        
+    def setup_driver(self, headless=HEADLESS):
         """Setup Chrome driver with performance optimizations"""
         chrome_options = Options()
         
+        if headless:
+            chrome_options.add_argument("--headless=new")
+        
         # Performance optimizations
         chrome_options.add_argument("--no-sandbox")
         chrome_options.add_argument("--disable-dev-shm-usage")
@@ -52,61 +179,65 @@ class UnifiedReviewScraper:
         self.driver = webdriver.Chrome(service=service, options=chrome_options)
         self.wait = WebDriverWait(self.driver, IMPLICIT_WAIT)
         self.driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+        self.driver.set_script_timeout(SCROLL_WAIT_MAX + PAGE_LOAD_TIMEOUT)
         
-    def initialize_csv(self):
-        """Initialize CSV file if it doesn't exist"""
-        if not os.path.exists(self.csv_filename):
-            with open(self.csv_filename, 'w', newline='', encoding=CSV_ENCODING) as f:
-                writer = csv.writer(f)
-                writer.writerow(['id', 'name', 'source', 'location', 'date', 'rating', 'comment'])
+    def wait_for(self, condition, timeout=None):
+        """Wait for a condition, returns its result or None on timeout"""
+        if timeout is None:
+            timeout = self.condition_timeout
+        try:
+            return WebDriverWait(self.driver, timeout, poll_frequency=0.1).until(condition)
+        except TimeoutException:
+            return None
     
+    def wait_for_page_ready(self):
+        """Wait until the document has finished loading"""
+        return self.wait_for(lambda d: d.execute_script("return document.readyState") == "complete")
+        
     def save_review(self, review):
-        """Save a review to CSV with duplicate checking"""
+        """Save a review through the writer with duplicate checking"""
         try:
-            # Read existing IDs
-            existing_ids = set()
-            if os.path.exists(self.csv_filename):
-                with open(self.csv_filename, 'r', encoding=CSV_ENCODING) as f:
-                    reader = csv.reader(f)
-                    next(reader, None)
-                    for row in reader:
-                        if row:
-                            existing_ids.add(row[0])
-            
-            # Check for duplicate
-            if review['id'] in existing_ids:
-                return False
-            
-            # Append to CSV
-            with open(self.csv_filename, 'a', newline='', encoding=CSV_ENCODING) as f:
-                writer = csv.writer(f, quoting=csv.QUOTE_MINIMAL)
-                writer.writerow([
-                    review['id'],
-                    review['name'],
-                    review['source'],
-                    review['location'],
-                    review['date'],
-                    review['rating'],
-                    review['comment']
-                ])
-            return True
-            
+            return self.writer.save(review)
         except Exception as e:
             return False
     
+    def flush_reviews(self):
+        """Write buffered reviews to the CSV"""
+        return self.writer.flush()
+    
+    # ========== RECORD / REPLAY ==========
+    
+    def page_url(self, source, location, url):
+        """URL to open for a source page (the recorded copy when replaying)"""
+        if self.replay_url:
+            return f"{self.replay_url}/{page_slug(source, location)}.html"
+        return url
+    
+    def record_page(self, source, location, url, html=None):
+        """Save the rendered page for offline replays (no-op unless recording)"""
+        if not self.record_dir:
+            return None
+        try:
+            if html is None:
+                html = self.driver.execute_script("return document.documentElement.outerHTML")
+            return save_page(self.record_dir, source, location, url, html)
+        except Exception as e:
+            print(f"   Could not record page: {e}")
+            return None
+    
     # ========== GOOGLE MAPS SCRAPING ==========
     
     def accept_cookies(self):
         """Handle cookie consent quickly"""
         try:
-            for selector in COOKIE_SELECTORS:
-                try:
-                    button = self.wait.until(EC.element_to_be_clickable((By.XPATH, selector)))
-                    button.click()
-                    time.sleep(1)
-                    return True
-                except:
-                    continue
+            # Wait once for whichever consent button shows up first
+            button = self.wait_for(EC.any_of(
+                *[EC.element_to_be_clickable((By.XPATH, selector)) for selector in COOKIE_SELECTORS]
+            ))
+            if button:
+                button.click()
+                self.wait_for(EC.invisibility_of_element(button))
+                return True
         except:
             pass
         return False
@@ -114,7 +245,11 @@ class UnifiedReviewScraper:
     def ensure_reviews_tab_open(self):
         """Ensure we're on the reviews tab"""
         try:
-            time.sleep(2)
+            reviews_present = EC.presence_of_element_located((By.XPATH, '//div[contains(@class, "jftiEf")]'))
+            button_conditions = [EC.element_to_be_clickable((By.XPATH, xpath)) for xpath in REVIEW_BUTTONS]
+            
+            # Wait until either the reviews or a reviews button are there
+            self.wait_for(EC.any_of(reviews_present, *button_conditions))
             
             # Check if we're already on reviews
             try:
@@ -125,14 +260,11 @@ class UnifiedReviewScraper:
                 pass
             
             # Try to click reviews button
-            for button_xpath in REVIEW_BUTTONS:
-                try:
-                    button = self.wait.until(EC.element_to_be_clickable((By.XPATH, button_xpath)))
-                    button.click()
-                    time.sleep(3)
-                    return True
-                except:
-                    continue
+            button = self.wait_for(EC.any_of(*button_conditions))
+            if button:
+                button.click()
+                self.wait_for(reviews_present)
+                return True
                     
             # JavaScript fallback
             self.driver.execute_script("""
@@ -149,7 +281,7 @@ class UnifiedReviewScraper:
                 }
                 return false;
             """)
-            time.sleep(3)
+            self.wait_for(reviews_present)
             return True
             
         except Exception as e:
@@ -166,44 +298,98 @@ class UnifiedReviewScraper:
         
         return None
     
-    def scroll_to_load_reviews(self):
-        """Scroll to load all available reviews"""
+    def count_loaded_reviews(self):
+        """Number of review cards currently loaded in the page"""
+        try:
+            return self.driver.execute_script(COUNT_REVIEWS_SCRIPT, REVIEW_SELECTORS) or 0
+        except:
+            return 0
+    
+    def sort_reviews_by_newest(self):
+        """Switch the Google Maps review list to newest first"""
+        try:
+            sort_button = self.wait_for(EC.any_of(
+                *[EC.element_to_be_clickable((By.XPATH, xpath)) for xpath in SORT_BUTTONS]
+            ))
+            if not sort_button:
+                return False
+            sort_button.click()
+            
+            option = self.wait_for(EC.any_of(
+                *[EC.element_to_be_clickable((By.XPATH, xpath)) for xpath in NEWEST_OPTIONS]
+            ))
+            if not option:
+                return False
+            option.click()
+            
+            # The list is re-rendered once the new order is applied
+            self.wait_for(EC.staleness_of(sort_button))
+            self.wait_for(EC.presence_of_element_located((By.XPATH, '//div[contains(@class, "jftiEf")]')))
+            return True
+        except:
+            return False
+    
+    def reached_known_reviews(self, location_name, state):
+        """True once the last loaded review is at or below the high-water mark"""
+        try:
+            last = self.driver.execute_script(LAST_REVIEW_SCRIPT, REVIEW_SELECTORS)
+        except:
+            return False
+        if not last:
+            return False
+        
+        review = self.build_google_review(last.get('name'), None, last.get('date'), None, location_name)
+        return is_below_mark(state, review['id'], review['date'])
+    
+    def scroll_to_load_reviews(self, target_count=REVIEW_TARGET, stop_when=None):
+        """Scroll until no new reviews arrive, target_count is reached or stop_when() is true"""
         container = self.find_scrollable_container()
         
-        if container:
-            # Scroll specific container
-            last_height = self.driver.execute_script("return arguments[0].scrollHeight", container)
-            scroll_attempts = 0
-            
-            while scroll_attempts < SCROLL_ATTEMPTS_CONTAINER:
-                self.driver.execute_script('arguments[0].scrollTop = arguments[0].scrollHeight', container)
-                time.sleep(SCROLL_DELAY)
-                
-                new_height = self.driver.execute_script("return arguments[0].scrollHeight", container)
-                
-                if new_height == last_height:
+        start_time = time.time()
+        initial_count = last_count = self.count_loaded_reviews()
+        wait_time = SCROLL_WAIT_MIN
+        wait_max = self.scroll_wait_max
+        
+        while target_count is None or last_count < target_count:
+            if time.time() - start_time > SCROLL_MAX_TIME:
+                break
+            
+            # Scroll, then wait on DOM mutations until the review count changes
+            deadline = time.time() + wait_time
+            count = last_count
+            scroll = True
+            while True:
+                remaining_ms = int((deadline - time.time()) * 1000)
+                if remaining_ms <= 0:
                     break
                 
-                last_height = new_height
-                scroll_attempts += 1
-        else:
-            # Scroll entire window
-            last_height = self.driver.execute_script("return document.body.scrollHeight")
-            scroll_attempts = 0
-            
-            while scroll_attempts < SCROLL_ATTEMPTS_WINDOW:
-                self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(SCROLL_DELAY)
+                mutated = self.driver.execute_async_script(SCROLL_AND_WAIT_SCRIPT, container, remaining_ms, scroll)
+                scroll = False
                 
-                new_height = self.driver.execute_script("return document.body.scrollHeight")
-                
-                if new_height == last_height:
+                count = self.count_loaded_reviews()
+                if count > last_count or not mutated:
                     break
+            
+            if count > last_count:
+                # New reviews arrived, go fast again
+                last_count = count
+                wait_time = SCROLL_WAIT_MIN
                 
-                last_height = new_height
-                scroll_attempts += 1
+                # Incremental mode: everything below this point is already known
+                if stop_when is not None and stop_when():
+                    break
+            elif wait_time >= wait_max:
+                # Nothing new even after the longest wait: end of the list
+                break
+            else:
+                # Slow network: back off before giving up
+                wait_time = min(wait_time * 2, wait_max)
         
-        time.sleep(2)
+        elapsed = time.time() - start_time
+        loaded = last_count - initial_count
+        rate = loaded / elapsed if elapsed > 0 else 0.0
+        self.scroll_stats = {'loaded': last_count, 'seconds': elapsed, 'reviews_per_second': rate}
+        print(f"   Scrolling loaded {last_count} reviews in {elapsed:.1f}s ({rate:.1f} reviews/s)")
         return True
     
     def get_review_elements_google(self):
@@ -226,120 +412,118 @@ class UnifiedReviewScraper:
         
         return []
     
+    def extract_google_reviews_js(self, location_name):
+        """Extract all Google Maps reviews with a single execute_script call"""
+        raw_reviews = self.driver.execute_script(EXTRACT_REVIEWS_SCRIPT, REVIEW_SELECTORS) or []
+        
+        return [
+            self.build_google_review(
+                raw.get('name'), raw.get('rating_label'), raw.get('date'), raw.get('comment'), location_name
+            )
+            for raw in raw_reviews
+        ]
+    
     def extract_google_review_data(self, element, location_name):
         """Extract data from a Google Maps review element"""
         try:
             # NAME
-            name = "Anonymous"
+            name = None
             try:
                 name_elem = element.find_element(By.XPATH, './/div[contains(@class, "d4r55")]')
-                name = name_elem.text.strip()
+                name = name_elem.text
             except:
                 pass
             
             # RATING
-            rating = 0
+            aria_label = None
             try:
                 rating_elem = element.find_element(By.XPATH, './/span[@class="kvMYJc"]')
                 aria_label = rating_elem.get_attribute("aria-label")
-                if aria_label:
-                    match = re.search(r'(\d+(?:\.\d+)?)', aria_label)
-                    if match:
-                        rating = int(float(match.group(1)))
             except:
                 pass
             
             # DATE
-            date_text = "N/A"
+            date_text = None
             try:
                 date_elem = element.find_element(By.XPATH, './/span[@class="rsqaWe"]')
-                date_text = date_elem.text.strip()
+                date_text = date_elem.text
             except:
                 pass
             
-            # Convert date
-            exact_date = self.convert_date(date_text)
-            
             # COMMENT
-            comment = ""
+            comment = None
             try:
                 # Try to expand
                 try:
                     more_btn = element.find_element(By.XPATH, './/button[contains(., "More") or contains(., "Plus")]')
                     self.driver.execute_script("arguments[0].click();", more_btn)
-                    time.sleep(0.2)
+                    self.wait_for(EC.invisibility_of_element(more_btn), timeout=1)
                 except:
                     pass
                 
                 # Get comment
                 comment_elem = element.find_element(By.XPATH, './/span[@class="wiI7pd"]')
-                comment = comment_elem.text.strip()
-                comment = re.sub(r'\s+', ' ', comment.replace('\n', ' ').replace('\r', '')).strip()
+                comment = comment_elem.text
             except:
                 pass
             
-            # Generate unique ID
-            clean_name = re.sub(r'[^a-zA-Z0-9]', '_', name)
-            clean_date = re.sub(r'[^a-zA-Z0-9]', '_', exact_date)
-            clean_location = re.sub(r'[^a-zA-Z0-9]', '_', location_name)
-            unique_id = f"google_{clean_location}_{clean_name}_{clean_date}"[:100]
-            
-            return {
-                "id": unique_id,
-                "name": name,
-                "source": "Google Maps",
-                "location": location_name,
-                "date": exact_date,
-                "rating": rating,
-                "comment": comment
-            }
+            return self.build_google_review(name, aria_label, date_text, comment, location_name)
             
         except Exception as e:
             return None
     
+    def build_google_review(self, name, rating_label, date_text, comment, location_name):
+        """Build a review dict from the raw Google Maps fields"""
+        name = name.strip() if name else ""
+        name = name or "Anonymous"
+        
+        # RATING
+        rating = 0
+        if rating_label:
+            match = re.search(r'(\d+(?:\.\d+)?)', rating_label)
+            if match:
+                rating = int(float(match.group(1)))
+        
+        # DATE
+        date_text = date_text.strip() if date_text else ""
+        exact_date = self.convert_date(date_text or "N/A")
+        
+        # COMMENT
+        comment = comment or ""
+        comment = re.sub(r'\s+', ' ', comment.replace('\n', ' ').replace('\r', '')).strip()
+        
+        # Generate unique ID
+        clean_name = re.sub(r'[^a-zA-Z0-9]', '_', name)
+        clean_date = re.sub(r'[^a-zA-Z0-9]', '_', exact_date)
+        clean_location = re.sub(r'[^a-zA-Z0-9]', '_', location_name)
+        unique_id = f"google_{clean_location}_{clean_name}_{clean_date}"[:100]
+        
+        return {
+            "id": unique_id,
+            "name": name,
+            "source": "Google Maps",
+            "location": location_name,
+            "date": exact_date,
+            "rating": rating,
+            "comment": comment
+        }
+    
     def convert_date(self, date_text):
         """Convert relative date to exact date (DD-MM-YYYY)"""
-        if not date_text or date_text == "N/A":
-            return "N/A"
-        
         try:
-            today = datetime.now()
-            date_lower = date_text.lower()
-            
-            # Check for exact matches
-            for pattern, days in DATE_PATTERNS.items():
-                if pattern in date_lower:
-                    exact_date = today - timedelta(days=days)
-                    return exact_date.strftime('%d-%m-%Y')
-            
-            # Check for numeric patterns
-            num_match = re.search(r'(\d+)\s*(?:year|years|an|ans|month|months|mois|week|weeks|semaine|semaines|day|days|jour|jours)', date_lower)
-            if num_match:
-                num = int(num_match.group(1))
-                if 'year' in date_lower or 'an' in date_lower:
-                    exact_date = today - timedelta(days=365 * num)
-                elif 'month' in date_lower or 'mois' in date_lower:
-                    exact_date = today - timedelta(days=30 * num)
-                elif 'week' in date_lower or 'semaine' in date_lower:
-                    exact_date = today - timedelta(weeks=num)
-                elif 'day' in date_lower or 'jour' in date_lower:
-                    exact_date = today - timedelta(days=num)
-                else:
-                    exact_date = today
-                
-                return exact_date.strftime('%d-%m-%Y')
-            
-            return "N/A"
-            
+            return convert_date(date_text)
         except:
             return "N/A"
     
-    def scrape_google_location(self, url, location_name):
-        """Scrape reviews from a Google Maps location"""
+    def scrape_google_location(self, url, location_name, full=False):
+        """Scrape reviews from a Google Maps location (only new ones unless full)"""
+        state = {} if full else self.state.load("Google Maps", location_name)
+        self.last_error = None
+        
         try:
             # Open URL
-            self.driver.get(url)
-            time.sleep(3)
+            self.driver.get(self.page_url("Google Maps", location_name, url))
+            self.wait_for_page_ready()
             
             # Handle cookies
             self.accept_cookies()
@@ -347,8 +531,34 @@ class UnifiedReviewScraper:
             # Ensure we're on reviews tab
             self.ensure_reviews_tab_open()
             
+            # Newest first, so an incremental run can stop at known reviews
+            sorted_newest = self.sort_reviews_by_newest()
+            
             # Scroll to load reviews
-            self.scroll_to_load_reviews()
+            if state and sorted_newest:
+                print(f"   Incremental: stopping at reviews older than {state.get('newest_date')}")
+                self.scroll_to_load_reviews(stop_when=lambda: self.reached_known_reviews(location_name, state))
+            else:
+                self.scroll_to_load_reviews()
+            
+            # Fast path: expand and serialize every card in one round trip
+            if JS_EXTRACTION:
+                try:
+                    reviews = self.extract_google_reviews_js(location_name)
+                except Exception as e:
+                    print(f"   Single-pass extraction failed, falling back to selectors: {e}")
+                    reviews = []
+                
+                if reviews:
+                    self.record_page("Google Maps", location_name, url)
+                    new_reviews = 0
+                    print(f"   Found {len(reviews)} reviews. Processing...")
+                    for review_data in reviews:
+                        if self.save_review(review_data):
+                            new_reviews += 1
+                    
+                    self.state.update_from_reviews("Google Maps", location_name, reviews)
+                    return len(reviews), len(reviews), 0, new_reviews
             
             # Get review elements
             review_elements = self.get_review_elements_google()
@@ -356,9 +566,12 @@ class UnifiedReviewScraper:
             if not review_elements:
                 return 0, 0, 0, 0
             
+            self.record_page("Google Maps", location_name, url)
+            
             # Process reviews with progress bar
             successful = 0
             new_reviews = 0
+            extracted = []
             
             print(f"   Found {len(review_elements)} reviews. Processing...")
             with tqdm(total=len(review_elements), desc="     Parsing", leave=False, 
@@ -370,17 +583,22 @@ class UnifiedReviewScraper:
                         if self.save_review(review_data):
                             new_reviews += 1
                         successful += 1
+                        extracted.append(review_data)
                     
                     pbar.update(1)
-                    time.sleep(PROCESSING_DELAY)
             
             failed = len(review_elements) - successful
+            self.state.update_from_reviews("Google Maps", location_name, extracted)
             
             return len(review_elements), successful, failed, new_reviews
             
         except Exception as e:
             print(f"   Error: {e}")
+            self.last_error = str(e)
             return 0, 0, 0, 0
+        
+        finally:
+            self.flush_reviews()
     
     # ========== TOP-RATED.ONLINE SCRAPING ==========
     
@@ -389,10 +607,13 @@ class UnifiedReviewScraper:
         from config import OTHER_SOURCES
         source_name, url, location_name = OTHER_SOURCES[0]  # top-rated.online
         
+        self.last_error = None
+        
         try:
             print(f"  Opening: {source_name}")
-            self.driver.get(url)
-            time.sleep(3)
+            self.driver.get(self.page_url(source_name, location_name, url))
+            self.wait_for(EC.presence_of_element_located((By.CSS_SELECTOR, "div.border-b")))
+            self.record_page(source_name, location_name, url)
             
             # Find all review blocks
             review_elements = self.driver.find_elements(By.CSS_SELECTOR, "div.border-b")
@@ -462,14 +683,17 @@ class UnifiedReviewScraper:
                     successful += 1
                     
                     pbar.update(1)
-                    time.sleep(PROCESSING_DELAY)
             
             failed = len(review_elements) - successful
             return len(review_elements), successful, failed, new_reviews
             
         except Exception as e:
             print(f"   Error scraping {source_name}: {e}")
+            self.last_error = str(e)
             return 0, 0, 0, 0
+        
+        finally:
+            self.flush_reviews()
     
     # ========== EXPAT.COM SCRAPING ==========
     
@@ -478,10 +702,13 @@ class UnifiedReviewScraper:
         from config import OTHER_SOURCES
         source_name, url, location_name = OTHER_SOURCES[1]  # expat.com
         
+        self.last_error = None
+        
         try:
             print(f"  Opening: {source_name}")
-            self.driver.get(url)
-            time.sleep(5)
+            self.driver.get(self.page_url(source_name, location_name, url))
+            self.wait_for(EC.presence_of_element_located((By.CSS_SELECTOR, "div.card-post")))
+            self.record_page(source_name, location_name, url)
             
             # Find all post elements
             post_elements = self.driver.find_elements(By.CSS_SELECTOR, "div.card-post")
@@ -546,14 +773,17 @@ class UnifiedReviewScraper:
                     successful += 1
                     
                     pbar.update(1)
-                    time.sleep(PROCESSING_DELAY)
             
             failed = len(post_elements) - successful
             return len(post_elements), successful, failed, new_reviews
             
         except Exception as e:
             print(f"   Error scraping {source_name}: {e}")
+            self.last_error = str(e)
             return 0, 0, 0, 0
+        
+        finally:
+            self.flush_reviews()
     
     # ========== TRUSTBURN.COM SCRAPING ==========
     
@@ -562,10 +792,13 @@ class UnifiedReviewScraper:
         from config import OTHER_SOURCES
         source_name, url, location_name = OTHER_SOURCES[2]  # trustburn.com
         
+        self.last_error = None
+        
         try:
             print(f"  🌐 Opening: {source_name}")
-            self.driver.get(url)
-            time.sleep(5)
+            self.driver.get(self.page_url(source_name, location_name, url))
+            self.wait_for(EC.presence_of_element_located((By.CSS_SELECTOR, "article.review-card")))
+            self.record_page(source_name, location_name, url)
             
             # Find all review elements
             review_elements = self.driver.find_elements(By.CSS_SELECTOR, "article.review-card")
@@ -638,26 +871,24 @@ class UnifiedReviewScraper:
                     successful += 1
                     
                     pbar.update(1)
-                    time.sleep(PROCESSING_DELAY)
             
             failed = len(review_elements) - successful
             return len(review_elements), successful, failed, new_reviews
             
         except Exception as e:
             print(f"   Error scraping {source_name}: {e}")
+            self.last_error = str(e)
             return 0, 0, 0, 0
+        
+        finally:
+            self.flush_reviews()
     
     def get_total_reviews(self):
-        """Get total number of reviews in CSV"""
-        try:
-            if os.path.exists(self.csv_filename):
-                with open(self.csv_filename, 'r', encoding=CSV_ENCODING) as f:
-                    return sum(1 for line in f) - 1
-            return 0
-        except:
-            return 0
+        """Get total number of reviews from the in-memory ID index"""
+        return self.writer.total_reviews()
     
     def close(self):
-        """Close the browser"""
+        """Flush pending reviews and close the browser"""
+        self.flush_reviews()
         if hasattr(self, 'driver'):
             self.driver.quit()
\ No newline at end of file
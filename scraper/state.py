@@ -0,0 +1,86 @@
+"""
+Scrape state - per source/location high-water marks for incremental runs
+"""
+import os
+import re
+import json
+import threading
+from datetime import datetime
+
+from config import STATE_DIR
+
+
+def parse_review_date(date_text):
+    """Parse a DD-MM-YYYY review date, returns None for unknown dates"""
+    try:
+        return datetime.strptime(date_text, '%d-%m-%Y')
+    except (TypeError, ValueError):
+        return None
+
+
+def is_below_mark(state, review_id, review_date):
+    """True if a review is at or below a loaded high-water mark"""
+    if not state:
+        return False
+
+    if review_id == state.get('newest_id'):
+        return True
+
+    mark = parse_review_date(state.get('newest_date'))
+    current = parse_review_date(review_date)
+    return mark is not None and current is not None and current < mark
+
+
+class ScrapeState:
+    def __init__(self, state_dir=STATE_DIR):
+        """Small JSON state file per (source, location)"""
+        self.state_dir = state_dir
+        self.lock = threading.Lock()
+        os.makedirs(self.state_dir, exist_ok=True)
+
+    def path(self, source, location):
+        """State file path for a source/location pair"""
+        slug = re.sub(r'[^a-zA-Z0-9]+', '_', f"{source}_{location}").strip('_').lower()
+        return os.path.join(self.state_dir, f"{slug}.json")
+
+    def load(self, source, location):
+        """Return the saved high-water mark, or an empty dict"""
+        try:
+            with open(self.path(source, location), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, source, location, newest_id, newest_date):
+        """Write the newest review seen for a source/location"""
+        state = {
+            'source': source,
+            'location': location,
+            'newest_id': newest_id,
+            'newest_date': newest_date,
+            'updated': datetime.now().isoformat(timespec='seconds'),
+        }
+        path = self.path(source, location)
+        tmp_path = path + '.tmp'
+
+        # Write to a temp file first so a crash never leaves a half-written state
+        with self.lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, path)
+
+    def update_from_reviews(self, source, location, reviews):
+        """Move the high-water mark to the newest of the given reviews"""
+        dated = [(parse_review_date(r['date']), r) for r in reviews]
+        dated = [(d, r) for d, r in dated if d is not None]
+        if not dated:
+            return
+
+        newest_date, newest = max(dated, key=lambda item: item[0])
+
+        # Never move the mark backwards
+        previous = parse_review_date(self.load(source, location).get('newest_date'))
+        if previous is not None and previous > newest_date:
+            return
+
+        self.save(source, location, newest['id'], newest['date'])
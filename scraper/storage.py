@@ -0,0 +1,258 @@
+"""
+Review storage layer - indexed SQLite store with CSV/Parquet export, compact loader for analytics
+"""
+import os
+import csv
+import hashlib
+import sqlite3
+import threading
+
+from config import DB_FILENAME, CSV_ENCODING, REVIEW_CACHE_DIR
+from date_parser import parse_date_column
+
+
+COLUMNS = ['id', 'name', 'source', 'location', 'date', 'rating', 'comment']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    id       TEXT PRIMARY KEY,
+    name     TEXT,
+    source   TEXT,
+    location TEXT,
+    date     TEXT,
+    rating   NUMERIC,
+    comment  TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_reviews_source_location ON reviews (source, location);
+"""
+
+
+class ReviewStore:
+    def __init__(self, db_filename=DB_FILENAME):
+        """Open (or create) the SQLite review store"""
+        directory = os.path.dirname(db_filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.db_filename = db_filename
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_filename, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    @staticmethod
+    def to_rows(reviews):
+        """Convert review dicts (or already ordered rows) to tuples"""
+        rows = []
+        for review in reviews:
+            if isinstance(review, dict):
+                rows.append(tuple(review.get(column) for column in COLUMNS))
+            else:
+                rows.append(tuple(review))
+        return rows
+
+    # ========== WRITES ==========
+
+    def append_batch(self, reviews):
+        """Insert new reviews in one transaction, existing IDs are skipped"""
+        rows = self.to_rows(reviews)
+        with self.lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                f"INSERT OR IGNORE INTO reviews ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                rows
+            )
+            return self.conn.total_changes - before
+
+    def upsert(self, reviews):
+        """Insert reviews, replacing the fields of IDs that already exist"""
+        rows = self.to_rows(reviews)
+        updates = ', '.join(f"{column} = excluded.{column}" for column in COLUMNS[1:])
+        with self.lock, self.conn:
+            self.conn.executemany(
+                f"INSERT INTO reviews ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+                f"ON CONFLICT(id) DO UPDATE SET {updates}",
+                rows
+            )
+        return len(rows)
+
+    # ========== READS ==========
+
+    def ids(self):
+        """Set of all stored review IDs (served from the primary key index)"""
+        with self.lock:
+            return {row[0] for row in self.conn.execute("SELECT id FROM reviews")}
+
+    def count(self):
+        """Number of stored reviews"""
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
+
+    def _select(self, columns=None, source=None, location=None):
+        """Build a projected SELECT with optional source/location filters"""
+        columns = columns or COLUMNS
+        unknown = [column for column in columns if column not in COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown review columns: {unknown}")
+
+        query = f"SELECT {', '.join(columns)} FROM reviews"
+        filters, params = [], []
+        if source is not None:
+            filters.append("source = ?")
+            params.append(source)
+        if location is not None:
+            filters.append("location = ?")
+            params.append(location)
+        if filters:
+            query += " WHERE " + " AND ".join(filters)
+        return query + " ORDER BY rowid", params
+
+    def iter_batches(self, columns=None, batch_size=10000, source=None, location=None):
+        """Yield lists of row tuples with only the requested columns"""
+        query, params = self._select(columns, source, location)
+        with self.lock:
+            cursor = self.conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
+    def read(self, columns=None, source=None, location=None):
+        """Load reviews into a DataFrame, reading only the requested columns"""
+        import pandas as pd
+
+        query, params = self._select(columns, source, location)
+        with self.lock:
+            return pd.read_sql_query(query, self.conn, params=params)
+
+    # ========== IMPORT / EXPORT ==========
+
+    def import_csv(self, csv_filename, batch_size=10000):
+        """Load an existing reviews CSV into the store"""
+        inserted = 0
+        with open(csv_filename, 'r', encoding=CSV_ENCODING, newline='') as f:
+            reader = csv.DictReader(f)
+            batch = []
+            for row in reader:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    inserted += self.append_batch(batch)
+                    batch = []
+            if batch:
+                inserted += self.append_batch(batch)
+        return inserted
+
+    def export_csv(self, csv_filename):
+        """Write the whole store to a CSV in the scraper's format"""
+        tmp_filename = csv_filename + '.tmp'
+        with open(tmp_filename, 'w', newline='', encoding=CSV_ENCODING) as f:
+            writer = csv.writer(f, quoting=csv.QUOTE_MINIMAL)
+            writer.writerow(COLUMNS)
+            for rows in self.iter_batches():
+                writer.writerows(rows)
+        os.replace(tmp_filename, csv_filename)
+
+    def export_parquet(self, directory, partition_cols=('source', 'location')):
+        """Write the store as Parquet partitioned by source/location"""
+        df = self.read()
+        df.to_parquet(directory, partition_cols=list(partition_cols), index=False)
+
+    def close(self):
+        """Close the database connection"""
+        with self.lock:
+            self.conn.close()
+
+
+def read_reviews(path, columns=None):
+    """Load reviews from a .db store, a Parquet file/directory or a CSV, reading only `columns`"""
+    import pandas as pd
+
+    if path.endswith('.db'):
+        store = ReviewStore(path)
+        try:
+            return store.read(columns)
+        finally:
+            store.close()
+
+    if path.endswith('.parquet') or os.path.isdir(path):
+        return pd.read_parquet(path, columns=columns)
+
+    return pd.read_csv(path, encoding=CSV_ENCODING, usecols=columns)
+
+
+# ========== COMPACT LOADER ==========
+
+CATEGORY_COLUMNS = ['source', 'location']  # a handful of values repeated on every review
+STRING_COLUMNS = ['id', 'name', 'comment']
+
+
+def string_dtype():
+    """Arrow-backed strings when pyarrow is installed, pandas' own string dtype otherwise"""
+    import pandas as pd
+
+    try:
+        return pd.StringDtype("pyarrow")
+    except ImportError:
+        return pd.StringDtype()
+
+
+def compact_reviews(df):
+    """Reviews with compact dtypes: categorical source/location, int8 rating, datetime64 date, string texts
+
+    Whole-star ratings are int8 (Int8 when some are missing), float32 as soon as one
+    is fractional (the scraper keeps e.g. 4.6), dates are parsed once
+    (DD-MM-YYYY or relative, NaT when unknown).
+    """
+    import pandas as pd
+
+    df = df.copy()
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    for column in STRING_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype(string_dtype())
+    if 'rating' in df.columns:
+        rating = pd.to_numeric(df['rating'], errors='coerce')
+        if (rating.dropna() % 1 != 0).any():
+            df['rating'] = rating.astype("float32")
+        else:
+            df['rating'] = rating.astype("int8" if rating.notna().all() else "Int8")
+    if 'date' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df['date'] = parse_date_column(df['date'], as_datetime=True)
+    return df
+
+
+def cache_filename(path, columns=None, cache_dir=REVIEW_CACHE_DIR):
+    """Arrow file of a compact copy, named after the source's size and modification time"""
+    stats = []
+    for filename in (path, path + '-wal'):  # a .db store may only have changed in its WAL
+        if os.path.exists(filename):
+            stat = os.stat(filename)
+            stats.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+    key = "|".join([os.path.abspath(path), *stats, ",".join(columns or COLUMNS)])
+    name = os.path.splitext(os.path.basename(path.rstrip('/')))[0]
+    return os.path.join(cache_dir, f"{name}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]}.arrow")
+
+
+def load_reviews(path, columns=None, cache=False, cache_dir=REVIEW_CACHE_DIR):
+    """read_reviews with compact dtypes (compact_reviews)
+
+    cache=True keeps an uncompressed Arrow copy in cache_dir and memory-maps it on
+    the next calls: no parsing, and the columns are paged in by the OS as they are
+    used. The copy is rebuilt when the source file changes. Needs pyarrow.
+    """
+    if not cache:
+        return compact_reviews(read_reviews(path, columns))
+
+    from pyarrow import feather
+
+    filename = cache_filename(path, columns, cache_dir)
+    if not os.path.exists(filename):
+        df = compact_reviews(read_reviews(path, columns))
+        os.makedirs(cache_dir, exist_ok=True)
+        feather.write_feather(df, filename + '.tmp', compression='uncompressed')
+        os.replace(filename + '.tmp', filename)
+    return feather.read_table(filename, memory_map=True).to_pandas()
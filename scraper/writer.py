@@ -0,0 +1,191 @@
+"""
+Shared review writer - deduplicating, buffered output to the CSV or the review store
+"""
+import os
+import csv
+import json
+import atexit
+import threading
+import importlib.util
+from datetime import datetime
+
+from config import (CSV_FILENAME, CSV_ENCODING, WRITE_BATCH_SIZE, NEAR_DUPLICATES, NEAR_DUPLICATE_THRESHOLD,
+                    NEAR_DUPLICATES_FILENAME, REPO_ROOT)
+
+
+CSV_COLUMNS = ['id', 'name', 'source', 'location', 'date', 'rating', 'comment']
+NEAR_DUPLICATES_MODULE = os.path.join(REPO_ROOT, "preprocessing", "near_duplicates.py")
+
+
+def near_duplicate_index_class():
+    """NearDuplicateIndex of preprocessing/near_duplicates.py, loaded from its file
+
+    The module only needs numpy and pandas: loading it by path keeps the scraper
+    independent of the preprocessing package (and of its NLTK imports).
+    """
+    spec = importlib.util.spec_from_file_location("near_duplicates", NEAR_DUPLICATES_MODULE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.NearDuplicateIndex
+
+
+class ReviewWriter:
+    def __init__(self, csv_filename=CSV_FILENAME, batch_size=WRITE_BATCH_SIZE, store=None,
+                 near_duplicates=NEAR_DUPLICATES, near_duplicates_filename=NEAR_DUPLICATES_FILENAME):
+        """Initialize the writer and load the existing review IDs (and comments for near-duplicates)"""
+        # Ensure data directory exists
+        os.makedirs(os.path.dirname(csv_filename), exist_ok=True)
+
+        self.csv_filename = csv_filename
+        self.batch_size = batch_size
+        self.store = store
+        self.lock = threading.Lock()
+
+        if self.store is not None:
+            # First run on the store: bring in the reviews scraped so far
+            if self.store.count() == 0 and os.path.exists(self.csv_filename):
+                self.store.import_csv(self.csv_filename)
+        else:
+            self.initialize_csv()
+
+        # In-memory ID index and pending rows (flushed in batches)
+        self.existing_ids = self.store.ids() if self.store is not None else self.load_existing_ids()
+        self.pending_reviews = []
+        # Near-duplicates skipped in "drop" mode: not written, so not counted in total_reviews
+        self.dropped_ids = set()
+
+        # Reposted reviews get a new ID: catch them on the comment text
+        self.near_duplicate_mode = near_duplicates
+        self.near_duplicates_filename = near_duplicates_filename
+        self.near_duplicates = None
+        if near_duplicates != "off":
+            self.near_duplicates = near_duplicate_index_class()(NEAR_DUPLICATE_THRESHOLD)
+            for review_id, comment in self.load_existing_comments():
+                if comment:
+                    self.near_duplicates.add(review_id, comment)
+
+        # Make sure buffered reviews reach the disk even if the run crashes
+        atexit.register(self.flush)
+
+    def initialize_csv(self):
+        """Initialize CSV file if it doesn't exist"""
+        if not os.path.exists(self.csv_filename):
+            with open(self.csv_filename, 'w', newline='', encoding=CSV_ENCODING) as f:
+                writer = csv.writer(f)
+                writer.writerow(CSV_COLUMNS)
+
+    def load_existing_ids(self):
+        """Read all review IDs from the CSV once"""
+        existing_ids = set()
+        try:
+            if os.path.exists(self.csv_filename):
+                with open(self.csv_filename, 'r', encoding=CSV_ENCODING) as f:
+                    reader = csv.reader(f)
+                    next(reader, None)
+                    for row in reader:
+                        if row:
+                            existing_ids.add(row[0])
+        except Exception as e:
+            print(f"   Warning: could not read existing IDs: {e}")
+        return existing_ids
+
+    def load_existing_comments(self):
+        """Yield (id, comment) of the reviews saved so far"""
+        if self.store is not None:
+            for rows in self.store.iter_batches(columns=['id', 'comment']):
+                yield from rows
+            return
+
+        try:
+            if os.path.exists(self.csv_filename):
+                with open(self.csv_filename, 'r', encoding=CSV_ENCODING) as f:
+                    reader = csv.reader(f)
+                    next(reader, None)
+                    for row in reader:
+                        if len(row) == len(CSV_COLUMNS):
+                            yield row[0], row[-1]
+        except Exception as e:
+            print(f"   Warning: could not read existing comments: {e}")
+
+    def log_near_duplicate(self, review, duplicate_of, similarity):
+        """Append one JSON line per near-duplicate found, caller must hold the lock"""
+        record = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'id': review['id'],
+            'source': review.get('source'),
+            'location': review.get('location'),
+            'duplicate_of': duplicate_of,
+            'similarity': round(similarity, 3),
+            'action': self.near_duplicate_mode,
+        }
+        try:
+            with open(self.near_duplicates_filename, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        except Exception as e:
+            print(f"   Warning: could not log near-duplicate: {e}")
+
+    def save(self, review):
+        """Buffer a review for writing, returns False if it is a duplicate"""
+        with self.lock:
+            if review['id'] in self.existing_ids or review['id'] in self.dropped_ids:
+                return False
+
+            if self.near_duplicates is not None and review.get('comment'):
+                match = self.near_duplicates.add_if_new(review['id'], review['comment'])
+                if match is not None:
+                    self.log_near_duplicate(review, *match)
+                    if self.near_duplicate_mode == "drop":
+                        self.dropped_ids.add(review['id'])
+                        return False
+
+            self.existing_ids.add(review['id'])
+            self.pending_reviews.append([review[column] for column in CSV_COLUMNS])
+
+            # Flush when the buffer is full
+            if len(self.pending_reviews) >= self.batch_size:
+                self._flush_locked()
+            return True
+
+    def flush(self):
+        """Append all buffered reviews to the CSV in one write"""
+        with self.lock:
+            return self._flush_locked()
+
+    def _flush_locked(self):
+        """Write pending rows, caller must hold the lock"""
+        if not self.pending_reviews:
+            return 0
+
+        try:
+            if self.store is not None:
+                self.store.append_batch(self.pending_reviews)
+                written = len(self.pending_reviews)
+                self.pending_reviews = []
+                return written
+
+            with open(self.csv_filename, 'a', newline='', encoding=CSV_ENCODING) as f:
+                writer = csv.writer(f, quoting=csv.QUOTE_MINIMAL)
+                writer.writerows(self.pending_reviews)
+                f.flush()
+                os.fsync(f.fileno())
+
+            written = len(self.pending_reviews)
+            self.pending_reviews = []
+            return written
+
+        except Exception as e:
+            # Keep the rows buffered so the next flush can retry them
+            print(f"   Error writing reviews: {e}")
+            return 0
+
+    def export_csv(self):
+        """Refresh the CSV export from the store (no-op when writing CSV directly)"""
+        self.flush()
+        if self.store is not None:
+            with self.lock:
+                self.store.export_csv(self.csv_filename)
+
+    def total_reviews(self):
+        """Number of unique reviews written (or buffered), dropped near-duplicates excluded"""
+        with self.lock:
+            return len(self.existing_ids)